@@ -1,8 +1,14 @@
 # app.py
-from flask import Flask, redirect, url_for, session, render_template, request, flash
-from datetime import timedelta, date, datetime   
+from flask import Flask, redirect, url_for, session, render_template, request, flash, jsonify, abort, current_app
+from flask.cli import with_appcontext
+from datetime import date, datetime
+import click
+from sqlalchemy.orm import joinedload
 from extensions import db
-from models import Proveedor, Producto, Cliente, Tienda, Inventario, Venta, DetalleVenta, Usuario
+from models import Proveedor, Producto, Cliente, Tienda, Venta, DetalleVenta
+from utils.paginacion import paginar_keyset, parse_cursor
+from utils.kpi import obtener_kpis, reconciliar_kpis
+from utils.recalculo import TAMANO_LOTE as TAMANO_LOTE_RECALCULO
 
 # Blueprints
 from routes.auth import auth_bp
@@ -13,26 +19,24 @@ from routes.tienda import tienda_bp
 from routes.inventario import inventario_bp
 from routes.venta import venta_bp
 from routes.detalle import detalle_bp
-from routes.reportes import reportes_bp
-
-# --------------------------------
-# Configuración de la aplicación
-# --------------------------------
-app = Flask(__name__)
-app.secret_key = "supersecretkey123"  # ⚠️ cámbiala a un valor seguro en producción
-
-# Base de datos: inventario_pymes (MySQL)
-app.config["SQLALCHEMY_DATABASE_URI"] = "mysql+pymysql://root:@localhost/inventario_pymes"
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-app.permanent_session_lifetime = timedelta(minutes=10)
-
-# Inicializar DB
-db.init_app(app)
+from routes.reportes import reportes_bp, ejecutar_recalculo
+from routes.trabajos import trabajos_bp
+from routes.importacion import importacion_bp
+from utils.trabajos import gestor_trabajos
+from utils.cache_reportes import cache_reportes
+from utils.perfil_sql import perfil_sql
+from utils.cola_auditoria import cola_auditoria
+from utils.indices import indices_faltantes, sql_indice, crear_indices_faltantes
+from utils.auditoria import archivar_auditoria, LOTE_ARCHIVO
+from utils.sintetico import VOLUMENES, generar_datos, BaseNoVacia
+from utils import movimientos
+from utils import ventas_diarias
+from utils import busqueda_productos
+from config import cargar_config, opciones_engine
 
 # --------------------------------
 # Inyectar date/datetime en TODAS las plantillas 
 # --------------------------------
-@app.context_processor
 def inject_datetime():
     # Disponibles en Jinja: {{ date }} y {{ datetime }}
     return {"date": date, "datetime": datetime}
@@ -40,7 +44,6 @@ def inject_datetime():
 # --------------------------------
 # Filtro Jinja para CLP
 # --------------------------------
-@app.template_filter("clp")
 def formato_clp(value):
     """
     Formatea un número a CLP: $1.234 CLP
@@ -60,17 +63,15 @@ def formato_clp(value):
 # --------------------------------
 # Control de sesión y roles
 # --------------------------------
-@app.before_request
 def make_session_permanent():
     session.permanent = True
 
-@app.before_request
 def restringir_acceso_por_rol():
     """
     - Permite recursos estáticos y blueprint 'auth' sin login.
     - Si no hay login => redirige al login.
     - Rol 'administrador' => acceso completo.
-    - Rol 'usuario' => solo 'tienda', 'inventario', 'reportes' + dashboard.
+    - Rol 'usuario' => solo 'tienda', 'inventario', 'reportes', 'trabajos' + dashboard.
     """
     if request.endpoint is None:
         return
@@ -95,10 +96,10 @@ def restringir_acceso_por_rol():
     if rol == "administrador":
         return
 
-    allowed_for_usuario = {"tienda", "inventario", "reportes"}
+    allowed_for_usuario = {"tienda", "inventario", "reportes", "trabajos"}
     if rol == "usuario":
-        # Permitir dashboard (sin blueprint)
-        if bp is None and endpoint == "dashboard":
+        # Permitir dashboard y sus secciones paginadas (sin blueprint)
+        if bp is None and endpoint in ("dashboard", "dashboard_seccion"):
             return
         if bp not in allowed_for_usuario:
             flash("No tienes permisos para acceder a este módulo.", "warning")
@@ -119,44 +120,293 @@ def login_required(f):
 # --------------------------------
 # Rutas principales
 # --------------------------------
-@app.route("/")
-@app.route("/dashboard")
+# Secciones del dashboard: nombre -> (consulta con eager loading, clave keyset, descendente, solo_admin)
+# Cada sección se pagina por keyset, de modo que el costo de cada página es fijo
+# sin importar el tamaño de las tablas.
+SECCIONES_DASHBOARD = {
+    "tiendas": (lambda: Tienda.query, Tienda.id_tienda, False, False),
+    "proveedores": (lambda: Proveedor.query, Proveedor.id_proveedor, False, True),
+    "productos": (
+        lambda: Producto.query.options(joinedload(Producto.proveedor)),
+        Producto.id_producto, False, True,
+    ),
+    "clientes": (lambda: Cliente.query, Cliente.id_cliente, False, True),
+    "ventas": (
+        lambda: Venta.query.options(joinedload(Venta.cliente)),
+        Venta.id_venta, True, True,
+    ),
+    "detalles": (
+        lambda: DetalleVenta.query.options(
+            joinedload(DetalleVenta.venta).joinedload(Venta.cliente),
+            joinedload(DetalleVenta.venta).joinedload(Venta.tienda),
+            joinedload(DetalleVenta.producto),
+        ),
+        DetalleVenta.id_detalle, True, True,
+    ),
+}
+
+def cargar_seccion(nombre, despues=None):
+    """Retorna (filas, siguiente_cursor) de una sección del dashboard."""
+    consulta, columna, descendente, _ = SECCIONES_DASHBOARD[nombre]
+    return paginar_keyset(consulta(), columna, despues=despues, descendente=descendente)
+
 @login_required
 def dashboard():
     """
     Panel principal con listados y acciones rápidas.
+    Solo se carga la primera página de cada sección; el resto se pide
+    bajo demanda a /dashboard/seccion/<nombre>.
     Los montos en las plantillas pueden usarse como:
       {{ v.total|clp }}  ó  {{ (d.subtotal / d.cantidad)|clp }}
     """
-    inventarios = Inventario.query.all()
-    return render_template(
-        "dashboard.html",
-        proveedores=Proveedor.query.all(),
-        productos=Producto.query.all(),
-        clientes=Cliente.query.all(),
-        tiendas=Tienda.query.all(),
-        inventarios=inventarios,
-        ventas=Venta.query.all(),
-        detalleventas=DetalleVenta.query.all(),
-    )
-
-# --------------------------------
-# Registrar Blueprints
-# --------------------------------
-app.register_blueprint(auth_bp)
-app.register_blueprint(proveedor_bp)
-app.register_blueprint(producto_bp)
-app.register_blueprint(cliente_bp)
-app.register_blueprint(tienda_bp)
-app.register_blueprint(inventario_bp)
-app.register_blueprint(venta_bp)
-app.register_blueprint(detalle_bp)
-app.register_blueprint(reportes_bp)
+    es_admin = (session.get("rol") or "").lower() == "administrador"
+    secciones = {}
+    for nombre, (_, _, _, solo_admin) in SECCIONES_DASHBOARD.items():
+        if solo_admin and not es_admin:
+            continue
+        secciones[nombre] = cargar_seccion(nombre)
+    return render_template("dashboard.html", secciones=secciones, kpis=obtener_kpis())
+
+@login_required
+def dashboard_seccion(nombre):
+    """Siguiente página (keyset) de una sección del dashboard, como fragmento HTML."""
+    if nombre not in SECCIONES_DASHBOARD:
+        abort(404)
+    es_admin = (session.get("rol") or "").lower() == "administrador"
+    if SECCIONES_DASHBOARD[nombre][3] and not es_admin:
+        abort(403)
+
+    filas, siguiente = cargar_seccion(nombre, despues=parse_cursor(request.args.get("despues")))
+    html = render_template("dashboard_filas.html", seccion=nombre, filas=filas, es_admin=es_admin)
+    return jsonify({"html": html, "siguiente": siguiente})
+
+# --------------------------------
+# Comandos CLI (programar vía cron / tarea programada)
+# --------------------------------
+@click.command("reconciliar-kpis")
+@with_appcontext
+def reconciliar_kpis_cmd():
+    """Reconstruye los contadores del dashboard desde cero y reporta desviaciones."""
+    from models import Auditoria
+
+    desviaciones = reconciliar_kpis()
+    db.session.add(Auditoria(
+        usuario_nombre="sistema",
+        accion="reconciliar_kpis",
+        detalles=f"Desviaciones encontradas={len(desviaciones)}",
+        detalles_json={"desviaciones": desviaciones[:100]},
+    ))
+    db.session.commit()
+
+    for d in desviaciones:
+        print(f"⚠️ {d['clave']} tienda={d['id_tienda']} periodo={d['periodo'] or '—'}: "
+              f"actual={d['actual']} esperado={d['esperado']}")
+    print(f"✅ KPIs reconciliados. Desviaciones: {len(desviaciones)}")
+
+@click.command("recalcular-totales")
+@with_appcontext
+@click.option("--lote", default=TAMANO_LOTE_RECALCULO, show_default=True, help="Filas por lote (commit por lote).")
+def recalcular_totales_cmd(lote):
+    """Recalcula subtotales y totales de venta en SQL, por lotes, mostrando el avance."""
+    def progreso(fase, ultimo_id, actualizados):
+        print(f"  {fase}: hasta id={ultimo_id}, actualizados={actualizados}")
+
+    conteos = ejecutar_recalculo(progreso=progreso, lote=lote)
+    print(f"✅ Recalculo completado: {conteos}")
+
+@click.command("crear-indices")
+@with_appcontext
+@click.option("--dry-run", is_flag=True, help="Solo mostrar el SQL de los índices que faltan.")
+def crear_indices_cmd(dry_run):
+    """Agrega a una base existente los índices declarados en models.py que le faltan."""
+    faltantes = indices_faltantes()
+    if not faltantes:
+        print("✅ No faltan índices.")
+        return
+    if dry_run:
+        for indice in faltantes:
+            print(f"{sql_indice(indice)};")
+        return
+
+    creados = crear_indices_faltantes(progreso=lambda ix: print(f"  creando {ix.name} ..."))
+    print(f"✅ Índices creados: {', '.join(creados)}")
+
+@click.command("archivar-auditoria")
+@with_appcontext
+@click.option("--dias", type=int, help="Retención en días (default: AUDITORIA_RETENCION_DIAS).")
+@click.option("--lote", default=LOTE_ARCHIVO, show_default=True, help="Registros por lote (commit por lote).")
+def archivar_auditoria_cmd(dias, lote):
+    """Mueve la auditoría más antigua que la retención a auditoria_historica."""
+    from models import Auditoria
+
+    if dias is None:
+        dias = current_app.config["AUDITORIA_RETENCION_DIAS"]
+    movidos = archivar_auditoria(dias=dias, lote=lote, progreso=lambda n: print(f"  movidos: {n}"))
+    db.session.add(Auditoria(
+        usuario_nombre="sistema",
+        accion="archivar_auditoria",
+        detalles=f"Registros movidos a auditoria_historica={movidos}",
+        detalles_json={"movidos": movidos, "dias": dias},
+    ))
+    db.session.commit()
+    print(f"✅ Auditoría archivada: {movidos} registros.")
+
+@click.command("sembrar-datos")
+@with_appcontext
+@click.option("--volumen", type=click.Choice(sorted(VOLUMENES)), default="pequeno", show_default=True)
+@click.option("--semilla", default=42, show_default=True, help="Misma semilla => mismos datos.")
+@click.option("--tiendas", type=int, help="Sobrescribe la cantidad del volumen elegido.")
+@click.option("--productos", type=int)
+@click.option("--clientes", type=int)
+@click.option("--ventas", type=int)
+def sembrar_datos_cmd(volumen, semilla, tiendas, productos, clientes, ventas):
+    """Llena una base vacía con datos sintéticos deterministas (usuarios admin/usuario)."""
+    db.create_all()
+    try:
+        conteos = generar_datos(
+            volumen, semilla,
+            progreso=lambda tabla, n: print(f"  {tabla}: {n} filas"),
+            tiendas=tiendas, productos=productos, clientes=clientes, ventas=ventas,
+        )
+    except BaseNoVacia as e:
+        raise click.ClickException(str(e))
+    print(f"✅ Datos generados: {conteos}")
+
+@click.command("abrir-libro-stock")
+@with_appcontext
+def abrir_libro_stock_cmd():
+    """Registra la apertura del libro de stock desde Inventario y recalcula Producto.stock."""
+    aperturas = movimientos.abrir_libro()
+    print(f"✅ Libro de stock abierto: {aperturas} movimientos de apertura.")
+
+@click.command("corte-stock")
+@with_appcontext
+@click.option("--margen", default=movimientos.MARGEN_CORTE, show_default=True,
+              help="Segundos: solo entran movimientos más antiguos que esto.")
+def corte_stock_cmd(margen):
+    """Guarda una foto de los saldos del libro (acelera las consultas de stock a una fecha)."""
+    corte = movimientos.crear_corte(margen=margen)
+    if corte is None:
+        print("✅ Sin movimientos nuevos: no se creó corte.")
+        return
+    print(f"✅ Corte #{corte.id_corte} al {corte.fecha_hora} (hasta movimiento #{corte.id_movimiento_hasta}).")
+
+@click.command("verificar-stock")
+@with_appcontext
+def verificar_stock_cmd():
+    """Recalcula los cortes incompletos y compara el libro de movimientos, Inventario y Producto.stock."""
+    reparados = movimientos.reparar_cortes()
+    if reparados:
+        print(f"⚠️ {reparados} cortes de stock recalculados (movimientos confirmados después del corte).")
+    descuadres = movimientos.verificar()
+    for d in descuadres[:100]:
+        print(f"⚠️ {d}")
+    if descuadres:
+        raise click.ClickException(f"{len(descuadres)} descuadres de stock.")
+    print("✅ Libro, inventario y stock de productos cuadran.")
+
+@click.command("reconstruir-ventas-diarias")
+@with_appcontext
+@click.option("--dias", default=ventas_diarias.DIAS_POR_LOTE, show_default=True,
+              help="Días por ventana (commit por ventana).")
+@click.option("--verificar", is_flag=True, help="Solo comparar el resumen con las ventas, sin reescribir.")
+def reconstruir_ventas_diarias_cmd(dias, verificar):
+    """Recalcula el resumen diario de ventas (ventas_diarias) desde Venta/DetalleVenta."""
+    if verificar:
+        diferencias = ventas_diarias.diferencias()
+        for d in diferencias[:100]:
+            print(f"⚠️ {d['clave']}: resumen={d['resumen']} ventas={d['ventas']}")
+        if diferencias:
+            raise click.ClickException(f"{len(diferencias)} diferencias en ventas_diarias.")
+        print("✅ El resumen diario coincide con las ventas.")
+        return
+    filas = ventas_diarias.reconstruir(dias, progreso=lambda hasta, n: print(f"  hasta {hasta}: {n} filas"))
+    print(f"✅ Resumen diario reconstruido: {filas} filas.")
+
+@click.command("reindexar-productos")
+@with_appcontext
+@click.option("--lote", default=busqueda_productos.TAMANO_LOTE, show_default=True,
+              help="Productos por lote (commit por lote).")
+def reindexar_productos_cmd(lote):
+    """Reconstruye el índice de palabras de la búsqueda de productos (producto_palabras)."""
+    total = busqueda_productos.reindexar(lote, progreso=lambda n: print(f"  {n} productos"))
+    print(f"✅ Búsqueda de productos reindexada: {total} productos.")
+
+# --------------------------------
+# Fábrica de la aplicación
+# --------------------------------
+BLUEPRINTS = (
+    auth_bp, proveedor_bp, producto_bp, cliente_bp, tienda_bp,
+    inventario_bp, venta_bp, detalle_bp, reportes_bp, trabajos_bp, importacion_bp,
+)
+
+COMANDOS = (
+    reconciliar_kpis_cmd, recalcular_totales_cmd, crear_indices_cmd, archivar_auditoria_cmd, sembrar_datos_cmd,
+    abrir_libro_stock_cmd, corte_stock_cmd, verificar_stock_cmd, reconstruir_ventas_diarias_cmd,
+    reindexar_productos_cmd,
+)
+
+def create_app(config=None):
+    """
+    Crea la aplicación.
+    config: perfil ("dev", "test", "prod"), dict de valores a sobrescribir
+    (puede incluir "APP_ENV") o None para usar APP_ENV del entorno.
+    Ver config.py para las variables de entorno (pool, timeouts, URI).
+    """
+    if isinstance(config, dict):
+        valores = cargar_config(config.get("APP_ENV"))
+        valores.update(config)
+    else:
+        valores = cargar_config(config)
+
+    app = Flask(__name__)
+    app.config.update(valores)
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", opciones_engine(app.config))
+
+    # Inicializar DB
+    db.init_app(app)
+
+    # Trabajos en segundo plano (reportes pesados, recálculos)
+    gestor_trabajos.init_app(app)
+
+    # Caché en disco de archivos de reporte
+    cache_reportes.init_app(app)
+
+    # Instrumentación SQL por request (Server-Timing + /admin/perfil_sql)
+    perfil_sql.init_app(app)
+
+    # Auditoría de cambios: cola en memoria escrita por lotes en segundo plano
+    cola_auditoria.init_app(app)
+
+    # Plantillas: date/datetime y filtro CLP
+    app.context_processor(inject_datetime)
+    app.add_template_filter(formato_clp, "clp")
+
+    # Control de sesión y roles
+    app.before_request(make_session_permanent)
+    app.before_request(restringir_acceso_por_rol)
+
+    # Rutas principales
+    app.add_url_rule("/", "dashboard", dashboard)
+    app.add_url_rule("/dashboard", "dashboard", dashboard)
+    app.add_url_rule("/dashboard/seccion/<nombre>", "dashboard_seccion", dashboard_seccion)
+
+    # Blueprints
+    for bp in BLUEPRINTS:
+        app.register_blueprint(bp)
+
+    # Comandos CLI
+    for comando in COMANDOS:
+        app.cli.add_command(comando)
+
+    return app
 
 # --------------------------------
 # Ejecutar app
 # --------------------------------
 if __name__ == "__main__":
+    app = create_app()
     with app.app_context():
         db.create_all()  # Crea tablas si no existen (útil en desarrollo)
-    app.run(debug=True)
+        crear_indices_faltantes()  # y los índices nuevos en tablas que ya existían
+    app.run(debug=app.config.get("DEBUG", False))
@@ -0,0 +1,94 @@
+# benchmarks/arranque.py
+"""
+Costo de arranque de la aplicación: tiempo de importación + create_app() y
+memoria residente, medidos en procesos nuevos (arranque en frío, sin nada
+importado previamente).
+
+Además mide el primer reporte de cada formato (cuando recién se importa su
+motor: xlsxwriter, reportlab) para ver cuánto se traslada al primer uso.
+
+Uso:
+    python -m benchmarks.arranque --repeticiones 7 --json arranque.json
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+PESADOS = ("reportlab", "xlsxwriter", "openpyxl", "pandas", "numpy")
+
+# Se ejecuta en un proceso nuevo; imprime una línea JSON
+_SONDA = r"""
+import json, resource, sys, time
+inicio = time.perf_counter()
+from app import create_app
+app = create_app({"APP_ENV": "test", "SQL_PERFIL_MUESTREO": 0.0})
+arranque = time.perf_counter() - inicio
+res = {
+    "arranque_ms": arranque * 1000,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "modulos": len(sys.modules),
+    "pesados": [m for m in %(pesados)r if m in sys.modules],
+}
+formato = %(formato)r
+if formato:
+    from utils.exportadores import generar_archivo
+    filas = [(i, f"Producto {i}", i * 10) for i in range(100)]
+    inicio = time.perf_counter()
+    generar_archivo(formato, ["ID", "Producto", "Precio"], filas, "Arranque").close()
+    res["primer_reporte_ms"] = (time.perf_counter() - inicio) * 1000
+    res["rss_mb_reporte"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    res["pesados_reporte"] = [m for m in %(pesados)r if m in sys.modules]
+print(json.dumps(res))
+"""
+
+
+def sondear(formato=None):
+    salida = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", _SONDA % {"pesados": PESADOS, "formato": formato}],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def medir(repeticiones, formato=None):
+    muestras = [sondear(formato) for _ in range(repeticiones)]
+    resumen = {
+        "arranque_ms": round(statistics.median(m["arranque_ms"] for m in muestras), 1),
+        "rss_mb": round(statistics.median(m["rss_mb"] for m in muestras), 1),
+        "modulos": muestras[-1]["modulos"],
+        "pesados": muestras[-1]["pesados"],
+    }
+    if formato:
+        resumen["primer_reporte_ms"] = round(statistics.median(m["primer_reporte_ms"] for m in muestras), 1)
+        resumen["rss_mb_reporte"] = round(statistics.median(m["rss_mb_reporte"] for m in muestras), 1)
+    return resumen
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=5, help="Procesos por medición (se usa la mediana).")
+    parser.add_argument("--json", help="Guardar el resumen en este archivo.")
+    args = parser.parse_args()
+
+    resultados = {"arranque": medir(args.repeticiones)}
+    for formato in ("csv", "excel", "pdf"):
+        resultados[f"primer_{formato}"] = medir(args.repeticiones, formato)
+
+    base = resultados["arranque"]
+    print(f"Arranque en frío (mediana de {args.repeticiones}): {base['arranque_ms']} ms, "
+          f"RSS {base['rss_mb']} MB, {base['modulos']} módulos")
+    print(f"Dependencias pesadas cargadas al arrancar: {', '.join(base['pesados']) or 'ninguna'}")
+    for formato in ("csv", "excel", "pdf"):
+        r = resultados[f"primer_{formato}"]
+        print(f"  primer {formato:<6} {r['primer_reporte_ms']:>8} ms   RSS {r['rss_mb_reporte']} MB")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"parametros": vars(args), "resultados": resultados}, f, indent=2)
+    raise SystemExit(1 if base["pesados"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+# benchmarks/carga.py
+"""
+Prueba de carga HTTP: muchos cajeros y usuarios de reportes a la vez.
+
+Levanta la aplicación real (create_app, perfil prod) en un servidor WSGI local multihilo sobre
+una base con datos sintéticos, inicia sesión como `administrador` y como
+`usuario` en cada hilo y ejecuta una mezcla configurable de operaciones:
+
+    venta       POST /venta/nuevo (administrador)
+    inventario  GET  /inventario/  (usuario)
+    reporte     GET  /reporte/<nombre>?formato=... (usuario): desde la caché, o el
+                trabajo que encola la ruta, seguido hasta su descarga
+
+Al final informa throughput, latencias p50/p95/p99 por operación, tasa de
+errores y verifica la consistencia del stock: para cada producto vendido,
+stock inicial - unidades vendidas == stock final, y nunca negativo; y que
+el libro de movimientos, Inventario y Producto.stock cuadren.
+
+Uso:
+    python -m benchmarks.carga --hilos 16 --duracion 30 --mezcla venta=6,inventario=3,reporte=1
+
+Variables de entorno:
+    CARGA_DB_URI   base a usar (default: archivo SQLite temporal). ¡Se borra entera!
+"""
+import argparse
+import http.cookiejar
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+
+REPORTES = ("inventario", "ventas", "clientes", "detalle_ventas")
+FORMATOS = ("excel", "pdf", "csv")
+PASSWORD = "admin123"
+TIENDA = 1
+
+
+# -------------------------------
+# Cliente HTTP (urllib, sin seguir redirecciones)
+# -------------------------------
+class _SinRedireccion(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Sesion:
+    def __init__(self, base):
+        self.base = base
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _SinRedireccion()
+        )
+
+    def pedir(self, metodo, ruta, datos=None, encabezados=None):
+        """(status, location, cuerpo)."""
+        cuerpo = urllib.parse.urlencode(datos).encode() if datos is not None else None
+        req = urllib.request.Request(self.base + ruta, data=cuerpo, method=metodo, headers=encabezados or {})
+        try:
+            with self.opener.open(req, timeout=120) as r:
+                return r.status, r.headers.get("Location", ""), r.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers.get("Location", ""), e.read()
+
+    def login(self, username):
+        status, location, _ = self.pedir("POST", "/auth/login", {"username": username, "password": PASSWORD})
+        if status != 302 or "login" in location:
+            raise RuntimeError(f"No se pudo iniciar sesión como {username}")
+        return self
+
+
+# -------------------------------
+# Preparación de la base y del servidor
+# -------------------------------
+def preparar(args, directorio):
+    from app import create_app
+    from models import db, Inventario
+    from utils.sintetico import generar_datos
+    from utils.stock import ingresar_stock
+
+    # Perfil prod (pool, pre-ping, timeouts) salvo la URI y las carpetas de trabajo
+    os.environ.setdefault("SECRET_KEY", "prueba-de-carga")
+    app = create_app({
+        "APP_ENV": "prod",
+        "SQLALCHEMY_DATABASE_URI": os.environ.get(
+            "CARGA_DB_URI", f"sqlite:///{os.path.join(directorio, 'carga.db')}"
+        ),
+        "REPORTES_CACHE_DIR": os.path.join(directorio, "cache_reportes"),
+        "TRABAJOS_DIR": os.path.join(directorio, "trabajos"),
+        "SQL_PERFIL_MUESTREO": 0.0,
+    })
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        generar_datos(args.volumen, args.semilla)
+
+        # Pocos productos con stock acotado: fuerza competencia entre cajeros
+        actual = dict(
+            db.session.query(Inventario.id_producto, Inventario.cantidad)
+            .filter(Inventario.id_tienda == TIENDA).order_by(Inventario.id_producto).limit(args.productos)
+        )
+        productos = list(actual)
+        # Como un ajuste más: Inventario, Producto.stock, resumen_kpi y el libro quedan cuadrados
+        ingresar_stock(TIENDA, {p: args.stock - n for p, n in actual.items()}, nota="prueba de carga")
+        db.session.commit()
+    return app, productos
+
+
+def iniciar_servidor(app):
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # sin una línea por request
+    servidor = make_server("127.0.0.1", 0, app, threaded=True)
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    return servidor, f"http://127.0.0.1:{servidor.server_port}"
+
+
+def foto_stock(app, productos):
+    from models import db, Inventario, Venta
+
+    with app.app_context():
+        stock = dict(db.session.query(Inventario.id_producto, Inventario.cantidad).filter(
+            Inventario.id_tienda == TIENDA, Inventario.id_producto.in_(productos)
+        ).all())
+        ultima = db.session.query(db.func.max(Venta.id_venta)).scalar() or 0
+        db.session.remove()
+    return stock, ultima
+
+
+# -------------------------------
+# Operaciones
+# -------------------------------
+def op_venta(sesiones, rnd, productos, args):
+    lineas = rnd.sample(productos, k=min(len(productos), rnd.randint(1, args.lineas)))
+    datos = {"id_cliente": rnd.randint(1, 50), "id_tienda": TIENDA}
+    for i, id_producto in enumerate(lineas):
+        datos[f"detalles[{i}][id_producto]"] = id_producto
+        datos[f"detalles[{i}][cantidad]"] = rnd.randint(1, 3)
+    status, location, _ = sesiones["administrador"].pedir("POST", "/venta/nuevo", datos)
+    if status >= 500:
+        return "error"
+    if status == 302 and location.rstrip("/").endswith("/venta/nuevo"):
+        return "rechazada"  # validación de negocio (p. ej. stock insuficiente)
+    return "ok" if status == 302 else "error"
+
+
+def op_inventario(sesiones, rnd, productos, args):
+    status, _, _ = sesiones["usuario"].pedir("GET", "/inventario/")
+    return "ok" if status == 200 else "error"
+
+
+def op_reporte(sesiones, rnd, productos, args):
+    """Desde la caché en el mismo request; si no, sigue el trabajo encolado hasta descargarlo."""
+    sesion = sesiones["usuario"]
+    ruta = f"/reporte/{rnd.choice(REPORTES)}?formato={rnd.choice(FORMATOS)}"
+    status, location, _ = sesion.pedir("GET", ruta)
+    if status == 200:
+        return "ok"
+    if status != 302:
+        return "error"
+    estado = urllib.parse.urlsplit(location).path
+    if not estado.startswith("/trabajos/"):
+        return "rechazada"  # límite de trabajos activos del usuario
+    while True:
+        status, _, cuerpo = sesion.pedir("GET", estado, encabezados={"Accept": "application/json"})
+        if status != 200:
+            return "error"
+        trabajo = json.loads(cuerpo)
+        if trabajo["estado"] not in ("pendiente", "ejecutando"):
+            break
+        time.sleep(0.05)
+    if trabajo["estado"] != "completado":
+        return "error"
+    status, _, _ = sesion.pedir("GET", f"{estado}/descargar")
+    return "ok" if status == 200 else "error"
+
+
+OPERACIONES = {"venta": op_venta, "inventario": op_inventario, "reporte": op_reporte}
+
+
+def parsear_mezcla(texto):
+    mezcla = {}
+    for parte in texto.split(","):
+        nombre, _, peso = parte.partition("=")
+        nombre = nombre.strip()
+        if nombre not in OPERACIONES:
+            raise SystemExit(f"Operación desconocida en --mezcla: {nombre}")
+        mezcla[nombre] = float(peso or 1)
+    return mezcla
+
+
+def trabajador(n, base, mezcla, productos, args, reloj, resultados, barrera):
+    rnd = random.Random(args.semilla * 1000 + n)
+    sesiones = {
+        "administrador": Sesion(base).login("admin"),
+        "usuario": Sesion(base).login("usuario"),
+    }
+    nombres, pesos = list(mezcla), list(mezcla.values())
+    locales = defaultdict(list)
+    barrera.wait()
+    fin = reloj["fin"]
+    while time.monotonic() < fin:
+        nombre = rnd.choices(nombres, weights=pesos)[0]
+        inicio = time.perf_counter()
+        try:
+            resultado = OPERACIONES[nombre](sesiones, rnd, productos, args)
+        except Exception:
+            resultado = "error"
+        locales[nombre].append((time.perf_counter() - inicio, resultado))
+    resultados.append(locales)
+
+
+# -------------------------------
+# Resultados
+# -------------------------------
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    k = max(0, min(len(valores) - 1, round(p / 100 * len(valores) + 0.5) - 1))
+    return valores[k]
+
+
+def resumir(resultados, duracion):
+    por_operacion = defaultdict(list)
+    for locales in resultados:
+        for nombre, muestras in locales.items():
+            por_operacion[nombre].extend(muestras)
+
+    resumen = {}
+    todas = []
+    for nombre, muestras in sorted(por_operacion.items()):
+        tiempos = sorted(t for t, _ in muestras)
+        todas.extend(tiempos)
+        conteo = defaultdict(int)
+        for _, r in muestras:
+            conteo[r] += 1
+        resumen[nombre] = {
+            "requests": len(muestras),
+            "rps": round(len(muestras) / duracion, 1),
+            "p50_ms": round(percentil(tiempos, 50) * 1000, 1),
+            "p95_ms": round(percentil(tiempos, 95) * 1000, 1),
+            "p99_ms": round(percentil(tiempos, 99) * 1000, 1),
+            "ok": conteo["ok"],
+            "rechazadas": conteo["rechazada"],
+            "errores": conteo["error"],
+            "tasa_error": round(100.0 * conteo["error"] / len(muestras), 2) if muestras else 0.0,
+        }
+    todas.sort()
+    errores = sum(r["errores"] for r in resumen.values())
+    resumen["total"] = {
+        "requests": len(todas),
+        "rps": round(len(todas) / duracion, 1),
+        "p50_ms": round(percentil(todas, 50) * 1000, 1),
+        "p95_ms": round(percentil(todas, 95) * 1000, 1),
+        "p99_ms": round(percentil(todas, 99) * 1000, 1),
+        "errores": errores,
+        "tasa_error": round(100.0 * errores / len(todas), 2) if todas else 0.0,
+    }
+    return resumen
+
+
+def verificar_stock(app, productos, stock_inicial, ultima_venta):
+    """Compara el stock final con el inicial menos lo vendido durante la prueba."""
+    from models import db, Auditoria, DetalleVenta, Inventario, Venta
+    from utils.cola_auditoria import cola_auditoria
+    from utils.movimientos import verificar
+
+    cola_auditoria.cerrar(app)  # escribir la auditoría pendiente antes de contar
+
+    with app.app_context():
+        vendidas = dict(db.session.query(DetalleVenta.id_producto, db.func.sum(DetalleVenta.cantidad)).join(
+            Venta, Venta.id_venta == DetalleVenta.id_venta
+        ).filter(
+            Venta.id_venta > ultima_venta, Venta.id_tienda == TIENDA, DetalleVenta.id_producto.in_(productos)
+        ).group_by(DetalleVenta.id_producto).all())
+        final = dict(db.session.query(Inventario.id_producto, Inventario.cantidad).filter(
+            Inventario.id_tienda == TIENDA, Inventario.id_producto.in_(productos)
+        ).all())
+        ventas_nuevas = db.session.query(db.func.count(Venta.id_venta)).filter(Venta.id_venta > ultima_venta).scalar()
+        auditadas = db.session.query(db.func.count(Auditoria.id_auditoria)).filter(
+            Auditoria.accion == "crear_venta"
+        ).scalar()
+        descuadres = verificar()
+        db.session.remove()
+
+    problemas = [f"libro de stock: {d}" for d in descuadres[:20]]
+    for id_producto in productos:
+        esperado = stock_inicial[id_producto] - int(vendidas.get(id_producto) or 0)
+        if final[id_producto] != esperado:
+            problemas.append(f"producto {id_producto}: esperado {esperado}, final {final[id_producto]}")
+        if final[id_producto] < 0:
+            problemas.append(f"producto {id_producto}: stock negativo ({final[id_producto]})")
+    if auditadas != ventas_nuevas:
+        problemas.append(f"ventas auditadas ({auditadas}) != ventas nuevas ({ventas_nuevas})")
+    return problemas, ventas_nuevas
+
+
+def imprimir(resumen):
+    columnas = ("requests", "rps", "p50_ms", "p95_ms", "p99_ms", "ok", "rechazadas", "errores", "tasa_error")
+    print(f"{'operación':<12}" + "".join(f"{c:>12}" for c in columnas))
+    for nombre, fila in resumen.items():
+        print(f"{nombre:<12}" + "".join(f"{fila.get(c, ''):>12}" for c in columnas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hilos", type=int, default=8, help="Sesiones concurrentes (cada una admin + usuario).")
+    parser.add_argument("--duracion", type=float, default=20, help="Segundos de carga.")
+    parser.add_argument("--mezcla", default="venta=6,inventario=3,reporte=1", help="Pesos por operación.")
+    parser.add_argument("--volumen", default="pequeno", help="Volumen de datos sintéticos.")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--productos", type=int, default=10, help="Productos en disputa en la tienda 1.")
+    parser.add_argument("--stock", type=int, default=2000, help="Stock inicial de cada producto en disputa.")
+    parser.add_argument("--lineas", type=int, default=3, help="Máximo de líneas por venta.")
+    parser.add_argument("--json", help="Guardar el resumen en este archivo.")
+    args = parser.parse_args()
+
+    mezcla = parsear_mezcla(args.mezcla)
+    with tempfile.TemporaryDirectory(prefix="carga-") as directorio:
+        print("Preparando datos sintéticos...")
+        app, productos = preparar(args, directorio)
+        servidor, base = iniciar_servidor(app)
+        stock_inicial, ultima_venta = foto_stock(app, productos)
+
+        print(f"Servidor en {base}; {args.hilos} hilos durante {args.duracion}s, mezcla {mezcla}")
+        resultados = []
+        barrera = threading.Barrier(args.hilos + 1)
+        reloj = {}
+        hilos = []
+        for n in range(args.hilos):
+            h = threading.Thread(
+                target=trabajador,
+                args=(n, base, mezcla, productos, args, reloj, resultados, barrera),
+            )
+            h.start()
+            hilos.append(h)
+
+        # Cuando todos los hilos iniciaron sesión (barrera) comienza la medición
+        inicio = time.monotonic()
+        reloj["fin"] = inicio + args.duracion
+        barrera.wait()
+        for h in hilos:
+            h.join()
+        duracion = time.monotonic() - inicio
+        servidor.shutdown()
+
+        resumen = resumir(resultados, duracion)
+        problemas, ventas_nuevas = verificar_stock(app, productos, stock_inicial, ultima_venta)
+
+    print()
+    imprimir(resumen)
+    ok_ventas = resumen.get("venta", {}).get("ok", 0)
+    print(f"\nVentas confirmadas por HTTP: {ok_ventas}; ventas nuevas en la base: {ventas_nuevas}")
+    if ok_ventas != ventas_nuevas:
+        problemas.append(f"ventas confirmadas ({ok_ventas}) != ventas en la base ({ventas_nuevas})")
+    if problemas:
+        print("❌ Inconsistencias:")
+        for p in problemas:
+            print(f"   - {p}")
+    else:
+        print("✅ Stock consistente: inicial - vendido == final en todos los productos.")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"parametros": vars(args), "resumen": resumen, "problemas": problemas}, f, indent=2)
+    raise SystemExit(1 if problemas or resumen["total"]["errores"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# benchmarks/conftest.py
+"""
+Aplicación real (create_app de app.py, perfil test) sobre una base con
+datos sintéticos para los benchmarks.
+
+Variables de entorno:
+    BENCH_DB_URI     base a usar (default: archivo SQLite temporal). ¡Se borra entera!
+    BENCH_VOLUMEN    pequeno | mediano | grande (default pequeno)
+    BENCH_SEMILLA    semilla del generador (default 42)
+"""
+import os
+
+import pytest
+
+STOCK_ILIMITADO = 10 ** 9
+PRODUCTOS_VENTA = (1, 2, 3, 4, 5)
+TIENDA_VENTA = 1
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    directorio = tmp_path_factory.mktemp("bench")
+
+    from app import create_app
+    from models import db, Inventario, Producto
+    from utils.sintetico import generar_datos
+    from utils.cola_auditoria import cola_auditoria
+
+    app = create_app({
+        "APP_ENV": "test",
+        "SQLALCHEMY_DATABASE_URI": os.environ.get("BENCH_DB_URI", f"sqlite:///{directorio / 'bench.db'}"),
+        "REPORTES_CACHE_DIR": str(directorio / "cache_reportes"),
+        "TRABAJOS_DIR": str(directorio / "trabajos"),
+        "SQL_PERFIL_MUESTREO": 1.0,
+    })
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        generar_datos(
+            os.environ.get("BENCH_VOLUMEN", "pequeno"),
+            int(os.environ.get("BENCH_SEMILLA", 42)),
+        )
+        # Productos con stock de sobra para que las ventas repetidas nunca fallen
+        for id_producto in PRODUCTOS_VENTA:
+            inv = Inventario.query.filter_by(id_producto=id_producto, id_tienda=TIENDA_VENTA).first()
+            if inv is None:
+                db.session.add(Inventario(id_producto=id_producto, id_tienda=TIENDA_VENTA, cantidad=STOCK_ILIMITADO))
+            else:
+                inv.cantidad = STOCK_ILIMITADO
+            db.session.get(Producto, id_producto).stock = STOCK_ILIMITADO
+        db.session.commit()
+    yield app
+    cola_auditoria.cerrar(app)  # escribir la auditoría pendiente antes de borrar las tablas
+    with app.app_context():
+        db.drop_all()
+        db.engine.dispose()
+
+
+def _cliente(app, username):
+    cliente = app.test_client()
+    r = cliente.post("/auth/login", data={"username": username, "password": "admin123"})
+    assert r.status_code == 302, f"no se pudo iniciar sesión como {username}"
+    return cliente
+
+
+@pytest.fixture(scope="session")
+def admin(app):
+    return _cliente(app, "admin")
+
+
+@pytest.fixture(scope="session")
+def usuario(app):
+    return _cliente(app, "usuario")
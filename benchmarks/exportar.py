@@ -0,0 +1,85 @@
+# benchmarks/exportar.py
+"""
+Benchmark de los motores de exportación (utils/exportar_*.py) con archivos grandes.
+
+Genera filas sintéticas con la forma del reporte de detalle de ventas
+(id, fecha, cliente, producto, cantidad, subtotal) y mide, por formato y
+tamaño: tiempo, filas/s, pico de memoria Python (tracemalloc, en una segunda
+pasada para no distorsionar el tiempo), páginas (PDF) y tamaño del archivo.
+
+Uso:
+    python -m benchmarks.exportar --formatos pdf excel --filas 10000 100000 --json exportar.json
+"""
+import argparse
+import json
+import random
+import re
+import time
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+
+COLUMNAS = ["ID Detalle", "Fecha", "Cliente", "Producto", "Cantidad", "Subtotal"]
+
+
+def filas_sinteticas(n, semilla=42):
+    rnd = random.Random(semilla)
+    for i in range(1, n + 1):
+        cantidad = rnd.randint(1, 5)
+        yield (
+            i,
+            date(2025, 1, 1) + timedelta(days=rnd.randrange(365)),
+            f"Cliente {rnd.randint(1, 5000):06d}" + " Largo" * rnd.choice((0, 0, 0, 8)),
+            f"Producto {rnd.randint(1, 2000):06d}",
+            cantidad,
+            Decimal(cantidad * rnd.randrange(100, 50_000, 10)),
+        )
+
+
+def medir(formato, n):
+    from utils.exportadores import generar_archivo
+
+    inicio = time.perf_counter()
+    archivo = generar_archivo(formato, COLUMNAS, filas_sinteticas(n), "Detalle de ventas")
+    segundos = time.perf_counter() - inicio
+    contenido = archivo.read()
+    archivo.close()
+    tamano = len(contenido)
+    paginas = re.search(rb"/Type /Pages /Count (\d+)", contenido)
+    del contenido
+
+    tracemalloc.start()
+    generar_archivo(formato, COLUMNAS, filas_sinteticas(n), "Detalle de ventas").close()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "formato": formato,
+        "filas": n,
+        "segundos": round(segundos, 3),
+        "filas_por_s": round(n / segundos),
+        "pico_mb": round(pico / 1024 / 1024, 1),
+        "paginas": int(paginas.group(1)) if paginas else None,
+        "mb": round(tamano / 1024 / 1024, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--formatos", nargs="+", default=["pdf", "excel", "csv"])
+    parser.add_argument("--filas", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--json", help="Guardar los resultados en este archivo.")
+    args = parser.parse_args()
+
+    resultados = [medir(formato, n) for formato in args.formatos for n in args.filas]
+    columnas = ("formato", "filas", "segundos", "filas_por_s", "pico_mb", "paginas", "mb")
+    print("".join(f"{c:>13}" for c in columnas))
+    for r in resultados:
+        print("".join(f"{'-' if r[c] is None else r[c]:>13}" for c in columnas))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"parametros": vars(args), "resultados": resultados}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
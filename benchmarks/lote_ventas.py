@@ -0,0 +1,126 @@
+# benchmarks/lote_ventas.py
+"""
+Ventas por segundo: una venta por transacción (como el formulario) vs ingesta en lote.
+
+Uso:
+    python -m benchmarks.lote_ventas [--ventas 5000] [--lineas 3] [--trozo 500] [--db URI]
+
+Sin --db usa un archivo SQLite temporal (con commits reales a disco). Para
+medir contra MySQL: --db mysql+pymysql://root:@localhost/bench_ventas
+(la base se vacía y se vuelve a crear).
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date
+
+from flask import Flask
+from sqlalchemy import event
+
+from extensions import db
+from models import Cliente, Inventario, Producto, Tienda, Venta
+from utils.kpi import registrar_venta
+from utils.lote_ventas import ingestar_ventas
+from utils.stock import reservar_stock
+from utils.ventas import parsear_lineas, resolver_lineas, pedido_por_producto, insertar_detalles
+
+PRODUCTOS = 500
+TIENDAS = 4
+
+
+def crear_app(uri):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = uri
+    db.init_app(app)
+    return app
+
+
+def poblar():
+    db.drop_all()
+    db.create_all()
+    db.session.add(Cliente(id_cliente=1, nombre="Cliente bench"))
+    db.session.add_all([Tienda(id_tienda=t, nombre=f"Tienda {t}") for t in range(1, TIENDAS + 1)])
+    db.session.add_all([
+        Producto(id_producto=i, nombre=f"Producto {i}", precio=1000 + i, stock=TIENDAS * 1_000_000)
+        for i in range(1, PRODUCTOS + 1)
+    ])
+    db.session.add_all([
+        Inventario(id_producto=i, id_tienda=t, cantidad=1_000_000)
+        for i in range(1, PRODUCTOS + 1) for t in range(1, TIENDAS + 1)
+    ])
+    db.session.commit()
+
+
+def ventas_sinteticas(n, lineas, semilla=7):
+    rnd = random.Random(semilla)
+    return [
+        {"ref": f"pos-{i}", "id_cliente": 1, "id_tienda": rnd.randint(1, TIENDAS), "fecha": "2025-06-01",
+         "detalles": [{"id_producto": rnd.randint(1, PRODUCTOS), "cantidad": rnd.randint(1, 3)} for _ in range(lineas)]}
+        for i in range(n)
+    ]
+
+
+def una_por_transaccion(ventas, _trozo):
+    """Lo que hace venta.nueva_venta por cada request."""
+    for v in ventas:
+        resueltas = resolver_lineas(parsear_lineas(dict(enumerate(v["detalles"]))))
+        pedido = pedido_por_producto(resueltas)
+        venta = Venta(fecha=date.fromisoformat(v["fecha"]), total=0, id_cliente=1, id_tienda=v["id_tienda"])
+        db.session.add(venta)
+        db.session.flush()
+        reservar_stock(v["id_tienda"], pedido, id_venta=venta.id_venta)
+        insertar_detalles(venta.id_venta, resueltas)
+        registrar_venta(venta)
+        db.session.commit()
+
+
+def en_lote(ventas, trozo):
+    resultados = ingestar_ventas(ventas, tamano_trozo=trozo)
+    assert all(r["ok"] for r in resultados), [r for r in resultados if not r["ok"]][:3]
+
+
+def medir(funcion, ventas, trozo):
+    contador = {"n": 0}
+
+    def contar(*_):
+        contador["n"] += 1
+
+    event.listen(db.engine, "before_cursor_execute", contar)
+    inicio = time.perf_counter()
+    try:
+        funcion(ventas, trozo)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", contar)
+    return time.perf_counter() - inicio, contador["n"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ventas", type=int, default=5000)
+    parser.add_argument("--lineas", type=int, default=3)
+    parser.add_argument("--trozo", type=int, default=500)
+    parser.add_argument("--db", default=None)
+    args = parser.parse_args()
+
+    archivo = None
+    if args.db is None:
+        archivo = os.path.join(tempfile.mkdtemp(), "lote_ventas.db")
+    app = crear_app(args.db or f"sqlite:///{archivo}")
+    ventas = ventas_sinteticas(args.ventas, args.lineas)
+
+    print(f"{'estrategia':>22} | {'ventas':>7} | {'segundos':>8} | {'ventas/s':>9} | {'sentencias/venta':>16}")
+    with app.app_context():
+        for nombre, funcion in (("una por transacción", una_por_transaccion), ("en lote", en_lote)):
+            poblar()
+            segundos, sentencias = medir(funcion, ventas, args.trozo)
+            print(f"{nombre:>22} | {args.ventas:>7} | {segundos:>8.2f} | {args.ventas / segundos:>9.0f} | "
+                  f"{sentencias / args.ventas:>16.2f}")
+        db.session.remove()
+    if archivo:
+        os.remove(archivo)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+# benchmarks/test_rutas.py
+"""
+Benchmarks de todas las rutas de los blueprints con el cliente de pruebas de
+Flask, sobre datos sintéticos (ver benchmarks/conftest.py).
+
+Uso (guardando resultados para comparar corridas):
+    pytest benchmarks/test_rutas.py --benchmark-autosave --benchmark-storage=benchmarks/resultados
+
+Comparar con la última corrida guardada y fallar si algo empeora más de 20%:
+    pytest benchmarks/test_rutas.py --benchmark-storage=benchmarks/resultados \\
+        --benchmark-compare --benchmark-compare-fail=mean:20%
+
+Con más datos:  BENCH_VOLUMEN=mediano pytest benchmarks/test_rutas.py ...
+"""
+import time
+from itertools import count
+
+import pytest
+
+from benchmarks.conftest import PRODUCTOS_VENTA, TIENDA_VENTA
+
+_secuencia = count(1)
+
+
+def _ok(respuesta, formulario=None):
+    """200, o redirección que no vuelve al formulario (las rutas vuelven a él cuando fallan)."""
+    assert respuesta.status_code in (200, 302), respuesta.status_code
+    if respuesta.status_code == 302 and formulario:
+        assert not respuesta.headers["Location"].endswith(formulario), "la ruta rechazó el formulario"
+    return respuesta
+
+
+def _get(cliente, url):
+    return _ok(cliente.get(url))
+
+
+def _esperar_trabajo(cliente, url_estado):
+    """Sigue el trabajo que encoló una ruta hasta que termina."""
+    while True:
+        datos = cliente.get(url_estado, headers={"Accept": "application/json"}).get_json()
+        if datos["estado"] not in ("pendiente", "ejecutando"):
+            assert datos["estado"] == "completado", datos["mensaje"]
+            return datos
+        time.sleep(0.01)
+
+
+def _reporte(cliente, url):
+    """Bytes del reporte: desde la caché en el mismo request, o encolado y descargado al terminar."""
+    r = _ok(cliente.get(url))
+    if r.status_code == 302:
+        assert r.headers["Location"].startswith("/trabajos/"), "la ruta no encoló el reporte"
+        _esperar_trabajo(cliente, r.headers["Location"])
+        r = _get(cliente, f"{r.headers['Location']}/descargar")
+    return r.data
+
+
+def _form_venta(id_cliente=1, lineas=3):
+    datos = {"id_cliente": id_cliente, "id_tienda": TIENDA_VENTA}
+    for i, id_producto in enumerate(PRODUCTOS_VENTA[:lineas]):
+        datos[f"detalles[{i}][id_producto]"] = id_producto
+        datos[f"detalles[{i}][cantidad]"] = 1
+    return datos
+
+
+# -------------------------------
+# Dashboard
+# -------------------------------
+def test_dashboard(benchmark, admin):
+    benchmark(_get, admin, "/dashboard")
+
+
+def test_dashboard_rol_usuario(benchmark, usuario):
+    benchmark(_get, usuario, "/dashboard")
+
+
+@pytest.mark.parametrize("seccion", ["tiendas", "proveedores", "productos", "clientes", "ventas", "detalles"])
+def test_dashboard_seccion(benchmark, admin, seccion):
+    benchmark(_get, admin, f"/dashboard/seccion/{seccion}")
+
+
+# -------------------------------
+# Listados y formularios (GET)
+# -------------------------------
+@pytest.mark.parametrize("url", [
+    "/tienda/", "/tienda/nuevo", "/tienda/editar/1",
+    "/proveedor/", "/proveedor/nuevo", "/proveedor/editar/1",
+    "/producto/", "/producto/nuevo", "/producto/editar/1",
+    "/producto/buscar?q=Producto%2000&id_tienda=1", "/producto/buscar?q=0001&id_tienda=1",
+    "/cliente/", "/cliente/nuevo", "/cliente/editar/1",
+    "/inventario/", "/inventario/nuevo", "/inventario/editar/1",
+    "/venta/nuevo", "/venta/editar/1",
+    "/detalle/nuevo", "/detalle/editar/1",
+    "/trabajos/",
+    "/admin/auditoria", "/admin/cache_reportes", "/admin/perfil_sql",
+    "/auth/login", "/auth/register",
+])
+def test_get(benchmark, admin, url):
+    benchmark(_get, admin, url)
+
+
+# -------------------------------
+# Reportes
+# -------------------------------
+REPORTES = ["inventario", "ventas", "clientes", "proveedores", "detalle_ventas", "ventas_por_dia", "ventas_por_producto"]
+
+
+@pytest.mark.parametrize("formato", ["excel", "pdf", "csv"])
+@pytest.mark.parametrize("nombre", REPORTES)
+def test_reporte_sin_cache(benchmark, app, admin, nombre, formato):
+    """De punta a punta: encolar, esperar el trabajo y descargar."""
+    from utils.cache_reportes import cache_reportes
+
+    def vaciar():
+        with app.app_context():
+            cache_reportes.vaciar()
+
+    benchmark.pedantic(
+        lambda: _reporte(admin, f"/reporte/{nombre}?formato={formato}"),
+        setup=vaciar, rounds=5, iterations=1,
+    )
+
+
+@pytest.mark.parametrize("nombre", REPORTES)
+def test_reporte_desde_cache(benchmark, admin, nombre):
+    _reporte(admin, f"/reporte/{nombre}?formato=excel")  # calentar
+    benchmark(lambda: _reporte(admin, f"/reporte/{nombre}?formato=excel"))
+
+
+def test_reporte_detalle_filtrado(benchmark, admin):
+    url = "/reporte/detalle_ventas?formato=csv&fecha_inicio=2025-06-01&fecha_fin=2025-06-30&cliente=1"
+    benchmark(lambda: _reporte(admin, url))
+
+
+@pytest.mark.parametrize("nombre", ["ventas_por_dia", "ventas_por_producto"])
+def test_reporte_agregado_un_mes(benchmark, app, admin, nombre):
+    """Mismo rango que detalle_ventas, pero leyendo solo ventas_diarias (sin caché de archivos)."""
+    from utils.cache_reportes import cache_reportes
+
+    def vaciar():
+        with app.app_context():
+            cache_reportes.vaciar()
+
+    url = f"/reporte/{nombre}?formato=csv&fecha_inicio=2025-06-01&fecha_fin=2025-06-30"
+    benchmark.pedantic(lambda: _reporte(admin, url), setup=vaciar, rounds=5, iterations=1)
+
+
+def test_auditoria_csv(benchmark, admin):
+    benchmark(lambda: _get(admin, "/admin/auditoria.csv").data)
+
+
+# -------------------------------
+# Ventas
+# -------------------------------
+def test_nueva_venta(benchmark, admin):
+    benchmark(lambda: _ok(admin.post("/venta/nuevo", data=_form_venta()), "/venta/nuevo"))
+
+
+def test_nueva_venta_una_linea(benchmark, admin):
+    benchmark(lambda: _ok(admin.post("/venta/nuevo", data=_form_venta(lineas=1)), "/venta/nuevo"))
+
+
+def test_editar_venta(benchmark, app, admin):
+    _ok(admin.post("/venta/nuevo", data=_form_venta()), "/venta/nuevo")
+    from models import Venta
+    with app.app_context():
+        id_venta = Venta.query.order_by(Venta.id_venta.desc()).first().id_venta
+
+    url = f"/venta/editar/{id_venta}"
+    benchmark(lambda: _ok(admin.post(url, data=_form_venta(lineas=2)), url))
+
+
+def test_eliminar_venta(benchmark, app, admin):
+    from models import Venta
+
+    def crear():
+        _ok(admin.post("/venta/nuevo", data=_form_venta()), "/venta/nuevo")
+        with app.app_context():
+            return (Venta.query.order_by(Venta.id_venta.desc()).first().id_venta,), {}
+
+    benchmark.pedantic(
+        lambda id_venta: _ok(admin.post(f"/venta/eliminar/{id_venta}")),
+        setup=crear, rounds=20, iterations=1,
+    )
+
+
+def test_nuevo_detalle(benchmark, admin):
+    datos = {"id_cliente": 1, "id_tienda": TIENDA_VENTA,
+             "detalles[0][id_producto]": PRODUCTOS_VENTA[0], "detalles[0][cantidad]": 1}
+    benchmark(lambda: _ok(admin.post("/detalle/nuevo", data=datos), "/detalle/nuevo"))
+
+
+def test_recalcular_totales(benchmark, admin):
+    def recalcular():
+        r = _ok(admin.post("/admin/recalcular_totales"))
+        assert r.headers["Location"].startswith("/trabajos/"), "la ruta no encoló el recálculo"
+        _esperar_trabajo(admin, r.headers["Location"])
+
+    benchmark.pedantic(recalcular, rounds=3, iterations=1)
+
+
+# -------------------------------
+# Mantenedores (POST)
+# -------------------------------
+def test_nuevo_producto(benchmark, admin):
+    benchmark(lambda: _ok(admin.post("/producto/nuevo", data={
+        "nombre": f"Bench producto {next(_secuencia)}", "precio": 1990, "stock": 0, "id_proveedor": 1,
+    }), "/producto/nuevo"))
+
+
+def test_nuevo_cliente(benchmark, admin):
+    benchmark(lambda: _ok(admin.post("/cliente/nuevo", data={
+        "nombre": f"Bench cliente {next(_secuencia)}", "email": "", "telefono": "",
+    }), "/cliente/nuevo"))
+
+
+def test_nuevo_proveedor(benchmark, admin):
+    benchmark(lambda: _ok(admin.post("/proveedor/nuevo", data={
+        "nombre": f"Bench proveedor {next(_secuencia)}", "contacto": "", "email": "", "ubicacion": "",
+    }), "/proveedor/nuevo"))
+
+
+def test_nueva_tienda(benchmark, admin):
+    benchmark(lambda: _ok(admin.post("/tienda/nuevo", data={
+        "nombre": f"Bench tienda {next(_secuencia)}", "ubicacion": "", "contacto": "", "email": "",
+    }), "/tienda/nuevo"))
+
+
+def test_ajustar_inventario(benchmark, admin):
+    datos = {"id_producto": PRODUCTOS_VENTA[0], "id_tienda": TIENDA_VENTA, "cantidad": 1}
+    benchmark(lambda: _ok(admin.post("/inventario/nuevo", data=datos), "/inventario/nuevo"))
+
+
+# -------------------------------
+# Trabajos en segundo plano
+# -------------------------------
+def test_encolar_y_consultar_trabajo(benchmark, app, admin):
+    from utils.cache_reportes import cache_reportes
+
+    def vaciar():
+        with app.app_context():
+            cache_reportes.vaciar()
+
+    def encolar():
+        r = admin.get("/reporte/clientes?formato=csv", headers={"Accept": "application/json"})
+        assert r.status_code in (202, 429), r.status_code
+        if r.status_code == 202:
+            _get(admin, r.get_json()["url_estado"])
+
+    benchmark.pedantic(encolar, setup=vaciar, rounds=3, iterations=1)
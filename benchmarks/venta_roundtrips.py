@@ -0,0 +1,144 @@
+# benchmarks/venta_roundtrips.py
+"""
+Viajes a la base de datos por venta: resolución por línea (antes) vs en lote (después).
+
+Uso:
+    python -m benchmarks.venta_roundtrips [--lineas 50 100 150]
+
+Cada columna es un POST /venta/nuevo completo con el cliente de pruebas de
+Flask, contando con el evento before_cursor_execute del engine (como
+tests/test_planes_consulta.py) todas las sentencias que emite: la sesión,
+la venta, el stock y el libro de movimientos, los detalles, los upserts de
+resumen_kpi y ventas_diarias al commit, el incremento de version_datos
+después del commit y la auditoría (aquí escrita en el mismo request;
+en producción va a la cola en segundo plano). "Antes" corre la misma ruta
+con la resolución de productos y el descuento de stock línea por línea.
+
+Se ejecuta sobre SQLite en un archivo temporal; lo que importa es la
+cantidad de sentencias emitidas por venta, que es la misma en MySQL.
+"""
+import argparse
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+from pathlib import Path
+from unittest import mock
+
+from sqlalchemy import event
+
+from app import create_app
+from models import db, Cliente, Producto, Inventario, Tienda, Proveedor
+from routes import venta as rutas_venta
+from utils import movimientos
+from utils.kpi import reconciliar_kpis
+from utils.stock import StockInsuficiente
+from utils.ventas import ErrorVenta
+
+
+def crear_app(directorio):
+    return create_app({
+        "APP_ENV": "test",
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{Path(directorio) / 'roundtrips.db'}",
+        "AUDITORIA_ASINCRONA": False,
+    })
+
+
+def poblar(n_productos, id_tienda=1):
+    db.create_all()
+    db.session.add(Tienda(id_tienda=id_tienda, nombre="Tienda bench"))
+    db.session.add(Cliente(id_cliente=1, nombre="Cliente bench"))
+    db.session.add(Proveedor(id_proveedor=1, nombre="Proveedor bench"))
+    db.session.add_all([
+        Producto(id_producto=i, nombre=f"Producto {i}", precio=1000 + i, stock=100_000, id_proveedor=1)
+        for i in range(1, n_productos + 1)
+    ])
+    db.session.add_all([
+        Inventario(id_producto=i, id_tienda=id_tienda, cantidad=100_000)
+        for i in range(1, n_productos + 1)
+    ])
+    reconciliar_kpis()
+    db.session.commit()
+    movimientos.abrir_libro()
+
+
+def resolver_por_linea(lineas):
+    """Estrategia anterior: un SELECT de Producto por línea."""
+    resueltas = []
+    for id_producto, cantidad in lineas:
+        producto = db.session.get(Producto, id_producto)
+        if producto is None:
+            raise ErrorVenta(f"❌ El producto #{id_producto} no existe.")
+        resueltas.append((producto, cantidad, cantidad * producto.precio))
+    return resueltas
+
+
+def reservar_por_linea(id_tienda, pedido, nombres=None, tipo="venta", id_venta=None, nota=None):
+    """Estrategia anterior: SELECT + UPDATE de Inventario por línea (mismo registro en el libro)."""
+    for id_producto, cantidad in pedido.items():
+        inventario = Inventario.query.filter_by(id_producto=id_producto, id_tienda=id_tienda).first()
+        if inventario is None or inventario.cantidad < cantidad:
+            raise StockInsuficiente([{"id_producto": id_producto, "solicitado": cantidad,
+                                      "disponible": inventario and inventario.cantidad}], nombres)
+        inventario.cantidad -= cantidad
+        db.session.flush()
+    movimientos.registrar(tipo, {(p, id_tienda): -n for p, n in pedido.items()}, id_venta=id_venta, nota=nota)
+
+
+def por_linea():
+    return mock.patch.multiple(rutas_venta, resolver_lineas=resolver_por_linea, reservar_stock=reservar_por_linea)
+
+
+def medir(cliente, lineas, estrategia=None):
+    """(sentencias por tipo, ms) de un POST /venta/nuevo con `lineas` productos."""
+    datos = {"id_cliente": 1, "id_tienda": 1}
+    for i in range(lineas):
+        datos[f"detalles[{i}][id_producto]"] = i + 1
+        datos[f"detalles[{i}][cantidad]"] = 1
+
+    hilo = threading.get_ident()
+    sentencias = Counter()
+
+    def contar(conn, cursor, statement, *_):
+        if threading.get_ident() == hilo:
+            sentencias[statement.lstrip().split(None, 1)[0].upper()] += 1
+
+    event.listen(db.engine, "before_cursor_execute", contar)
+    inicio = time.perf_counter()
+    try:
+        with estrategia or nullcontext():
+            respuesta = cliente.post("/venta/nuevo", data=datos)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", contar)
+    assert respuesta.status_code == 302 and not respuesta.headers["Location"].endswith("/venta/nuevo"), \
+        "la ruta rechazó la venta"
+    return sentencias, (time.perf_counter() - inicio) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lineas", type=int, nargs="+", default=[10, 50, 100, 150])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        app = crear_app(directorio)
+        with app.app_context():
+            poblar(max(args.lineas))
+        cliente = app.test_client()
+        with cliente.session_transaction() as s:
+            s.update(user_id=1, username="admin", rol="administrador")
+
+        with app.app_context():
+            print(f"{'líneas':>7} | {'antes (consultas)':>18} | {'después (consultas)':>20} | "
+                  f"{'después por tipo':<36} | {'antes ms':>9} | {'después ms':>10}")
+            for n in args.lineas:
+                antes, t_antes = medir(cliente, n, por_linea())
+                despues, t_despues = medir(cliente, n)
+                tipos = " ".join(f"{tipo}={veces}" for tipo, veces in sorted(despues.items()))
+                print(f"{n:>7} | {sum(antes.values()):>18} | {sum(despues.values()):>20} | "
+                      f"{tipos:<36} | {t_antes:>9.1f} | {t_despues:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# config.py
+"""
+Perfiles de configuración (dev / test / prod) para create_app().
+
+El perfil se elige con APP_ENV (default "dev") y cualquier valor se puede
+sobrescribir con variables de entorno, p. ej. para dimensionar el pool de
+cada worker de gunicorn:
+
+    APP_ENV=prod DATABASE_URL=mysql+pymysql://app:***@db/inventario_pymes \\
+    DB_POOL_SIZE=5 DB_MAX_OVERFLOW=5 gunicorn -w 4 "app:create_app()"
+
+Variables reconocidas:
+    DATABASE_URL              URI de SQLAlchemy (MySQL, o sqlite:///archivo.db para pruebas locales)
+    SECRET_KEY                clave de sesión (obligatoria en prod)
+    DB_POOL_SIZE              conexiones permanentes por proceso
+    DB_MAX_OVERFLOW           conexiones extra en picos
+    DB_POOL_TIMEOUT           segundos esperando una conexión libre
+    DB_POOL_RECYCLE           segundos antes de renovar una conexión (menor que wait_timeout de MySQL)
+    DB_POOL_PRE_PING          1/0: verificar la conexión antes de usarla
+    DB_STATEMENT_TIMEOUT_MS   tiempo máximo por consulta (MySQL: max_execution_time, solo SELECT)
+    AUDITORIA_RETENCION_DIAS  días que la auditoría queda en la tabla activa antes de archivarse
+    VENTAS_LOTE               ventas por transacción en la ingesta JSON de los terminales (/venta/api/lote)
+"""
+import os
+from datetime import timedelta
+
+MYSQL_LOCAL = "mysql+pymysql://root:@localhost/inventario_pymes"
+
+
+class Config:
+    SECRET_KEY = "supersecretkey123"  # ⚠️ solo desarrollo: en prod se exige SECRET_KEY
+    SQLALCHEMY_DATABASE_URI = MYSQL_LOCAL
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    PERMANENT_SESSION_LIFETIME = timedelta(minutes=10)
+
+    DB_POOL_SIZE = 5
+    DB_MAX_OVERFLOW = 10
+    DB_POOL_TIMEOUT = 30
+    DB_POOL_RECYCLE = 3600
+    DB_POOL_PRE_PING = False
+    DB_STATEMENT_TIMEOUT_MS = 0  # 0 = sin límite
+    DB_SQLITE_TIMEOUT = 30  # segundos esperando un bloqueo de escritura en SQLite
+
+    AUDITORIA_RETENCION_DIAS = 365  # más antiguos pasan a auditoria_historica (flask archivar-auditoria)
+
+    VENTAS_LOTE = 500  # ventas por transacción en /venta/api/lote
+    VENTAS_LOTE_MAX = 10_000  # ventas por request; más que eso responde 413
+
+
+class DevConfig(Config):
+    DEBUG = True
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = "sqlite://"
+    SQL_PERFIL_MUESTREO = 0.0
+
+
+class ProdConfig(Config):
+    SECRET_KEY = None
+    DB_POOL_SIZE = 10
+    DB_MAX_OVERFLOW = 20
+    DB_POOL_RECYCLE = 280  # bajo el wait_timeout típico de MySQL administrado (300 s)
+    DB_POOL_PRE_PING = True
+    DB_STATEMENT_TIMEOUT_MS = 30_000
+    SQL_PERFIL_MUESTREO = 0.01
+
+
+PERFILES = {"dev": DevConfig, "test": TestConfig, "prod": ProdConfig}
+
+# Variable de entorno -> (clave de config, conversión)
+_ENTORNO = {
+    "DATABASE_URL": ("SQLALCHEMY_DATABASE_URI", str),
+    "SECRET_KEY": ("SECRET_KEY", str),
+    "DB_POOL_SIZE": ("DB_POOL_SIZE", int),
+    "DB_MAX_OVERFLOW": ("DB_MAX_OVERFLOW", int),
+    "DB_POOL_TIMEOUT": ("DB_POOL_TIMEOUT", int),
+    "DB_POOL_RECYCLE": ("DB_POOL_RECYCLE", int),
+    "DB_POOL_PRE_PING": ("DB_POOL_PRE_PING", lambda v: v.strip().lower() in ("1", "true", "si", "sí", "yes")),
+    "DB_STATEMENT_TIMEOUT_MS": ("DB_STATEMENT_TIMEOUT_MS", int),
+    "SQL_PERFIL_MUESTREO": ("SQL_PERFIL_MUESTREO", float),
+    "AUDITORIA_RETENCION_DIAS": ("AUDITORIA_RETENCION_DIAS", int),
+    "VENTAS_LOTE": ("VENTAS_LOTE", int),
+}
+
+
+def cargar_config(perfil=None):
+    """dict de configuración del perfil (APP_ENV por defecto) con los overrides del entorno."""
+    perfil = perfil or os.environ.get("APP_ENV", "dev")
+    if perfil not in PERFILES:
+        raise ValueError(f"Perfil desconocido: {perfil} (usa {', '.join(PERFILES)})")
+
+    clase = PERFILES[perfil]
+    config = {k: getattr(clase, k) for k in dir(clase) if k.isupper()}
+    for variable, (clave, convertir) in _ENTORNO.items():
+        if os.environ.get(variable):
+            config[clave] = convertir(os.environ[variable])
+    config["APP_ENV"] = perfil
+
+    if perfil == "prod" and not config.get("SECRET_KEY"):
+        raise RuntimeError("En producción se debe definir SECRET_KEY en el entorno.")
+    return config
+
+
+def opciones_engine(config):
+    """SQLALCHEMY_ENGINE_OPTIONS según el motor: pool en MySQL, timeout de bloqueo en SQLite."""
+    uri = config["SQLALCHEMY_DATABASE_URI"]
+    opciones = {"pool_pre_ping": config["DB_POOL_PRE_PING"]}
+
+    if uri.startswith("sqlite"):
+        # SQLite no usa pool de red: solo esperar bloqueos en vez de fallar de inmediato
+        opciones["connect_args"] = {"timeout": config["DB_SQLITE_TIMEOUT"]}
+        return opciones
+
+    opciones.update(
+        pool_size=config["DB_POOL_SIZE"],
+        max_overflow=config["DB_MAX_OVERFLOW"],
+        pool_timeout=config["DB_POOL_TIMEOUT"],
+        pool_recycle=config["DB_POOL_RECYCLE"],
+    )
+    timeout_ms = config["DB_STATEMENT_TIMEOUT_MS"]
+    if timeout_ms and uri.startswith("mysql"):
+        opciones["connect_args"] = {"init_command": f"SET SESSION max_execution_time={int(timeout_ms)}"}
+    elif timeout_ms and uri.startswith("postgresql"):
+        opciones["connect_args"] = {"options": f"-c statement_timeout={int(timeout_ms)}"}
+    return opciones
@@ -1,6 +1,10 @@
 from extensions import db
-from datetime import date
-from sqlalchemy import event
+from datetime import date, datetime
+from decimal import Decimal
+from sqlalchemy import bindparam, event, inspect
+from sqlalchemy.orm import object_session
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
 from werkzeug.security import generate_password_hash, check_password_hash
 
 # ====================================================
@@ -105,6 +109,9 @@ class Inventario(db.Model):
     __table_args__ = (
         db.CheckConstraint('cantidad >= 0', name='ck_inventario_cantidad_no_negativa'),
         db.UniqueConstraint('id_producto', 'id_tienda', name='uq_inventario_producto_tienda'),
+        # Inventario de una tienda (reportes, contadores por tienda); el índice
+        # único de arriba cubre la búsqueda por producto y la reserva de stock.
+        db.Index('ix_inventario_tienda_producto', 'id_tienda', 'id_producto'),
     )
 
     def __repr__(self) -> str:
@@ -130,6 +137,13 @@ class Venta(db.Model):
         passive_deletes=True
     )
 
+    __table_args__ = (
+        # Filtros de reportes: rango de fechas, con o sin cliente
+        db.Index('ix_venta_fecha', 'fecha'),
+        db.Index('ix_venta_cliente_fecha', 'id_cliente', 'fecha'),
+        db.Index('ix_venta_tienda_fecha', 'id_tienda', 'fecha'),
+    )
+
     def __repr__(self) -> str:
         return f"<Venta #{self.id_venta} total={self.total}>"
 
@@ -148,11 +162,80 @@ class DetalleVenta(db.Model):
     __table_args__ = (
         db.CheckConstraint('cantidad > 0', name='ck_detalle_cantidad_positiva'),
         db.CheckConstraint('subtotal >= 0', name='ck_detalle_subtotal_no_negativo'),
+        # Detalles de una venta (joins, recálculo de totales) y ventas de un producto
+        db.Index('ix_detalle_venta_producto', 'id_venta', 'id_producto'),
+        db.Index('ix_detalle_producto', 'id_producto'),
     )
 
     def __repr__(self) -> str:
         return f"<DetVenta venta={self.id_venta} prod={self.id_producto} cant={self.cantidad} sub={self.subtotal}>"
 
+# ====================================================
+# LIBRO DE MOVIMIENTOS DE STOCK (ver utils/movimientos.py)
+# ====================================================
+class MovimientoStock(db.Model):
+    """
+    Registro inmutable de cada cambio de stock de un producto en una tienda.
+    Inventario.cantidad es el saldo materializado de estos movimientos y
+    Producto.stock la suma de los saldos de todas las tiendas.
+    tipo: venta | devolucion | ajuste | transferencia | importacion
+    """
+    __tablename__ = "movimiento_stock"
+
+    id_movimiento = db.Column(db.BigInteger().with_variant(db.Integer, "sqlite"), primary_key=True)
+    fecha_hora = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    tipo = db.Column(db.String(20), nullable=False)
+    # Sin claves foráneas: el libro no se borra junto con la venta, el producto o la tienda
+    id_producto = db.Column(db.Integer, nullable=False)
+    id_tienda = db.Column(db.Integer, nullable=False)
+    cantidad = db.Column(db.Integer, nullable=False)  # + entra, - sale
+    id_venta = db.Column(db.Integer, nullable=True)
+    usuario_id = db.Column(db.Integer, nullable=True)
+    nota = db.Column(db.String(200), nullable=True)
+
+    __table_args__ = (
+        # Historial de un producto en una tienda y reproducción desde un corte
+        db.Index('ix_movimiento_producto_tienda', 'id_producto', 'id_tienda', 'id_movimiento'),
+        db.Index('ix_movimiento_fecha_hora', 'fecha_hora'),
+        db.Index('ix_movimiento_tienda_fecha', 'id_tienda', 'fecha_hora'),
+    )
+
+    def __repr__(self) -> str:
+        return f"<Movimiento {self.tipo} prod={self.id_producto} tienda={self.id_tienda} {self.cantidad:+d}>"
+
+class CorteStock(db.Model):
+    """
+    Foto periódica de los saldos: incluye todos los movimientos hasta id_movimiento_hasta.
+    movimientos: cuántos movimientos del rango (corte anterior, id_movimiento_hasta]
+    había al calcularla; si después aparecen más, el corte quedó incompleto.
+    """
+    __tablename__ = "corte_stock"
+
+    id_corte = db.Column(db.Integer, primary_key=True)
+    fecha_hora = db.Column(db.DateTime, nullable=False)  # fecha del último movimiento incluido
+    id_movimiento_hasta = db.Column(db.BigInteger().with_variant(db.Integer, "sqlite"), nullable=False)
+    movimientos = db.Column(db.Integer, nullable=False, default=0)
+    creado = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (
+        db.Index('ix_corte_stock_fecha_hora', 'fecha_hora'),
+    )
+
+    def __repr__(self) -> str:
+        return f"<CorteStock #{self.id_corte} hasta={self.id_movimiento_hasta} {self.fecha_hora}>"
+
+class SaldoCorte(db.Model):
+    """Saldo distinto de cero de un producto en una tienda en un corte."""
+    __tablename__ = "saldo_corte"
+
+    id_corte = db.Column(db.Integer, db.ForeignKey("corte_stock.id_corte", ondelete="CASCADE"), primary_key=True)
+    id_producto = db.Column(db.Integer, primary_key=True)
+    id_tienda = db.Column(db.Integer, primary_key=True)
+    cantidad = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<SaldoCorte corte={self.id_corte} prod={self.id_producto} tienda={self.id_tienda} cant={self.cantidad}>"
+
 # ====================================================
 # MODELO DE AUDITORÍA
 # ====================================================
@@ -168,16 +251,229 @@ class Auditoria(db.Model):
     detalles_json = db.Column(db.JSON, nullable=True)
     ip = db.Column(db.String(64), nullable=True)
 
+    __table_args__ = (
+        # Vista y exportación ordenadas por fecha (keyset fecha_hora, id), con o sin filtros
+        db.Index('ix_auditoria_fecha_hora', 'fecha_hora'),
+        db.Index('ix_auditoria_accion_fecha', 'accion', 'fecha_hora'),
+        db.Index('ix_auditoria_usuario_fecha', 'usuario_id', 'fecha_hora'),
+    )
+
     def __repr__(self) -> str:
         return f"<Auditoria {self.accion} {self.fecha_hora}>"
 
+class AuditoriaHistorica(db.Model):
+    """Registros de auditoría antiguos movidos fuera de la tabla activa (ver utils/auditoria.py)."""
+    __tablename__ = "auditoria_historica"
+
+    id_auditoria = db.Column(db.Integer, primary_key=True, autoincrement=False)  # mismo id que tenía en auditoria
+    fecha_hora = db.Column(db.DateTime, nullable=False)
+    usuario_id = db.Column(db.Integer, nullable=True)
+    usuario_nombre = db.Column(db.String(120), nullable=True)
+    accion = db.Column(db.String(100), nullable=False)
+    detalles = db.Column(db.Text, nullable=True)
+    detalles_json = db.Column(db.JSON, nullable=True)
+    ip = db.Column(db.String(64), nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_auditoria_historica_fecha_hora', 'fecha_hora'),
+    )
+
+    def __repr__(self) -> str:
+        return f"<AuditoriaHistorica {self.accion} {self.fecha_hora}>"
+
+# ====================================================
+# TRABAJOS EN SEGUNDO PLANO (reportes pesados, mantención)
+# ====================================================
+class Trabajo(db.Model):
+    __tablename__ = "trabajos"
+
+    id_trabajo = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(50), nullable=False)           # reporte | recalcular_totales
+    parametros = db.Column(db.JSON, nullable=True)
+    estado = db.Column(db.String(20), nullable=False, default="pendiente", index=True)
+    # pendiente | ejecutando | completado | error | cancelado
+    progreso = db.Column(db.Integer, nullable=False, default=0)  # filas / registros procesados
+    mensaje = db.Column(db.String(255), nullable=True)
+    cancelar = db.Column(db.Boolean, nullable=False, default=False)
+    archivo = db.Column(db.String(255), nullable=True)          # ruta del resultado en disco
+    nombre_descarga = db.Column(db.String(120), nullable=True)
+    proceso = db.Column(db.String(120), nullable=True)          # host:pid que lo ejecuta
+    usuario_id = db.Column(db.Integer, nullable=True, index=True)
+    creado = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+    iniciado = db.Column(db.DateTime, nullable=True)
+    terminado = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self) -> dict:
+        return {
+            "id_trabajo": self.id_trabajo,
+            "tipo": self.tipo,
+            "parametros": self.parametros,
+            "estado": self.estado,
+            "progreso": self.progreso,
+            "mensaje": self.mensaje,
+            "creado": self.creado.isoformat() if self.creado else None,
+            "iniciado": self.iniciado.isoformat() if self.iniciado else None,
+            "terminado": self.terminado.isoformat() if self.terminado else None,
+            "descargable": self.estado == "completado" and bool(self.archivo),
+        }
+
+    def __repr__(self) -> str:
+        return f"<Trabajo #{self.id_trabajo} {self.tipo} {self.estado}>"
+
+# ====================================================
+# RESUMEN DE INDICADORES (KPI) DEL DASHBOARD
+# ====================================================
+class ResumenKPI(db.Model):
+    """
+    Contadores precalculados que se mantienen en cada escritura.
+    clave: productos | stock_tienda | ventas_dia | ventas_mes |
+           ingresos_dia | ingresos_mes | ingresos_tienda
+    id_tienda = 0 y periodo = '' cuando el contador es global.
+    """
+    __tablename__ = "resumen_kpi"
+
+    id_kpi = db.Column(db.Integer, primary_key=True)
+    clave = db.Column(db.String(30), nullable=False)
+    id_tienda = db.Column(db.Integer, nullable=False, default=0)
+    periodo = db.Column(db.String(10), nullable=False, default="")  # '', 'YYYY-MM' o 'YYYY-MM-DD'
+    valor = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('clave', 'id_tienda', 'periodo', name='uq_resumen_kpi'),
+    )
+
+    def __repr__(self) -> str:
+        return f"<ResumenKPI {self.clave} tienda={self.id_tienda} periodo={self.periodo} valor={self.valor}>"
+
+# ====================================================
+# RESUMEN DIARIO DE VENTAS (ver utils/ventas_diarias.py)
+# ====================================================
+class VentaDiaria(db.Model):
+    """
+    Unidades e ingresos por (fecha, tienda, producto), mantenidos por
+    diferencias en cada escritura de ventas. Los reportes agregados leen
+    solo esta tabla; `flask reconstruir-ventas-diarias` la recalcula.
+    """
+    __tablename__ = "ventas_diarias"
+
+    fecha = db.Column(db.Date, primary_key=True)
+    id_tienda = db.Column(db.Integer, primary_key=True)
+    id_producto = db.Column(db.Integer, primary_key=True)
+    unidades = db.Column(db.Integer, nullable=False, default=0)
+    ingresos = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+
+    __table_args__ = (
+        # La PK (fecha, tienda, producto) cubre los rangos de fechas; esta, las ventas de un producto
+        db.Index('ix_ventas_diarias_producto_fecha', 'id_producto', 'fecha'),
+    )
+
+    def __repr__(self) -> str:
+        return f"<VentaDiaria {self.fecha} tienda={self.id_tienda} prod={self.id_producto} uds={self.unidades}>"
+
+# ====================================================
+# ÍNDICE DE BÚSQUEDA DE PRODUCTOS (ver utils/busqueda_productos.py)
+# ====================================================
+class PalabraProducto(db.Model):
+    """
+    Una fila por palabra del nombre de cada producto (minúsculas, sin
+    tildes). La búsqueda de los formularios de venta recorre rangos de esta
+    PK ('lec' <= palabra < 'led') para encontrar coincidencias dentro del
+    nombre sin un LIKE '%...%' sobre todo el catálogo.
+    """
+    __tablename__ = "producto_palabras"
+
+    palabra = db.Column(db.String(100), primary_key=True)
+    id_producto = db.Column(
+        db.Integer, db.ForeignKey("Producto.id_producto", ondelete="CASCADE"), primary_key=True
+    )
+
+    __table_args__ = (
+        # Reindexar un producto borra sus palabras por id_producto
+        db.Index('ix_producto_palabras_producto', 'id_producto'),
+    )
+
+    def __repr__(self) -> str:
+        return f"<PalabraProducto {self.palabra!r} prod={self.id_producto}>"
+
+# ====================================================
+# VERSIONES DE DATOS (INVALIDACIÓN DE CACHÉ ENTRE WORKERS)
+# ====================================================
+class VersionDatos(db.Model):
+    """Contador por conjunto de datos; cada escritura lo incrementa."""
+    __tablename__ = "version_datos"
+
+    nombre = db.Column(db.String(50), primary_key=True)  # clientes | productos | tiendas | proveedores
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self) -> str:
+        return f"<VersionDatos {self.nombre} v{self.version}>"
+
 # ====================================================
 # ACTUALIZACIÓN AUTOMÁTICA DE TOTALES DE VENTA
 # ====================================================
-@event.listens_for(Venta.detalles, "append")
-@event.listens_for(Venta.detalles, "remove")
-def actualizar_total(venta, *_):
-    if venta and venta.detalles:
-        venta.total = sum(d.subtotal for d in venta.detalles)
-    else:
-        venta.total = 0
+# Venta.total es la suma de los subtotales de sus detalles y se mantiene por
+# diferencias: al insertar, modificar o borrar un DetalleVenta se suma o
+# resta solo ese subtotal con un UPDATE sobre la venta, sin cargar
+# Venta.detalles. Una venta nueva se crea con total=0 y sus detalles lo
+# completan. Los INSERT en bloque (insert(DetalleVenta) con una lista de
+# filas) no pasan por estos eventos: usan sumar_a_totales() (ver
+# utils/ventas.insertar_filas_detalle). `flask recalcular-totales` sigue
+# disponible para reparar datos.
+_SUMAR_TOTAL = (
+    Venta.__table__.update()
+    .where(Venta.__table__.c.id_venta == bindparam("v"))
+    .values(total=Venta.__table__.c.total + bindparam("d"))
+)
+
+
+def _decimal(valor):
+    return Decimal(str(valor or 0))
+
+
+def _sumar(conexion, sesion, deltas):
+    """UPDATE Venta SET total = total + :d por venta (executemany) y sincroniza las Venta cargadas."""
+    filas = [{"v": v, "d": d} for v, d in sorted(deltas.items()) if v is not None and d]
+    if not filas:
+        return
+    conexion.execute(_SUMAR_TOTAL, filas)
+    for fila in filas:
+        venta = sesion.identity_map.get(identity_key(Venta, fila["v"])) if sesion else None
+        if venta is not None and "total" in venta.__dict__ and venta not in sesion.deleted:
+            set_committed_value(venta, "total", _decimal(venta.total) + fila["d"])
+
+
+def sumar_a_totales(deltas):
+    """Suma {id_venta: delta} a Venta.total dentro de la transacción de db.session."""
+    _sumar(db.session.connection(), db.session(), {v: _decimal(d) for v, d in deltas.items()})
+
+
+def _sesion_sin_venta_borrada(detalle, id_venta):
+    """Si la venta del detalle también se está borrando no hace falta ajustar su total."""
+    sesion = object_session(detalle)
+    venta = sesion.identity_map.get(identity_key(Venta, id_venta)) if sesion else None
+    return venta is None or venta not in sesion.deleted
+
+
+@event.listens_for(DetalleVenta, "after_insert")
+def _detalle_insertado(mapper, conexion, detalle):
+    _sumar(conexion, object_session(detalle), {detalle.id_venta: _decimal(detalle.subtotal)})
+
+
+@event.listens_for(DetalleVenta, "after_delete")
+def _detalle_borrado(mapper, conexion, detalle):
+    if _sesion_sin_venta_borrada(detalle, detalle.id_venta):
+        _sumar(conexion, object_session(detalle), {detalle.id_venta: -_decimal(detalle.subtotal)})
+
+
+@event.listens_for(DetalleVenta, "after_update")
+def _detalle_modificado(mapper, conexion, detalle):
+    venta = inspect(detalle).attrs.id_venta.history
+    subtotal = inspect(detalle).attrs.subtotal.history
+    if not (venta.has_changes() or subtotal.has_changes()):
+        return
+    anterior_venta = venta.deleted[0] if venta.deleted else detalle.id_venta
+    anterior_subtotal = subtotal.deleted[0] if subtotal.deleted else detalle.subtotal
+
+    deltas = {anterior_venta: -_decimal(anterior_subtotal)}
+    deltas[detalle.id_venta] = deltas.get(detalle.id_venta, 0) + _decimal(detalle.subtotal)
+    _sumar(conexion, object_session(detalle), deltas)
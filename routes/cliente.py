@@ -1,6 +1,8 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from models import db, Cliente
 from utils.security import require_roles  # 🔐 Control de roles
+from utils.cache import invalidar  # 🗂️ invalida la lista cacheada de clientes
+from utils.cola_auditoria import auditar  # 📜 auditoría en segundo plano
 
 cliente_bp = Blueprint('cliente', __name__, url_prefix='/cliente')
 
@@ -28,7 +30,9 @@ def nuevo_cliente():
 
         nuevo = Cliente(nombre=nombre, email=email, telefono=telefono)
         db.session.add(nuevo)
+        invalidar("clientes")
         db.session.commit()
+        auditar("crear_cliente", f"Cliente #{nuevo.id_cliente} «{nombre}»", id_cliente=nuevo.id_cliente, nombre=nombre)
         flash("Cliente creado correctamente ✅", "success")
         return redirect(url_for("cliente.index"))
 
@@ -46,7 +50,9 @@ def editar_cliente(id):
         cliente.email = request.form.get("email", "").strip()
         cliente.telefono = request.form.get("telefono", "").strip()
 
+        invalidar("clientes")
         db.session.commit()
+        auditar("editar_cliente", f"Cliente #{id} «{cliente.nombre}»", id_cliente=id, nombre=cliente.nombre)
         flash("Cliente actualizado correctamente ✅", "success")
         return redirect(url_for("cliente.index"))
 
@@ -59,6 +65,8 @@ def editar_cliente(id):
 def eliminar_cliente(id):
     cliente = Cliente.query.get_or_404(id)
     db.session.delete(cliente)
+    invalidar("clientes")
     db.session.commit()
+    auditar("eliminar_cliente", f"Cliente #{id} «{cliente.nombre}»", id_cliente=id, nombre=cliente.nombre)
     flash("Cliente eliminado correctamente ✅", "success")
     return redirect(url_for("cliente.index"))
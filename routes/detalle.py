@@ -1,16 +1,18 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
-from models import db, DetalleVenta, Venta, Producto, Cliente, Tienda
+from models import db, DetalleVenta, Venta, Producto
 from utils.security import require_roles
+from utils.kpi import registrar_venta, ajustar_total_venta
+from utils.ventas_diarias import sumar_ventas  # 📅 resumen diario para reportes
+from utils.cache import obtener_lista, invalidar
+from utils.ventas import ErrorVenta
+from utils.stock import bloquear_stock, reservar_stock, devolver_stock  # 📦 Inventario de la tienda + libro de movimientos
+from utils.cola_auditoria import auditar  # 📜 auditoría en segundo plano
 
 detalle_bp = Blueprint('detalle', __name__, url_prefix='/detalle')
 
 @detalle_bp.route("/nuevo", methods=["GET", "POST"])
 @require_roles('administrador')
 def nuevo_detalle():
-    clientes = Cliente.query.all()
-    productos = Producto.query.all()
-    tiendas = Tienda.query.all()
-
     if request.method == "POST":
         try:
             id_cliente = int(request.form.get("id_cliente", 0))
@@ -25,6 +27,8 @@ def nuevo_detalle():
 
             total_venta = 0
             detalles = {}
+            pedido = {}
+            nombres = {}
 
             for key, value in request.form.items():
                 if key.startswith("detalles"):
@@ -37,11 +41,8 @@ def nuevo_detalle():
                 id_producto = int(d["id_producto"])
                 cantidad = int(d["cantidad"])
                 producto = Producto.query.get_or_404(id_producto)
-
-                if producto.stock < cantidad:
-                    flash(f"❌ Stock insuficiente para {producto.nombre}", "danger")
-                    db.session.rollback()
-                    return redirect(url_for("detalle.nuevo_detalle"))
+                pedido[id_producto] = pedido.get(id_producto, 0) + cantidad
+                nombres[id_producto] = producto.nombre
 
                 subtotal = producto.precio * cantidad
                 total_venta += subtotal
@@ -53,26 +54,40 @@ def nuevo_detalle():
                     subtotal=subtotal
                 )
                 db.session.add(detalle)
-                producto.stock -= cantidad
 
-            venta.total = total_venta
+            # Stock de la tienda de la venta: todo o nada, registrado en el libro
+            reservar_stock(id_tienda, pedido, nombres=nombres, id_venta=venta.id_venta)
+
+            db.session.flush()  # los eventos de models.py suman cada subtotal a venta.total
+            registrar_venta(venta)
+            sumar_ventas([venta.id_venta])
+            invalidar("ventas", "inventario")
             db.session.commit()
+            auditar("crear_detalle", f"Venta #{venta.id_venta} con {len(detalles)} detalle(s), total={total_venta}",
+                    id_venta=venta.id_venta, id_cliente=id_cliente, id_tienda=id_tienda, total=total_venta)
             flash("✅ Detalle registrado correctamente.", "success")
             return redirect(url_for("dashboard"))
 
+        except ErrorVenta as e:
+            db.session.rollback()
+            flash(str(e), "danger")
+            return redirect(url_for("detalle.nuevo_detalle"))
         except Exception as e:
             db.session.rollback()
             flash(f"⚠️ Error: {str(e)}", "danger")
             return redirect(url_for("detalle.nuevo_detalle"))
 
-    return render_template("nuevo_detalle.html", clientes=clientes, productos=productos, tiendas=tiendas)
+    return render_template(
+        "nuevo_detalle.html",
+        clientes=obtener_lista("clientes"),
+        productos=obtener_lista("productos"),
+        tiendas=obtener_lista("tiendas"),
+    )
 
 @detalle_bp.route("/editar/<int:id_detalle>", methods=["GET", "POST"])
 @require_roles('administrador')
 def editar_detalle(id_detalle):
     detalle = DetalleVenta.query.get_or_404(id_detalle)
-    ventas = Venta.query.all()
-    productos = Producto.query.all()
 
     if request.method == "POST":
         try:
@@ -81,23 +96,51 @@ def editar_detalle(id_detalle):
             cantidad = int(request.form["cantidad"])
             producto = Producto.query.get_or_404(id_producto)
 
+            # El detalle puede cambiar de venta: se ajustan los totales de ambas
+            ventas = {detalle.id_venta: detalle.venta, id_venta: Venta.query.get_or_404(id_venta)}
+            totales_anteriores = {v.id_venta: v.total for v in ventas.values()}
+            venta_anterior = detalle.venta
+            bloquear_stock([(detalle.id_producto, venta_anterior.id_tienda), (id_producto, ventas[id_venta].id_tienda)])
+            sumar_ventas(ventas, signo=-1)
+
+            # Stock: se devuelve la línea anterior a su tienda y se reserva la nueva
+            devolver_stock(venta_anterior.id_tienda, {detalle.id_producto: detalle.cantidad},
+                           id_venta=venta_anterior.id_venta, nota=f"edición de detalle #{id_detalle}")
+            reservar_stock(ventas[id_venta].id_tienda, {id_producto: cantidad}, nombres={id_producto: producto.nombre},
+                           id_venta=id_venta)
+
             detalle.id_venta = id_venta
             detalle.id_producto = id_producto
             detalle.cantidad = cantidad
             detalle.subtotal = producto.precio * cantidad
 
-            venta = Venta.query.get_or_404(id_venta)
-            venta.total = sum(d.subtotal for d in venta.detalles)
+            db.session.flush()  # los eventos de models.py aplican la diferencia a Venta.total
+            for venta in ventas.values():
+                ajustar_total_venta(venta, totales_anteriores[venta.id_venta])
+            sumar_ventas(ventas)
+            invalidar("ventas", "inventario")
 
             db.session.commit()
+            auditar("editar_detalle", f"Detalle #{id_detalle} de la venta #{id_venta}",
+                    id_detalle=id_detalle, id_venta=id_venta, id_producto=id_producto, cantidad=cantidad,
+                    subtotal=detalle.subtotal)
             flash("✅ Detalle actualizado correctamente.", "success")
             return redirect(url_for("dashboard"))
+        except ErrorVenta as e:
+            db.session.rollback()
+            flash(str(e), "danger")
+            return redirect(url_for("detalle.editar_detalle", id_detalle=id_detalle))
         except Exception as e:
             db.session.rollback()
             flash(f"⚠️ Error al actualizar: {str(e)}", "danger")
             return redirect(url_for("detalle.editar_detalle", id_detalle=id_detalle))
 
-    return render_template("editar_detalle.html", detalle=detalle, ventas=ventas, productos=productos)
+    return render_template(
+        "editar_detalle.html",
+        detalle=detalle,
+        ventas=Venta.query.all(),
+        productos=obtener_lista("productos"),
+    )
 
 @detalle_bp.route("/eliminar/<int:id_detalle>", methods=["POST"])
 @require_roles('administrador')
@@ -107,10 +150,19 @@ def eliminar_detalle(id_detalle):
     venta = detalle.venta
 
     try:
-        producto.stock += detalle.cantidad
+        devolver_stock(venta.id_tienda, {detalle.id_producto: detalle.cantidad},
+                       id_venta=venta.id_venta, nota=f"detalle #{id_detalle} eliminado")
+        total_anterior = venta.total
+        sumar_ventas([venta.id_venta], signo=-1)
         db.session.delete(detalle)
-        venta.total = sum(d.subtotal for d in venta.detalles)
+        db.session.flush()  # los eventos de models.py restan el subtotal de venta.total
+        ajustar_total_venta(venta, total_anterior)
+        sumar_ventas([venta.id_venta])
+        invalidar("ventas", "inventario")
         db.session.commit()
+        auditar("eliminar_detalle", f"Detalle #{id_detalle} de la venta #{venta.id_venta}",
+                id_detalle=id_detalle, id_venta=venta.id_venta, id_producto=producto.id_producto,
+                cantidad=detalle.cantidad)
         flash("🗑️ Detalle eliminado correctamente.", "info")
     except Exception as e:
         db.session.rollback()
@@ -0,0 +1,55 @@
+# routes/importacion.py
+from flask import Blueprint, render_template, request, flash, jsonify
+import time
+
+from utils.security import require_roles  # 🔐 control de roles
+from utils.importacion import importar, leer_filas, ArchivoInvalido, TIPOS, MODOS_INVENTARIO  # 📥 carga masiva
+from utils.cola_auditoria import auditar  # 📜 auditoría en segundo plano
+
+importacion_bp = Blueprint('importacion', __name__, url_prefix='/admin/importar')
+
+
+def _quiere_json():
+    return request.accept_mimetypes.best == "application/json"
+
+
+# ---- Importación masiva de productos o inventario (solo administrador) ----
+@importacion_bp.route("/", methods=["GET", "POST"])
+@require_roles('administrador')
+def importar_archivo():
+    if request.method == "GET":
+        return render_template("importar.html", resultado=None)
+
+    tipo = request.form.get("tipo", "productos")
+    modo = request.form.get("modo", "reemplazar")
+    archivo = request.files.get("archivo")
+
+    error = None
+    if tipo not in TIPOS or modo not in MODOS_INVENTARIO:
+        error = "Tipo o modo de importación inválido."
+    elif not archivo or not archivo.filename:
+        error = "Selecciona un archivo .csv o .xlsx."
+    if error is None:
+        inicio = time.perf_counter()
+        try:
+            resultado = importar(tipo, leer_filas(archivo.stream, archivo.filename), modo=modo).como_dict()
+        except ArchivoInvalido as e:
+            error = str(e)
+    if error is not None:
+        if _quiere_json():
+            return jsonify({"error": error}), 400
+        flash(f"❌ {error}", "danger")
+        return render_template("importar.html", resultado=None), 400
+
+    resultado["segundos"] = round(time.perf_counter() - inicio, 2)
+    auditar(f"importar_{tipo}", f"Importación de {tipo} desde {archivo.filename}",
+            archivo=archivo.filename, modo=modo,
+            **{k: resultado[k] for k in ("procesadas", "insertadas", "actualizadas", "total_errores")})
+
+    if _quiere_json():
+        return jsonify(resultado)
+    if resultado["total_errores"]:
+        flash(f"⚠️ Importación terminada con {resultado['total_errores']} filas con error.", "warning")
+    else:
+        flash(f"✅ {resultado['procesadas']} filas importadas.", "success")
+    return render_template("importar.html", resultado=resultado, tipo=tipo)
@@ -1,6 +1,15 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from datetime import date, datetime, time
+
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from models import db, Inventario, Producto, Tienda
 from utils.security import require_roles  # 🔐 control de roles
+from utils.cache import obtener_lista, invalidar  # 🗂️ listas cacheadas / versión de datos
+from utils.stock import (  # 📦 cambios de Inventario registrados en el libro de movimientos
+    ingresar_stock, corregir_inventario, retirar_inventario, transferir_stock,
+)
+from utils.movimientos import saldos_al  # 📒 stock a una fecha pasada
+from utils.ventas import ErrorVenta
+from utils.cola_auditoria import auditar  # 📜 auditoría en segundo plano
 
 inventario_bp = Blueprint('inventario', __name__, url_prefix='/inventario')
 
@@ -10,40 +19,50 @@ inventario_bp = Blueprint('inventario', __name__, url_prefix='/inventario')
 @require_roles('usuario', 'administrador')
 def index():
     inventarios = obtener_datos_inventario()
-    return render_template("inventarios.html", inventarios=inventarios)
+    return render_template(
+        "inventarios.html",
+        inventarios=inventarios,
+        productos=obtener_lista("productos"),
+        tiendas=obtener_lista("tiendas"),
+    )
 
 
 # ---- Crear inventario (solo administrador) ----
 @inventario_bp.route("/nuevo", methods=["GET", "POST"])
 @require_roles('administrador')
 def nuevo_inventario():
-    productos = Producto.query.all()
-    tiendas = Tienda.query.all()
-
     if request.method == "POST":
         try:
             cantidad = int(request.form["cantidad"])
             id_producto = int(request.form["id_producto"])
             id_tienda = int(request.form["id_tienda"])
 
-            # validar duplicados por (producto, tienda)
+            # Si ya existe el par (producto, tienda) se suma; si no, se crea (un upsert + movimiento)
             existente = Inventario.query.filter_by(id_producto=id_producto, id_tienda=id_tienda).first()
+            ingresar_stock(id_tienda, {id_producto: cantidad}, nota="alta de inventario")
+            invalidar("inventario")
+            db.session.commit()
             if existente:
-                existente.cantidad += cantidad
-                db.session.commit()
+                auditar("editar_inventario", f"Inventario #{existente.id_inventario}: +{cantidad}",
+                        id_inventario=existente.id_inventario, id_producto=id_producto, id_tienda=id_tienda,
+                        suma=cantidad)
                 flash("Cantidad sumada al inventario existente.", "success")
                 return redirect(url_for("inventario.index"))
 
-            i = Inventario(cantidad=cantidad, id_producto=id_producto, id_tienda=id_tienda)
-            db.session.add(i)
-            db.session.commit()
+            i = Inventario.query.filter_by(id_producto=id_producto, id_tienda=id_tienda).one()
+            auditar("crear_inventario", f"Inventario #{i.id_inventario}: {cantidad}",
+                    id_inventario=i.id_inventario, id_producto=id_producto, id_tienda=id_tienda, cantidad=cantidad)
             flash("Inventario creado correctamente.", "success")
             return redirect(url_for("inventario.index"))
         except Exception as e:
             db.session.rollback()
             flash(f"Error al crear inventario: {e}", "danger")
 
-    return render_template("nuevo_inventario.html", productos=productos, tiendas=tiendas)
+    return render_template(
+        "nuevo_inventario.html",
+        productos=obtener_lista("productos"),
+        tiendas=obtener_lista("tiendas"),
+    )
 
 
 # ---- Editar inventario (solo administrador) ----
@@ -51,22 +70,32 @@ def nuevo_inventario():
 @require_roles('administrador')
 def editar_inventario(id_inventario):
     i = Inventario.query.get_or_404(id_inventario)
-    productos = Producto.query.all()
-    tiendas = Tienda.query.all()
 
     if request.method == "POST":
         try:
-            i.cantidad = int(request.form["cantidad"])
-            i.id_producto = int(request.form["id_producto"])
-            i.id_tienda = int(request.form["id_tienda"])
+            cantidad = int(request.form["cantidad"])
+            id_producto = int(request.form["id_producto"])
+            id_tienda = int(request.form["id_tienda"])
+            # Se registra la diferencia contra el valor vigente (fila bloqueada), no contra el del formulario
+            anterior = corregir_inventario(id_inventario, id_producto, id_tienda, cantidad,
+                                           nota=f"edición de inventario #{id_inventario}")
+            invalidar("inventario")
             db.session.commit()
+            auditar("editar_inventario", f"Inventario #{id_inventario}: {anterior} -> {cantidad}",
+                    id_inventario=id_inventario, id_producto=id_producto, id_tienda=id_tienda,
+                    anterior=anterior, cantidad=cantidad)
             flash("Inventario actualizado correctamente.", "success")
             return redirect(url_for("inventario.index"))
         except Exception as e:
             db.session.rollback()
             flash(f"Error al actualizar inventario: {e}", "danger")
 
-    return render_template("editar_inventario.html", inventario=i, productos=productos, tiendas=tiendas)
+    return render_template(
+        "editar_inventario.html",
+        inventario=i,
+        productos=obtener_lista("productos"),
+        tiendas=obtener_lista("tiendas"),
+    )
 
 
 # ---- Eliminar inventario (solo administrador, por POST) ----
@@ -74,9 +103,13 @@ def editar_inventario(id_inventario):
 @require_roles('administrador')
 def eliminar_inventario(id_inventario):
     i = Inventario.query.get_or_404(id_inventario)
+    id_producto, id_tienda = i.id_producto, i.id_tienda
     try:
-        db.session.delete(i)
+        cantidad = retirar_inventario(id_producto, id_tienda, nota=f"inventario #{id_inventario} eliminado")
+        invalidar("inventario")
         db.session.commit()
+        auditar("eliminar_inventario", f"Inventario #{id_inventario}",
+                id_inventario=id_inventario, id_producto=id_producto, id_tienda=id_tienda, cantidad=cantidad)
         flash("Inventario eliminado correctamente.", "info")
     except Exception as e:
         db.session.rollback()
@@ -84,6 +117,60 @@ def eliminar_inventario(id_inventario):
     return redirect(url_for("inventario.index"))
 
 
+# ---- Transferir unidades entre tiendas (solo administrador) ----
+@inventario_bp.route("/transferir", methods=["POST"])
+@require_roles('administrador')
+def transferir_inventario():
+    try:
+        id_producto = int(request.form["id_producto"])
+        origen = int(request.form["id_tienda_origen"])
+        destino = int(request.form["id_tienda_destino"])
+        cantidad = int(request.form["cantidad"])
+        if cantidad <= 0:
+            raise ErrorVenta("⚠️ La cantidad a transferir debe ser mayor que cero.")
+        producto = Producto.query.get_or_404(id_producto)
+        transferir_stock(id_producto, origen, destino, cantidad, nombres={id_producto: producto.nombre})
+        invalidar("inventario")
+        db.session.commit()
+        auditar("transferir_inventario", f"{cantidad} × «{producto.nombre}»: tienda #{origen} -> #{destino}",
+                id_producto=id_producto, origen=origen, destino=destino, cantidad=cantidad)
+        flash("🔁 Transferencia registrada correctamente.", "success")
+    except ErrorVenta as e:
+        db.session.rollback()
+        flash(str(e), "danger")
+    except Exception as e:
+        db.session.rollback()
+        flash(f"Error al transferir: {e}", "danger")
+    return redirect(url_for("inventario.index"))
+
+
+# ---- Stock a una fecha (JSON): ?fecha=AAAA-MM-DD[THH:MM]&id_tienda=&id_producto= ----
+@inventario_bp.route("/al")
+@require_roles('usuario', 'administrador')
+def stock_al():
+    texto = request.args.get("fecha", "").strip()
+    try:
+        if not texto:
+            fecha = None
+        elif len(texto) == 10:
+            fecha = datetime.combine(date.fromisoformat(texto), time.max)  # fin del día
+        else:
+            fecha = datetime.fromisoformat(texto)
+        id_tienda = request.args.get("id_tienda", type=int)
+        id_producto = request.args.get("id_producto", type=int)
+    except ValueError:
+        return jsonify({"error": f"fecha inválida: {texto!r}"}), 400
+
+    saldos = saldos_al(fecha, id_tienda=id_tienda, id_producto=id_producto)
+    return jsonify({
+        "fecha": fecha.isoformat() if fecha else None,
+        "saldos": [
+            {"id_producto": p, "id_tienda": t, "cantidad": n}
+            for (p, t), n in sorted(saldos.items())
+        ],
+    })
+
+
 # ---- Helper para el listado ----
 def obtener_datos_inventario():
     return db.session.query(
@@ -1,6 +1,10 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash
-from models import db, Producto, Proveedor
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from models import db, Producto
 from utils.security import require_roles  # <- Se importa nuevo decorador
+from utils.kpi import ajustar_productos
+from utils.cache import obtener_lista, invalidar
+from utils.cola_auditoria import auditar  # 📜 auditoría en segundo plano
+from utils import busqueda_productos  # 🔎 búsqueda incremental para los formularios de venta
 
 producto_bp = Blueprint('producto', __name__, url_prefix='/producto')
 
@@ -13,29 +17,52 @@ def index():
     return render_template("productos.html", productos=productos)
 
 
+# ---- Buscar productos (JSON para los formularios de venta) ----
+@producto_bp.route("/buscar")
+@require_roles('administrador')
+def buscar_productos():
+    """
+    ?q=texto&id_tienda=1&despues=<cursor>&limite=20
+    Retorna {"productos": [{id_producto, nombre, precio, stock, coincidencia}], "siguiente": cursor|null}.
+    """
+    limite = request.args.get("limite", busqueda_productos.LIMITE, type=int)
+    limite = max(1, min(limite, busqueda_productos.LIMITE_MAX))
+    productos, siguiente = busqueda_productos.buscar(
+        request.args.get("q", ""),
+        id_tienda=request.args.get("id_tienda", type=int),
+        despues=busqueda_productos.parse_cursor(request.args.get("despues")),
+        limite=limite,
+    )
+    return jsonify({"productos": productos, "siguiente": siguiente})
+
+
 # ---- Crear producto (solo administrador) ----
 @producto_bp.route("/nuevo", methods=["GET", "POST"])
 @require_roles('administrador')
 def nuevo_producto():
-    proveedores = Proveedor.query.all()
-
     if request.method == "POST":
         nombre = request.form["nombre"].strip()
         precio = float(request.form.get("precio", 0))
-        stock = int(request.form.get("stock", 0))
         id_proveedor = request.form.get("id_proveedor")
 
         if not nombre:
             flash("El nombre del producto es obligatorio.", "warning")
             return redirect(url_for("producto.nuevo_producto"))
 
-        pr = Producto(nombre=nombre, precio=precio, stock=stock, id_proveedor=id_proveedor)
+        # El stock se deriva del libro de movimientos: nace en 0 y crece al cargar inventario
+        pr = Producto(nombre=nombre, precio=precio, stock=0, id_proveedor=id_proveedor)
         db.session.add(pr)
+        db.session.flush()
+        busqueda_productos.indexar([(pr.id_producto, pr.nombre)])
+        ajustar_productos(1)
+        invalidar("productos")
         db.session.commit()
+        auditar("crear_producto", f"Producto #{pr.id_producto} «{pr.nombre}»",
+                id_producto=pr.id_producto, nombre=pr.nombre, precio=pr.precio)
         flash("Producto registrado correctamente.", "success")
         return redirect(url_for("producto.index"))
 
-    return render_template("nuevo_producto.html", proveedores=proveedores)
+    return render_template("nuevo_producto.html", proveedores=obtener_lista("proveedores"))
 
 
 # ---- Editar producto (solo administrador) ----
@@ -43,18 +70,20 @@ def nuevo_producto():
 @require_roles('administrador')
 def editar_producto(id):
     pr = Producto.query.get_or_404(id)
-    proveedores = Proveedor.query.all()
 
     if request.method == "POST":
         pr.nombre = request.form["nombre"].strip()
         pr.precio = float(request.form.get("precio", 0))
-        pr.stock = int(request.form.get("stock", 0))
         pr.id_proveedor = request.form.get("id_proveedor")
+        busqueda_productos.indexar([(pr.id_producto, pr.nombre)])
+        invalidar("productos")
         db.session.commit()
+        auditar("editar_producto", f"Producto #{pr.id_producto} «{pr.nombre}»",
+                id_producto=pr.id_producto, nombre=pr.nombre, precio=pr.precio)
         flash("Producto actualizado correctamente.", "success")
         return redirect(url_for("producto.index"))
 
-    return render_template("editar_producto.html", producto=pr, proveedores=proveedores)
+    return render_template("editar_producto.html", producto=pr, proveedores=obtener_lista("proveedores"))
 
 
 # ---- Eliminar producto (solo administrador, uso de POST) ----
@@ -62,7 +91,11 @@ def editar_producto(id):
 @require_roles('administrador')
 def eliminar_producto(id):
     pr = Producto.query.get_or_404(id)
+    busqueda_productos.quitar([id])
     db.session.delete(pr)
+    ajustar_productos(-1)
+    invalidar("productos")
     db.session.commit()
+    auditar("eliminar_producto", f"Producto #{id} «{pr.nombre}»", id_producto=id, nombre=pr.nombre)
     flash("Producto eliminado correctamente.", "info")
     return redirect(url_for("producto.index"))
@@ -2,6 +2,10 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash
 from sqlalchemy import and_
 from models import db, Proveedor
 from utils.security import require_roles  # 🔐 Control de roles
+from utils.cache import invalidar  # 🗂️ invalida la lista cacheada de proveedores
+from utils.cola_auditoria import auditar  # 📜 auditoría en segundo plano
+from utils.kpi import ajustar_productos
+from utils import busqueda_productos  # 🔎 índice de palabras de los productos
 
 proveedor_bp = Blueprint('proveedor', __name__, url_prefix='/proveedor')
 
@@ -55,7 +59,10 @@ def nuevo_proveedor():
                 ubicacion=ubicacion or None
             )
             db.session.add(nuevo)
+            invalidar("proveedores")
             db.session.commit()
+            auditar('crear_proveedor', f'Proveedor #{nuevo.id_proveedor} «{nombre}»',
+                    id_proveedor=nuevo.id_proveedor, nombre=nombre)
             flash('Proveedor creado correctamente ✅', 'success')
             return redirect(url_for('proveedor.index'))
         except Exception as e:
@@ -99,7 +106,9 @@ def editar_proveedor(id):
             proveedor.contacto = contacto
             proveedor.email = email
             proveedor.ubicacion = ubicacion or None
+            invalidar("proveedores")
             db.session.commit()
+            auditar('editar_proveedor', f'Proveedor #{id} «{nombre}»', id_proveedor=id, nombre=nombre)
             flash('Proveedor actualizado correctamente ✅', 'success')
             return redirect(url_for('proveedor.index'))
         except Exception as e:
@@ -116,8 +125,14 @@ def editar_proveedor(id):
 def eliminar_proveedor(id):
     proveedor = Proveedor.query.get_or_404(id)
     try:
+        ids = [pr.id_producto for pr in proveedor.productos]  # se eliminan en cascada con el proveedor
+        busqueda_productos.quitar(ids)
         db.session.delete(proveedor)
+        if ids:
+            ajustar_productos(-len(ids))
+        invalidar("proveedores", "productos")
         db.session.commit()
+        auditar('eliminar_proveedor', f'Proveedor #{id} «{proveedor.nombre}»', id_proveedor=id, nombre=proveedor.nombre)
         flash('Proveedor eliminado correctamente ✅', 'info')
     except Exception as e:
         db.session.rollback()
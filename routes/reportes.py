@@ -1,25 +1,39 @@
 # inventario_pymes/routes/reportes.py
-from flask import Blueprint, send_file, request, flash, redirect, url_for, session, render_template, make_response
-from io import BytesIO, StringIO
-import csv, json
-import pandas as pd
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+from flask import (
+    Blueprint, send_file, request, flash, redirect, url_for, session, render_template,
+    Response, stream_with_context,
+)
+import shutil
 from datetime import date
-from decimal import Decimal
 
-from models import db, Inventario, Producto, Tienda, Venta, Cliente, Proveedor, DetalleVenta, Auditoria
+from models import db, Inventario, Producto, Tienda, Venta, Cliente, Proveedor, DetalleVenta, Auditoria, VentaDiaria
 from utils.security import require_roles  # 🔐 permitir usuario/administrador
+from utils.kpi import reconciliar_kpis
+from utils.ventas_diarias import reconstruir as reconstruir_ventas_diarias  # 📅 resumen diario
+from utils.recalculo import recalcular_totales, TAMANO_LOTE as TAMANO_LOTE_RECALCULO
+from utils.trabajos import tarea
+from utils.cache import invalidar
+from utils.cache_reportes import cache_reportes  # 💾 archivos de reporte cacheados
+from utils.perfil_sql import perfil_sql  # ⏱️ consultas SQL por request
+from utils.exportadores import EXTENSIONES, generar_archivo, obtener_motor  # 📄 Excel/PDF se importan al primer uso
+from utils import auditoria  # 📜 vista/CSV de auditoría por keyset
+from utils.auditoria import filtros_desde as filtros_auditoria
+from routes.trabajos import encolar_trabajo  # ⏳ reportes y recálculo en segundo plano
 
 reportes_bp = Blueprint('reportes', __name__)
 
 # =====================================================
 # FUNCIONES PARA OBTENER DATOS
 # =====================================================
+# Cada función retorna una consulta (sin ejecutar). Los generadores de archivos
+# la recorren por lotes con yield_per (cursor del lado del servidor en MySQL),
+# de modo que nunca se carga el reporte completo en memoria.
+
+TAMANO_LOTE = 1000
 
 def obtener_datos_inventario():
     """Inventario completo con producto y tienda."""
-    data = db.session.query(
+    return db.session.query(
         Inventario.id_inventario.label("ID"),
         Producto.nombre.label("Producto"),
         Tienda.nombre.label("Tienda"),
@@ -28,39 +42,35 @@ def obtener_datos_inventario():
         Producto, Inventario.id_producto == Producto.id_producto
     ).join(
         Tienda, Inventario.id_tienda == Tienda.id_tienda
-    ).all()
-    return [dict(row._mapping) for row in data]
+    ).order_by(Inventario.id_inventario)
 
 def obtener_datos_ventas():
     """Ventas con cliente y total."""
-    data = db.session.query(
+    return db.session.query(
         Venta.id_venta.label("ID Venta"),
         Venta.fecha.label("Fecha"),
         Venta.total.label("Total CLP"),
         Cliente.nombre.label("Cliente")
     ).join(
         Cliente, Venta.id_cliente == Cliente.id_cliente
-    ).all()
-    return [dict(row._mapping) for row in data]
+    ).order_by(Venta.id_venta)
 
 def obtener_datos_clientes():
     """Clientes registrados."""
-    data = db.session.query(
+    return db.session.query(
         Cliente.id_cliente.label("ID Cliente"),
         Cliente.nombre.label("Nombre"),
         Cliente.email.label("Email"),
         Cliente.telefono.label("Teléfono")
-    ).all()
-    return [dict(row._mapping) for row in data]
+    ).order_by(Cliente.id_cliente)
 
 def obtener_datos_proveedores():
     """Proveedores registrados."""
-    data = db.session.query(
+    return db.session.query(
         Proveedor.id_proveedor.label("ID Proveedor"),
         Proveedor.nombre.label("Nombre"),
         Proveedor.contacto.label("Contacto")
-    ).all()
-    return [dict(row._mapping) for row in data]
+    ).order_by(Proveedor.id_proveedor)
 
 def _parse_fecha(value):
     """Parsea YYYY-MM-DD a date. Retorna None si es inválida."""
@@ -104,104 +114,115 @@ def obtener_detalle_ventas(fecha_inicio=None, fecha_fin=None, cliente=None):
     if cliente:
         query = query.filter(Venta.id_cliente == cliente)
 
-    data = query.all()
-    return [dict(row._mapping) for row in data]
+    return query.order_by(DetalleVenta.id_detalle)
 
-# =====================================================
-# FUNCIONES PARA GENERAR ARCHIVOS
-# =====================================================
+# ---- Reportes agregados: leen solo ventas_diarias (ver utils/ventas_diarias.py) ----
+def _filtrar_resumen(query, fecha_inicio, fecha_fin, tienda):
+    if fecha_inicio:
+        query = query.filter(VentaDiaria.fecha >= fecha_inicio)
+    if fecha_fin:
+        query = query.filter(VentaDiaria.fecha <= fecha_fin)
+    if tienda:
+        query = query.filter(VentaDiaria.id_tienda == tienda)
+    return query
+
+def obtener_ventas_por_dia(fecha_inicio=None, fecha_fin=None, tienda=None):
+    """Unidades e ingresos por día y tienda."""
+    query = db.session.query(
+        VentaDiaria.fecha.label("Fecha"),
+        Tienda.nombre.label("Tienda"),
+        db.func.sum(VentaDiaria.unidades).label("Unidades"),
+        db.func.sum(VentaDiaria.ingresos).label("Ingresos CLP"),
+    ).join(
+        Tienda, VentaDiaria.id_tienda == Tienda.id_tienda
+    )
+    return _filtrar_resumen(query, fecha_inicio, fecha_fin, tienda).group_by(
+        VentaDiaria.fecha, VentaDiaria.id_tienda, Tienda.nombre
+    ).having(
+        db.func.sum(VentaDiaria.unidades) != 0
+    ).order_by(VentaDiaria.fecha, VentaDiaria.id_tienda)
+
+def obtener_ventas_por_producto(fecha_inicio=None, fecha_fin=None, tienda=None):
+    """Unidades e ingresos por producto en el rango, de mayor a menor ingreso."""
+    resumen = _filtrar_resumen(db.session.query(
+        VentaDiaria.id_producto.label("id_producto"),
+        db.func.sum(VentaDiaria.unidades).label("unidades"),
+        db.func.sum(VentaDiaria.ingresos).label("ingresos"),
+    ), fecha_inicio, fecha_fin, tienda).group_by(VentaDiaria.id_producto).subquery()
+
+    return db.session.query(
+        Producto.id_producto.label("ID Producto"),
+        Producto.nombre.label("Producto"),
+        resumen.c.unidades.label("Unidades"),
+        resumen.c.ingresos.label("Ingresos CLP"),
+    ).join(
+        Producto, Producto.id_producto == resumen.c.id_producto
+    ).filter(
+        resumen.c.unidades != 0
+    ).order_by(resumen.c.ingresos.desc(), Producto.id_producto)
+
+def columnas_de(query):
+    """Nombres de columna (labels) de una consulta."""
+    return [c["name"] for c in query.column_descriptions]
 
-def generar_excel(data):
-    df = pd.DataFrame(data)
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df.to_excel(writer, index=False, sheet_name='Reporte')
-    output.seek(0)
-    return output
-
-def generar_pdf(data, titulo="Reporte"):
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-
-    # Título
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(200, height - 50, titulo)
-
-    if not data:
-        c.setFont("Helvetica", 12)
-        c.drawString(50, height - 100, "No hay datos para mostrar")
-        c.save()
-        buffer.seek(0)
-        return buffer
-
-    # Encabezados dinámicos
-    keys = list(data[0].keys())
-    c.setFont("Helvetica-Bold", 9)
-    y = height - 80
-    x_positions = [50 + (i * 100) for i in range(len(keys))]
-
-    for idx, key in enumerate(keys):
-        if idx < len(x_positions):
-            c.drawString(x_positions[idx], y, str(key))
-    y -= 15
-
-    # Contenido
-    c.setFont("Helvetica", 8)
-    for row in data:
-        for idx, value in enumerate(row.values()):
-            if idx < len(x_positions):
-                c.drawString(x_positions[idx], y, str(value))
-        y -= 12
-        if y < 40:  # salto de página
-            c.showPage()
-            y = height - 50
-            c.setFont("Helvetica-Bold", 9)
-            for idx, key in enumerate(keys):
-                if idx < len(x_positions):
-                    c.drawString(x_positions[idx], y, str(key))
-            y -= 15
-            c.setFont("Helvetica", 8)
-
-    c.save()
-    buffer.seek(0)
-    return buffer
+def iterar_filas(query, lote=TAMANO_LOTE):
+    """Recorre la consulta por lotes sin materializarla (tuplas)."""
+    for row in query.yield_per(lote):
+        yield tuple(row)
 
 # =====================================================
 # GENERADOR DE RUTAS CON CONTROL DE ROLES
 # =====================================================
 
+# nombre -> (funcion_datos, titulo, filtros aceptados); lo usan las rutas y los trabajos
+REPORTES = {}
+
+FILTROS = ("fecha_inicio", "fecha_fin", "cliente")
+
+def _parse_entero(value):
+    try:
+        return int(value) if value else None
+    except Exception:
+        return None
+
+def filtros_desde(args, campos=FILTROS):
+    """Parseo seguro de filtros (fecha_inicio, fecha_fin, cliente, tienda) desde un dict/querystring."""
+    filtros = {
+        "fecha_inicio": _parse_fecha(args.get('fecha_inicio')),
+        "fecha_fin": _parse_fecha(args.get('fecha_fin')),
+        "cliente": _parse_entero(args.get('cliente')),
+        "tienda": _parse_entero(args.get('tienda')),
+    }
+    return {campo: filtros[campo] for campo in campos}
+
+def consulta_reporte(nombre, filtros=None):
+    funcion_datos, _, con_filtros = REPORTES[nombre]
+    return funcion_datos(**(filtros or {})) if con_filtros else funcion_datos()
+
 def crear_ruta_reporte(nombre, funcion_datos, titulo, con_filtros=False):
+    """con_filtros: False, True (FILTROS) o la tupla de filtros que acepta funcion_datos."""
+    con_filtros = FILTROS if con_filtros is True else tuple(con_filtros or ())
+    REPORTES[nombre] = (funcion_datos, titulo, con_filtros)
+
     @reportes_bp.route(f'/reporte/{nombre}')
     @require_roles('usuario', 'administrador')  # ambos roles pueden generar reportes
     def reporte():
         formato = (request.args.get('formato') or 'excel').lower()
-
-        if con_filtros:
-            # Parseo seguro de filtros
-            fecha_inicio = _parse_fecha(request.args.get('fecha_inicio'))
-            fecha_fin = _parse_fecha(request.args.get('fecha_fin'))
-            cliente_raw = request.args.get('cliente')
-            cliente = None
-            try:
-                cliente = int(cliente_raw) if cliente_raw else None
-            except Exception:
-                cliente = None
-
-            data = funcion_datos(
-                fecha_inicio=fecha_inicio,
-                fecha_fin=fecha_fin,
-                cliente=cliente
-            )
-        else:
-            data = funcion_datos()
-
-        if formato == 'pdf':
-            pdf = generar_pdf(data, titulo=titulo)
-            return send_file(pdf, download_name=f"reporte_{nombre}.pdf", as_attachment=True)
-        else:  # default: excel
-            excel = generar_excel(data)
-            return send_file(excel, download_name=f"reporte_{nombre}.xlsx", as_attachment=True)
+        formato = formato if formato in EXTENSIONES else 'excel'
+        filtros = filtros_desde(request.args, con_filtros) if con_filtros else None
+        descarga = f"reporte_{nombre}.{EXTENSIONES[formato]}"
+
+        # Mismo reporte, formato, filtros y versión de datos => mismo archivo
+        cacheado = cache_reportes.obtener(cache_reportes.clave(nombre, formato, filtros))
+        if cacheado:
+            return send_file(cacheado, download_name=descarga, as_attachment=True)
+
+        # Sin caché: se genera como trabajo en segundo plano (ver tarea_reporte)
+        return encolar_trabajo("reporte", {
+            "nombre": nombre,
+            "formato": formato,
+            "filtros": {k: request.args.get(k) for k in con_filtros if request.args.get(k)},
+        }, volver="dashboard")
 
     # Asegurar endpoint único
     reporte.__name__ = f"reporte_{nombre}"
@@ -215,88 +236,146 @@ crear_ruta_reporte("ventas", obtener_datos_ventas, "Reporte de Ventas")
 crear_ruta_reporte("clientes", obtener_datos_clientes, "Reporte de Clientes")
 crear_ruta_reporte("proveedores", obtener_datos_proveedores, "Reporte de Proveedores")
 crear_ruta_reporte("detalle_ventas", obtener_detalle_ventas, "Detalle de Ventas", con_filtros=True)
+crear_ruta_reporte("ventas_por_dia", obtener_ventas_por_dia, "Ventas por Día y Tienda",
+                   con_filtros=("fecha_inicio", "fecha_fin", "tienda"))
+crear_ruta_reporte("ventas_por_producto", obtener_ventas_por_producto, "Ventas por Producto",
+                   con_filtros=("fecha_inicio", "fecha_fin", "tienda"))
 
 # =====================================================
 # ADMIN: RECALCULAR TOTALES + AUDITORÍA
 # =====================================================
 
-@reportes_bp.route("/admin/recalcular_totales", methods=["POST"])
-@require_roles("administrador")
-def admin_recalcular_totales():
+def ejecutar_recalculo(usuario_id=None, usuario_nombre="sistema", ip=None, progreso=None, lote=TAMANO_LOTE_RECALCULO):
     """
-    Recalcula:
+    Recalcula (en SQL, por lotes de id con commit por lote):
       - DetalleVenta.subtotal = cantidad * Producto.precio (precio actual)
       - Venta.total = SUM(DetalleVenta.subtotal)
-    y registra auditoría con conteos.
+    reconstruye los KPIs del dashboard y el resumen diario de ventas (los
+    ingresos cambian con los subtotales) y registra auditoría con conteos.
+    Lo usan el trabajo en segundo plano (la ruta lo encola) y el comando CLI.
     """
-    try:
-        # 1) Recalcular subtotales
-        detalles = DetalleVenta.query.all()
-        detalles_tocados = len(detalles)
-        detalles_actualizados = 0
-
-        for d in detalles:
-            precio = Decimal(str(d.producto.precio or 0))
-            cantidad = Decimal(str(d.cantidad or 0))
-            nuevo_subtotal = cantidad * precio
-            anterior_subtotal = Decimal(str(d.subtotal or 0))
-
-            if nuevo_subtotal != anterior_subtotal:
-                d.subtotal = nuevo_subtotal
-                detalles_actualizados += 1
-                db.session.add(d)
-
-        db.session.flush()  # asegurar lectura actualizada en v.detalles
-
-        # 2) Recalcular totales por venta
-        ventas = Venta.query.all()
-        ventas_tocadas = len(ventas)
-        ventas_actualizadas = 0
-
-        for v in ventas:
-            total_nuevo = sum(Decimal(str(det.subtotal or 0)) for det in v.detalles)
-            total_anterior = Decimal(str(v.total or 0))
-            if total_nuevo != total_anterior:
-                v.total = total_nuevo
-                ventas_actualizadas += 1
-                db.session.add(v)
-
-        # 3) Auditoría
-        usuario_id = session.get("user_id")
-        usuario_nombre = session.get("username") or session.get("email") or "desconocido"
-        ip = request.headers.get("X-Forwarded-For", request.remote_addr)
-
-        audit = Auditoria(
-            usuario_id=usuario_id,
-            usuario_nombre=usuario_nombre,
-            accion="recalcular_totales",
-            detalles=(
-                f"Detalles tocados={detalles_tocados}, act={detalles_actualizados}; "
-                f"Ventas tocadas={ventas_tocadas}, act={ventas_actualizadas}"
-            ),
-            detalles_json={
-                "detalles_tocados": detalles_tocados,
-                "detalles_actualizados": detalles_actualizados,
-                "ventas_tocadas": ventas_tocadas,
-                "ventas_actualizadas": ventas_actualizadas,
-            },
-            ip=ip,
-        )
-        db.session.add(audit)
-        db.session.commit()
-
-        flash(
-            f"✅ Recalculo completado. "
-            f"Detalles tocados: {detalles_tocados}, actualizados: {detalles_actualizados}. "
-            f"Ventas tocadas: {ventas_tocadas}, actualizadas: {ventas_actualizadas}.",
-            "success",
-        )
-
-    except Exception as e:
-        db.session.rollback()
-        flash(f"⚠️ No se pudo recalcular: {str(e)}", "danger")
-
-    return redirect(url_for("dashboard"))
+    conteos = recalcular_totales(lote=lote, progreso=progreso)
+
+    # Los ingresos del dashboard dependen de Venta.total: reconstruirlos
+    reconciliar_kpis()
+    reconstruir_ventas_diarias()
+    invalidar("ventas")  # los reportes cacheados de ventas quedan obsoletos
+
+    db.session.add(Auditoria(
+        usuario_id=usuario_id,
+        usuario_nombre=usuario_nombre,
+        accion="recalcular_totales",
+        detalles=(
+            f"Detalles tocados={conteos['detalles_tocados']}, act={conteos['detalles_actualizados']}; "
+            f"Ventas tocadas={conteos['ventas_tocadas']}, act={conteos['ventas_actualizadas']}"
+        ),
+        detalles_json=conteos,
+        ip=ip,
+    ))
+    db.session.commit()
+    return conteos
+
+def _mensaje_recalculo(conteos):
+    return (
+        f"Recalculo completado. "
+        f"Detalles tocados: {conteos['detalles_tocados']}, actualizados: {conteos['detalles_actualizados']}. "
+        f"Ventas tocadas: {conteos['ventas_tocadas']}, actualizadas: {conteos['ventas_actualizadas']}."
+    )
+
+@reportes_bp.route("/admin/recalcular_totales", methods=["POST"])
+@require_roles("administrador")
+def admin_recalcular_totales():
+    """Encola el recálculo (recorre todas las ventas); el avance se ve en /trabajos/<id>."""
+    return encolar_trabajo("recalcular_totales", {
+        "usuario_nombre": session.get("username") or session.get("email") or "desconocido",
+        "ip": request.headers.get("X-Forwarded-For", request.remote_addr),
+    }, volver="dashboard")
+
+# =====================================================
+# TAREAS EN SEGUNDO PLANO (ver utils/trabajos.py)
+# =====================================================
+
+@tarea("reporte")
+def tarea_reporte(ctx):
+    nombre = ctx.parametros["nombre"]
+    formato = ctx.parametros.get("formato", "excel")
+    formato = formato if formato in EXTENSIONES else "excel"
+    _, titulo, con_filtros = REPORTES[nombre]
+
+    filtros = filtros_desde(ctx.parametros.get("filtros") or {}, con_filtros) if con_filtros else None
+    ruta = ctx.ruta_archivo(EXTENSIONES[formato])
+    descarga = f"reporte_{nombre}.{EXTENSIONES[formato]}"
+
+    clave = cache_reportes.clave(nombre, formato, filtros)
+    cacheado = cache_reportes.obtener(clave)
+    if cacheado:
+        shutil.copyfile(cacheado, ruta)
+        return {"archivo": ruta, "nombre_descarga": descarga, "mensaje": "Reporte obtenido desde la caché."}
+
+    query = consulta_reporte(nombre, filtros)
+    filas = ctx.con_avance(iterar_filas(query))
+    archivo = generar_archivo(formato, columnas_de(query), filas, titulo)
+    cache_reportes.guardar(clave, archivo)
+    archivo.seek(0)
+    with open(ruta, "wb") as destino:
+        shutil.copyfileobj(archivo, destino)
+    archivo.close()
+
+    return {
+        "archivo": ruta,
+        "nombre_descarga": descarga,
+        "progreso": ctx.procesadas,
+        "mensaje": f"{ctx.procesadas} filas exportadas.",
+    }
+
+@tarea("recalcular_totales")
+def tarea_recalcular_totales(ctx):
+    avance = {"n": 0}
+
+    def progreso(fase, ultimo_id, actualizados):
+        avance["n"] += 1
+        ctx.avance(avance["n"], f"{fase}: hasta id={ultimo_id}, actualizados={actualizados}")
+
+    conteos = ejecutar_recalculo(
+        usuario_id=ctx.usuario_id,
+        usuario_nombre=ctx.parametros.get("usuario_nombre") or "desconocido",
+        ip=ctx.parametros.get("ip"),
+        progreso=progreso,
+    )
+    return {"mensaje": _mensaje_recalculo(conteos), "progreso": avance["n"]}
+
+# =====================================================
+# ADMIN: CACHÉ DE REPORTES
+# =====================================================
+
+@reportes_bp.route("/admin/cache_reportes")
+@require_roles("administrador")
+def ver_cache_reportes():
+    return render_template("cache_reportes.html", stats=cache_reportes.estadisticas())
+
+@reportes_bp.route("/admin/cache_reportes/vaciar", methods=["POST"])
+@require_roles("administrador")
+def vaciar_cache_reportes():
+    cache_reportes.vaciar()
+    flash("🧹 Caché de reportes vaciada.", "info")
+    return redirect(url_for("reportes.ver_cache_reportes"))
+
+# =====================================================
+# ADMIN: PERFIL SQL POR REQUEST
+# =====================================================
+
+@reportes_bp.route("/admin/perfil_sql")
+@require_roles("administrador")
+def ver_perfil_sql():
+    rutas, recientes = perfil_sql.resumen()
+    return render_template("perfil_sql.html", rutas=rutas, recientes=recientes)
+
+@reportes_bp.route("/admin/perfil_sql/reiniciar", methods=["POST"])
+@require_roles("administrador")
+def reiniciar_perfil_sql():
+    perfil_sql.reiniciar()
+    flash("🧹 Estadísticas SQL reiniciadas.", "info")
+    return redirect(url_for("reportes.ver_perfil_sql"))
 
 # =====================================================
 # ADMIN: AUDITORÍA (vista y CSV)
@@ -305,29 +384,23 @@ def admin_recalcular_totales():
 @reportes_bp.route("/admin/auditoria")
 @require_roles("administrador")
 def ver_auditoria():
-    logs = Auditoria.query.order_by(Auditoria.fecha_hora.desc()).limit(200).all()
-    return render_template("auditoria.html", logs=logs)
+    filtros = filtros_auditoria(request.args)
+    logs, siguiente = auditoria.pagina(filtros, despues=auditoria.parse_cursor(request.args.get("despues")))
+    return render_template(
+        "auditoria.html", logs=logs, siguiente=siguiente, filtros=filtros, acciones=auditoria.ACCIONES,
+        # mismos filtros en los enlaces de página siguiente y CSV
+        params={k: (v.isoformat() if isinstance(v, date) else v) for k, v in filtros.items() if v is not None},
+    )
 
 @reportes_bp.route("/admin/auditoria.csv")
 @require_roles("administrador")
 def descargar_auditoria_csv():
-    logs = Auditoria.query.order_by(Auditoria.fecha_hora.desc()).all()
-
-    output = StringIO()
-    writer = csv.writer(output)
-    writer.writerow(["fecha_hora","usuario_id","usuario_nombre","accion","detalles","detalles_json","ip"])
-    for l in logs:
-        writer.writerow([
-            l.fecha_hora,
-            l.usuario_id or "",
-            l.usuario_nombre or "",
-            l.accion,
-            (l.detalles or "").replace("\n", " ").strip(),
-            json.dumps(l.detalles_json, ensure_ascii=False) if l.detalles_json else "",
-            l.ip or "",
-        ])
-
-    resp = make_response(output.getvalue())
+    # Respuesta chunked, en lotes keyset: nunca se carga la tabla completa
+    filas = (auditoria.fila_csv(l) for l in auditoria.iterar(filtros_auditoria(request.args)))
+    resp = Response(
+        stream_with_context(obtener_motor("csv").generar_trozos(auditoria.COLUMNAS_CSV, filas)),
+        mimetype="text/csv",
+    )
     resp.headers["Content-Disposition"] = "attachment; filename=auditoria.csv"
     resp.headers["Content-Type"] = "text/csv; charset=utf-8"
     return resp
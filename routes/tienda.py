@@ -1,6 +1,8 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from models import db, Tienda
 from utils.security import require_roles  # 🔐 control de roles
+from utils.cache import invalidar  # 🗂️ invalida la lista cacheada de tiendas
+from utils.cola_auditoria import auditar  # 📜 auditoría en segundo plano
 
 tienda_bp = Blueprint('tienda', __name__, url_prefix='/tienda')
 
@@ -34,7 +36,9 @@ def nueva_tienda():
             email=email
         )
         db.session.add(nueva)
+        invalidar("tiendas")
         db.session.commit()
+        auditar("crear_tienda", f"Tienda #{nueva.id_tienda} «{nombre}»", id_tienda=nueva.id_tienda, nombre=nombre)
 
         flash(f"✅ Tienda «{nombre}» registrada correctamente.", "success")
         return redirect(url_for("tienda.index"))
@@ -58,7 +62,9 @@ def editar_tienda(id):
             flash("⚠️ El nombre de la tienda es obligatorio.", "warning")
             return redirect(url_for("tienda.editar_tienda", id=id))
 
+        invalidar("tiendas")
         db.session.commit()
+        auditar("editar_tienda", f"Tienda #{id} «{t.nombre}»", id_tienda=id, nombre=t.nombre)
         flash(f"✅ Tienda «{t.nombre}» actualizada correctamente.", "success")
         return redirect(url_for("tienda.index"))
 
@@ -72,7 +78,9 @@ def eliminar_tienda(id):
     t = Tienda.query.get_or_404(id)
     try:
         db.session.delete(t)
+        invalidar("tiendas")
         db.session.commit()
+        auditar("eliminar_tienda", f"Tienda #{id} «{t.nombre}»", id_tienda=id, nombre=t.nombre)
         flash(f"🗑️ Tienda «{t.nombre}» eliminada correctamente.", "info")
     except Exception as e:
         db.session.rollback()
@@ -0,0 +1,98 @@
+# routes/trabajos.py
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, send_file, abort, current_app
+import os
+
+from models import Trabajo
+from utils.security import require_roles
+from utils.trabajos import gestor_trabajos, LimiteTrabajos
+
+trabajos_bp = Blueprint('trabajos', __name__, url_prefix='/trabajos')
+
+
+# -------------------------------
+# FUNCIONES AUXILIARES
+# -------------------------------
+def quiere_json():
+    return request.accept_mimetypes.best == "application/json" or request.is_json
+
+def _es_admin():
+    return (session.get("rol") or "").lower() == "administrador"
+
+def _obtener_trabajo(id_trabajo):
+    """El trabajo solo es visible para quien lo creó (o un administrador)."""
+    trabajo = Trabajo.query.get_or_404(id_trabajo)
+    if not _es_admin() and trabajo.usuario_id != session.get("user_id"):
+        abort(404)
+    return trabajo
+
+def _respuesta_encolado(trabajo):
+    if quiere_json():
+        datos = trabajo.to_dict()
+        datos["url_estado"] = url_for("trabajos.estado", id_trabajo=trabajo.id_trabajo)
+        datos["url_descarga"] = url_for("trabajos.descargar", id_trabajo=trabajo.id_trabajo)
+        return jsonify(datos), 202
+    flash(f"⏳ Trabajo #{trabajo.id_trabajo} en cola.", "info")
+    return redirect(url_for("trabajos.estado", id_trabajo=trabajo.id_trabajo))
+
+def encolar_trabajo(tipo, parametros, volver="trabajos.index"):
+    """
+    Encola el trabajo para el usuario de la sesión y responde: redirección a
+    /trabajos/<id> (o 202 con el trabajo en JSON). Si el usuario ya tiene el
+    máximo de trabajos activos, vuelve a `volver` con un aviso (o 429).
+    """
+    try:
+        trabajo = gestor_trabajos.encolar(
+            current_app._get_current_object(), tipo, parametros, usuario_id=session.get("user_id")
+        )
+    except LimiteTrabajos as e:
+        if quiere_json():
+            return jsonify({"error": str(e)}), 429
+        flash(f"⚠️ {e}", "warning")
+        return redirect(url_for(volver))
+    return _respuesta_encolado(trabajo)
+
+
+# ---- Listado de trabajos del usuario (administrador ve todos) ----
+@trabajos_bp.route("/")
+@require_roles('usuario', 'administrador')
+def index():
+    query = Trabajo.query
+    if not _es_admin():
+        query = query.filter(Trabajo.usuario_id == session.get("user_id"))
+    trabajos = query.order_by(Trabajo.id_trabajo.desc()).limit(50).all()
+    return render_template("trabajos.html", trabajos=trabajos)
+
+
+# ---- Estado / avance ----
+@trabajos_bp.route("/<int:id_trabajo>")
+@require_roles('usuario', 'administrador')
+def estado(id_trabajo):
+    trabajo = _obtener_trabajo(id_trabajo)
+    if quiere_json():
+        return jsonify(trabajo.to_dict())
+    return render_template("trabajo.html", trabajo=trabajo)
+
+
+# ---- Descargar resultado ----
+@trabajos_bp.route("/<int:id_trabajo>/descargar")
+@require_roles('usuario', 'administrador')
+def descargar(id_trabajo):
+    trabajo = _obtener_trabajo(id_trabajo)
+    if trabajo.estado != "completado" or not trabajo.archivo or not os.path.exists(trabajo.archivo):
+        if quiere_json():
+            return jsonify({"error": "El resultado no está disponible.", "estado": trabajo.estado}), 409
+        flash("⚠️ El resultado de ese trabajo no está disponible.", "warning")
+        return redirect(url_for("trabajos.index"))
+    return send_file(trabajo.archivo, download_name=trabajo.nombre_descarga, as_attachment=True)
+
+
+# ---- Cancelar ----
+@trabajos_bp.route("/<int:id_trabajo>/cancelar", methods=["POST"])
+@require_roles('usuario', 'administrador')
+def cancelar(id_trabajo):
+    trabajo = _obtener_trabajo(id_trabajo)
+    gestor_trabajos.cancelar(trabajo)
+    if quiere_json():
+        return jsonify(trabajo.to_dict())
+    flash(f"🛑 Cancelación solicitada para el trabajo #{id_trabajo}.", "info")
+    return redirect(url_for("trabajos.estado", id_trabajo=id_trabajo))
@@ -1,9 +1,19 @@
 # routes/venta.py
-from flask import Blueprint, render_template, request, redirect, url_for, flash
-from models import db, Venta, Cliente, Producto, DetalleVenta, Inventario, Tienda
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
+from models import db, Venta, DetalleVenta
 from datetime import date
 from sqlalchemy.orm import joinedload
 from utils.security import require_roles  # 🔐 Decorador para roles
+from utils.kpi import registrar_venta  # 📊 contadores del dashboard
+from utils.ventas_diarias import sumar_ventas  # 📅 resumen diario para reportes
+from utils.cache import obtener_lista, invalidar  # 🗂️ listas cacheadas / versión de datos
+from utils.ventas import (
+    ErrorVenta, parsear_lineas, resolver_lineas, pedido_por_producto, nombres_productos, insertar_detalles,
+    borrar_detalles,
+)
+from utils.stock import bloquear_stock, reservar_stock, devolver_stock  # 📦 descuento atómico de stock + libro de movimientos
+from utils.cola_auditoria import auditar  # 📜 auditoría en segundo plano
+from utils.lote_ventas import ingestar_ventas  # 🧾 ventas en lote desde los terminales
 
 venta_bp = Blueprint('venta', __name__, url_prefix='/venta')
 
@@ -34,10 +44,6 @@ def parsear_detalles(form):
 @venta_bp.route("/nuevo", methods=["GET", "POST"])
 @require_roles('administrador')
 def nueva_venta():
-    clientes = Cliente.query.all()
-    productos = Producto.query.all()
-    tiendas = Tienda.query.all()
-
     if request.method == "POST":
         try:
             id_cliente = int(request.form.get("id_cliente", 0))
@@ -48,65 +54,68 @@ def nueva_venta():
                 flash("⚠️ Debes seleccionar cliente y tienda.", "danger")
                 return redirect(url_for("venta.nueva_venta"))
 
-            venta = Venta(fecha=fecha, total=0, id_cliente=id_cliente, id_tienda=id_tienda)
-            db.session.add(venta)
-            db.session.flush()  # obtener id_venta
-
-            total = 0
             detalles = parsear_detalles(request.form)
             if not detalles:
                 flash("⚠️ Debes agregar al menos un producto.", "danger")
-                db.session.rollback()
                 return redirect(url_for("venta.nueva_venta"))
 
-            for det in detalles.values():
-                # Parseo seguro
-                id_producto = int(det.get("id_producto", 0))
-                cantidad = int(det.get("cantidad", 0))
-
-                if cantidad <= 0:
-                    flash("⚠️ La cantidad debe ser > 0.", "danger")
-                    db.session.rollback()
-                    return redirect(url_for("venta.nueva_venta"))
-
-                # Precio SIEMPRE desde la base de datos 
-                producto = Producto.query.get_or_404(id_producto)
-                precio = float(producto.precio)  # <-- fuente de verdad
-                subtotal = cantidad * precio
-
-                # Validar/actualizar inventario por tienda
-                inventario = Inventario.query.filter_by(id_producto=id_producto, id_tienda=id_tienda).first()
-                if not inventario:
-                    flash(f"❌ No hay inventario para '{producto.nombre}' en la tienda seleccionada.", "danger")
-                    db.session.rollback()
-                    return redirect(url_for("venta.nueva_venta"))
-
-                if inventario.cantidad < cantidad:
-                    flash(f"❌ Stock insuficiente para {producto.nombre}. Disponible: {inventario.cantidad}", "danger")
-                    db.session.rollback()
-                    return redirect(url_for("venta.nueva_venta"))
-
-                inventario.cantidad -= cantidad
-                total += subtotal
-
-                db.session.add(DetalleVenta(
-                    id_venta=venta.id_venta,
-                    id_producto=id_producto,
-                    cantidad=cantidad,
-                    subtotal=subtotal
-                ))
-
-            venta.total = total
+            # Productos de todas las líneas en una consulta IN
+            resueltas = resolver_lineas(parsear_lineas(detalles))
+
+            venta = Venta(fecha=fecha, total=0, id_cliente=id_cliente, id_tienda=id_tienda)
+            db.session.add(venta)
+            db.session.flush()  # obtener id_venta (referencia de los movimientos de stock)
+
+            # Stock: un UPDATE condicional atómico (todo o nada) + movimientos de venta
+            pedido = pedido_por_producto(resueltas)
+            reservar_stock(id_tienda, pedido, nombres=nombres_productos(resueltas), id_venta=venta.id_venta)
+
+            insertar_detalles(venta.id_venta, resueltas)  # también suma los subtotales a venta.total
+
+            total = venta.total
+            registrar_venta(venta)
+            sumar_ventas([venta.id_venta])
+            invalidar("ventas", "inventario")
             db.session.commit()
+            auditar("crear_venta", f"Venta #{venta.id_venta} total={total}",
+                    id_venta=venta.id_venta, id_cliente=id_cliente, id_tienda=id_tienda, total=total, productos=pedido)
             flash("✅ Venta registrada correctamente.", "success")
             return redirect(url_for("dashboard"))
 
+        except ErrorVenta as e:
+            db.session.rollback()
+            flash(str(e), "danger")
+            return redirect(url_for("venta.nueva_venta"))
         except Exception as e:
             db.session.rollback()
             flash(f"⚠️ Error al registrar venta: {str(e)}", "danger")
             return redirect(url_for("venta.nueva_venta"))
 
-    return render_template("nueva_venta.html", clientes=clientes, productos=productos, tiendas=tiendas)
+    return render_template(
+        "nueva_venta.html",
+        clientes=obtener_lista("clientes"),
+        tiendas=obtener_lista("tiendas"),
+    )
+
+# -------------------------------
+# INGESTA EN LOTE (terminales POS, JSON)
+# -------------------------------
+@venta_bp.route("/api/lote", methods=["POST"])
+@require_roles('administrador')
+def ingestar_lote():
+    datos = request.get_json(silent=True)
+    ventas = datos.get("ventas") if isinstance(datos, dict) else datos
+    if not isinstance(ventas, list):
+        return jsonify({"error": 'Se espera {"ventas": [...]} o una lista de ventas.'}), 400
+    if len(ventas) > current_app.config["VENTAS_LOTE_MAX"]:
+        return jsonify({"error": f"Máximo {current_app.config['VENTAS_LOTE_MAX']} ventas por envío."}), 413
+
+    resultados = ingestar_ventas(ventas, tamano_trozo=current_app.config["VENTAS_LOTE"])
+    ids = [r["id_venta"] for r in resultados if r["ok"]]
+    if ids:
+        auditar("crear_ventas_lote", f"{len(ids)} ventas desde terminal", ids_venta=ids,
+                rechazadas=len(resultados) - len(ids))
+    return jsonify({"aceptadas": len(ids), "rechazadas": len(resultados) - len(ids), "resultados": resultados})
 
 # -------------------------------
 # EDITAR VENTA
@@ -118,80 +127,70 @@ def editar_venta(id_venta):
         joinedload(Venta.detalles).joinedload(DetalleVenta.producto)
     ).get_or_404(id_venta)
 
-    clientes = Cliente.query.all()
-    productos = Producto.query.all()
-    tiendas = Tienda.query.all()
     id_tienda = venta.id_tienda  
 
     if request.method == "POST":
         try:
-            # 1) Devolver stock de los detalles actuales
+            detalles = parsear_detalles(request.form)
+            if not detalles:
+                flash("⚠️ Debes agregar al menos un producto.", "danger")
+                return redirect(url_for("venta.editar_venta", id_venta=id_venta))
+            lineas = parsear_lineas(detalles)
+            resueltas = resolver_lineas(lineas)
+            pedido = pedido_por_producto(resueltas)
+
+            # 0) Bloquear de una vez el stock que se devuelve y el que se reserva
+            productos = {d.id_producto for d in venta.detalles} | set(pedido)
+            bloquear_stock((id_producto, id_tienda) for id_producto in productos)
+
+            # Restar la venta original de los contadores del dashboard y del resumen diario (se escriben al commit)
+            registrar_venta(venta, signo=-1)
+            sumar_ventas([id_venta], signo=-1)
+
+            # 1) Devolver stock de los detalles actuales (un UPDATE)
+            anterior = {}
             for detalle in venta.detalles:
-                inv = Inventario.query.filter_by(id_producto=detalle.id_producto, id_tienda=id_tienda).first()
-                if inv:
-                    inv.cantidad += detalle.cantidad
+                anterior[detalle.id_producto] = anterior.get(detalle.id_producto, 0) + detalle.cantidad
+            devolver_stock(id_tienda, anterior, id_venta=venta.id_venta, nota="edición de venta")
 
-            # 2) Borrar los detalles antiguos
-            DetalleVenta.query.filter_by(id_venta=venta.id_venta).delete()
+            # 2) Borrar los detalles antiguos (descuenta su suma de venta.total)
+            borrar_detalles(venta.id_venta)
 
             # 3) Actualizar cabecera
             venta.id_cliente = int(request.form.get("id_cliente", venta.id_cliente))
             venta.fecha = request.form.get("fecha") or venta.fecha
 
-            # 4) Agregar nuevos detalles
-            total = 0
-            detalles = parsear_detalles(request.form)
-            if not detalles:
-                flash("⚠️ Debes agregar al menos un producto.", "danger")
-                db.session.rollback()
-                return redirect(url_for("venta.editar_venta", id_venta=id_venta))
+            # 4) Reservar stock y agregar nuevos detalles (un solo INSERT)
+            reservar_stock(id_tienda, pedido, nombres=nombres_productos(resueltas), id_venta=venta.id_venta)
 
-            for det in detalles.values():
-                id_producto = int(det.get("id_producto", 0))
-                cantidad = int(det.get("cantidad", 0))
-
-                if cantidad <= 0:
-                    flash("⚠️ La cantidad debe ser > 0.", "danger")
-                    db.session.rollback()
-                    return redirect(url_for("venta.editar_venta", id_venta=id_venta))
-
-                # Precio SIEMPRE desde la base de datos 
-                producto = Producto.query.get_or_404(id_producto)
-                precio = float(producto.precio)
-                subtotal = cantidad * precio
-
-                inventario = Inventario.query.filter_by(id_producto=id_producto, id_tienda=id_tienda).first()
-                if not inventario:
-                    flash(f"❌ No hay inventario para '{producto.nombre}' en la tienda de la venta.", "danger")
-                    db.session.rollback()
-                    return redirect(url_for("venta.editar_venta", id_venta=id_venta))
-
-                if inventario.cantidad < cantidad:
-                    flash(f"❌ Stock insuficiente para {producto.nombre}. Disponible: {inventario.cantidad}", "danger")
-                    db.session.rollback()
-                    return redirect(url_for("venta.editar_venta", id_venta=id_venta))
-
-                inventario.cantidad -= cantidad
-                total += subtotal
-
-                db.session.add(DetalleVenta(
-                    id_venta=venta.id_venta,
-                    id_producto=id_producto,
-                    cantidad=cantidad,
-                    subtotal=subtotal
-                ))
-
-            venta.total = total
+            insertar_detalles(venta.id_venta, resueltas)
+
+            total = venta.total
+            registrar_venta(venta)
+            sumar_ventas([id_venta])
+            invalidar("ventas", "inventario")
             db.session.commit()
+            auditar("editar_venta", f"Venta #{id_venta} total={total}",
+                    id_venta=id_venta, id_cliente=venta.id_cliente, id_tienda=id_tienda, total=total,
+                    productos=pedido, anteriores=anterior)
             flash("✅ Venta actualizada correctamente.", "success")
             return redirect(url_for("dashboard"))
 
+        except ErrorVenta as e:
+            db.session.rollback()
+            flash(str(e), "danger")
+            return redirect(url_for("venta.editar_venta", id_venta=id_venta))
         except Exception as e:
             db.session.rollback()
             flash(f"⚠️ Error al actualizar venta: {str(e)}", "danger")
             return redirect(url_for("venta.editar_venta", id_venta=id_venta))
 
-    return render_template("editar_venta.html", venta=venta, clientes=clientes, productos=productos, tiendas=tiendas)
+    return render_template(
+        "editar_venta.html",
+        venta=venta,
+        clientes=obtener_lista("clientes"),
+        tiendas=obtener_lista("tiendas"),
+    )
 
 # -------------------------------
 # ELIMINAR VENTA
@@ -203,14 +202,18 @@ def eliminar_venta(id_venta):
     id_tienda = venta.id_tienda
 
     try:
+        registrar_venta(venta, signo=-1)
+        sumar_ventas([id_venta], signo=-1)
+        devueltas = {}
         for detalle in venta.detalles:
-            inv = Inventario.query.filter_by(id_producto=detalle.id_producto, id_tienda=id_tienda).first()
-            if inv:
-                inv.cantidad += detalle.cantidad
-            db.session.delete(detalle)
+            devueltas[detalle.id_producto] = devueltas.get(detalle.id_producto, 0) + detalle.cantidad
+        devolver_stock(id_tienda, devueltas, id_venta=id_venta, nota="venta eliminada")
 
+        # Los detalles (ya cargados) se borran por la cascada de Venta.detalles, en el mismo flush
         db.session.delete(venta)
+        invalidar("ventas", "inventario")
         db.session.commit()
+        auditar("eliminar_venta", f"Venta #{id_venta}", id_venta=id_venta, id_tienda=id_tienda, devueltas=devueltas)
         flash("🗑️ Venta eliminada y stock restaurado correctamente.", "info")
     except Exception as e:
         db.session.rollback()
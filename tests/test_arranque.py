@@ -0,0 +1,17 @@
+# tests/test_arranque.py
+"""
+Importar la aplicación no debe cargar los motores de reportes (reportlab,
+xlsxwriter): se importan recién al generar el primer Excel o PDF.
+"""
+import pytest
+
+from benchmarks.arranque import sondear
+
+
+def test_arranque_sin_dependencias_pesadas():
+    assert sondear()["pesados"] == []
+
+
+@pytest.mark.parametrize("formato, modulo", [("excel", "xlsxwriter"), ("pdf", "reportlab")])
+def test_motor_se_carga_al_primer_uso(formato, modulo):
+    assert sondear(formato)["pesados_reporte"] == [modulo]
@@ -0,0 +1,115 @@
+# tests/test_busqueda_productos.py
+"""Búsqueda incremental de productos: prefijo, palabras del nombre, stock por tienda y páginas por cursor."""
+import pytest
+from sqlalchemy import select
+
+from app import create_app
+from models import db, Inventario, PalabraProducto, Producto, Proveedor, Tienda
+from utils import busqueda_productos
+from utils.kpi import obtener_kpis, reconciliar_kpis
+from utils.movimientos import abrir_libro
+
+NOMBRES = ["Leche Entera 1L", "Leche Descremada 1L", "Café Molido", "Pan de Leche", "Yogur leche_cabra", "Lechuga"]
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({"APP_ENV": "test", "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'busqueda.db'}"})
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Tienda(nombre="T1"), Tienda(nombre="T2")])
+        db.session.add_all([Producto(nombre=n, precio=100 * i, stock=0) for i, n in enumerate(NOMBRES, 1)])
+        db.session.flush()
+        db.session.add_all([Inventario(id_producto=1, id_tienda=1, cantidad=7), Inventario(id_producto=1, id_tienda=2, cantidad=3)])
+        db.session.commit()
+        abrir_libro()
+        assert busqueda_productos.reindexar(lote=4) == len(NOMBRES)
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def admin(app):
+    cliente = app.test_client()
+    with cliente.session_transaction() as s:
+        s.update(user_id=1, username="admin", rol="administrador")
+    return cliente
+
+
+def _nombres(respuesta):
+    return [p["nombre"] for p in respuesta.get_json()["productos"]]
+
+
+def test_prefijo_antes_que_palabras(admin):
+    r = admin.get("/producto/buscar?q=lech")
+    assert _nombres(r) == ["Leche Descremada 1L", "Leche Entera 1L", "Lechuga", "Pan de Leche", "Yogur leche_cabra"]
+    assert [p["coincidencia"] for p in r.get_json()["productos"]] == ["prefijo"] * 3 + ["palabra"] * 2
+
+    assert _nombres(admin.get("/producto/buscar?q=leche 1l")) == ["Leche Descremada 1L", "Leche Entera 1L"]
+    assert _nombres(admin.get("/producto/buscar?q=entera")) == ["Leche Entera 1L"]
+    assert _nombres(admin.get("/producto/buscar?q=cafe")) == ["Café Molido"]  # sin tildes
+    assert _nombres(admin.get("/producto/buscar?q=ntera")) == []  # dentro de una palabra: no se busca
+    assert _nombres(admin.get("/producto/buscar?q=%25")) == []  # comodines de LIKE escapados
+
+
+def test_stock_por_tienda(admin):
+    def leche(id_tienda=""):
+        r = admin.get(f"/producto/buscar?q=leche entera&id_tienda={id_tienda}")
+        return r.get_json()["productos"][0]
+
+    assert leche() == {"id_producto": 1, "nombre": "Leche Entera 1L", "precio": 100.0, "stock": 10,
+                       "coincidencia": "prefijo"}
+    assert leche(1)["stock"] == 7
+    assert leche(2)["stock"] == 3
+    assert admin.get("/producto/buscar?q=lechuga&id_tienda=2").get_json()["productos"][0]["stock"] == 0
+
+
+def test_paginas_por_cursor(admin):
+    vistos, despues = [], ""
+    for _ in range(10):
+        data = admin.get(f"/producto/buscar?q=le&limite=2&despues={despues}").get_json()
+        assert len(data["productos"]) <= 2
+        vistos += [p["nombre"] for p in data["productos"]]
+        despues = data["siguiente"]
+        if not despues:
+            break
+    assert vistos == _nombres(admin.get("/producto/buscar?q=le"))
+    assert len(vistos) == 5
+
+    # Sin texto se recorre el catálogo en orden alfabético
+    assert len(_nombres(admin.get("/producto/buscar?limite=50"))) == len(NOMBRES)
+
+
+def test_rutas_mantienen_el_indice(admin):
+    admin.post("/producto/nuevo", data={"nombre": "Queso Mantecoso", "precio": 500})
+    assert _nombres(admin.get("/producto/buscar?q=mante")) == ["Queso Mantecoso"]
+
+    admin.post("/producto/editar/3", data={"nombre": "Café Grano Entero", "precio": 300})
+    assert _nombres(admin.get("/producto/buscar?q=molido")) == []
+    assert _nombres(admin.get("/producto/buscar?q=grano")) == ["Café Grano Entero"]
+
+    admin.post("/producto/eliminar/6")
+    assert db.session.scalar(select(PalabraProducto.palabra).where(PalabraProducto.id_producto == 6)) is None
+
+    # El formulario de venta ya no incrusta el catálogo
+    html = admin.get("/venta/nuevo").get_data(as_text=True)
+    assert "Leche Entera" not in html and "producto-buscar" in html
+
+
+def test_eliminar_proveedor_quita_sus_productos(admin):
+    reconciliar_kpis()
+    db.session.commit()
+    proveedor = Proveedor(nombre="Lácteos Sur")
+    db.session.add(proveedor)
+    db.session.flush()
+    for id_producto in (1, 2):
+        db.session.get(Producto, id_producto).id_proveedor = proveedor.id_proveedor
+    db.session.commit()
+    assert obtener_kpis()["productos"] == len(NOMBRES)
+
+    admin.post(f"/proveedor/eliminar/{proveedor.id_proveedor}")
+    db.session.expire_all()
+    assert db.session.get(Producto, 1) is None
+    assert obtener_kpis()["productos"] == len(NOMBRES) - 2
+    assert db.session.scalar(select(PalabraProducto.palabra).where(PalabraProducto.id_producto.in_([1, 2]))) is None
+    assert _nombres(admin.get("/producto/buscar?q=leche")) == ["Pan de Leche", "Yogur leche_cabra"]
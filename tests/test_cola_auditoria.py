@@ -0,0 +1,96 @@
+# tests/test_cola_auditoria.py
+"""Cola de auditoría: lotes por tamaño y tiempo, contrapresión y vaciado al cerrar."""
+import time
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func
+
+from app import create_app
+from models import db, Auditoria, Usuario
+from utils.cola_auditoria import cola_auditoria
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        "APP_ENV": "test",
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'cola.db'}",
+        "AUDITORIA_LOTE": 5,
+        "AUDITORIA_INTERVALO": 60,
+    })
+    with app.app_context():
+        db.create_all()
+    yield app
+    cola_auditoria.cerrar(app)
+
+
+def _fila(n):
+    return {"fecha_hora": datetime.now(), "accion": "prueba", "detalles": f"fila {n}", "usuario_nombre": "test"}
+
+
+def _contar(app, accion="prueba"):
+    with app.app_context():
+        n = db.session.scalar(db.select(func.count(Auditoria.id_auditoria)).where(Auditoria.accion == accion))
+        db.session.remove()
+        return n
+
+
+def test_escribe_por_lotes_de_tamano(app):
+    for n in range(12):
+        cola_auditoria.registrar(_fila(n), app=app)
+    cola_auditoria.vaciar(app)
+
+    assert _contar(app) == 12
+    est = cola_auditoria.estadisticas(app)
+    assert est["lotes"] == 3  # 5 + 5 + 2 (el último al vaciar)
+    assert est["escritas"] == 12 and est["pendientes"] == 0
+
+
+def test_escribe_al_cumplirse_el_intervalo(app):
+    app.config["AUDITORIA_INTERVALO"] = 0.05
+    cola_auditoria.registrar(_fila(1), app=app)
+    limite = time.monotonic() + 5
+    while _contar(app) < 1 and time.monotonic() < limite:
+        time.sleep(0.02)
+    assert _contar(app) == 1
+
+
+def test_contrapresion_escribe_directo(app, monkeypatch):
+    lotes = app.extensions["cola_auditoria"]
+    monkeypatch.setattr(lotes, "iniciar", lambda: None)  # sin escritor: la cola no se vacía
+    lotes.cola.maxsize = 2
+    app.config["AUDITORIA_ESPERA"] = 0.01
+
+    with app.app_context():
+        for n in range(5):
+            cola_auditoria.registrar(_fila(n), app=app)
+
+    assert cola_auditoria.estadisticas(app)["directas"] == 3
+    assert _contar(app) == 3  # las dos encoladas siguen pendientes
+
+
+def test_cerrar_escribe_lo_pendiente(app):
+    for n in range(3):
+        cola_auditoria.registrar(_fila(n), app=app)
+    cola_auditoria.cerrar(app)
+    assert _contar(app) == 3
+
+
+def test_rutas_auditan_sin_insert_en_el_request(app):
+    with app.app_context():
+        u = Usuario(username="admin", email="a@x.cl", rol="administrador")
+        u.set_password("x")
+        db.session.add(u)
+        db.session.commit()
+    cliente = app.test_client()
+    cliente.post("/auth/login", data={"username": "admin", "password": "x"})
+
+    r = cliente.post("/cliente/nuevo", data={"nombre": "Ana", "email": "", "telefono": ""})
+    assert r.status_code == 302
+    assert _contar(app, "crear_cliente") == 0  # todavía en la cola
+
+    cola_auditoria.vaciar(app)
+    with app.app_context():
+        fila = Auditoria.query.filter_by(accion="crear_cliente").one()
+        assert (fila.usuario_nombre, fila.detalles_json["nombre"]) == ("admin", "Ana")
@@ -0,0 +1,47 @@
+# tests/test_exportar_excel.py
+"""Motor Excel: celdas tipadas (fecha, CLP, entero, texto) con su formato."""
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from utils.exportar_excel import FORMATO_CLP, FORMATO_ENTERO, FORMATO_FECHA, FORMATO_FECHA_HORA, generar
+
+openpyxl = pytest.importorskip("openpyxl")
+
+COLUMNAS = ["ID", "Fecha", "Registrado", "Total CLP", "Cliente"]
+
+
+def _hoja(filas):
+    return openpyxl.load_workbook(generar(COLUMNAS, filas)).active
+
+
+def test_celdas_tipadas_con_formato():
+    hoja = _hoja([
+        (1, date(2025, 3, 14), datetime(2025, 3, 14, 9, 30), Decimal("12990.00"), "Ana"),
+        (2, None, None, Decimal("1500.50"), None),
+    ])
+    assert [c.value for c in hoja[1]] == COLUMNAS
+    id_, fecha, registrado, total, cliente = hoja[2]
+
+    assert id_.value == 1 and id_.number_format == FORMATO_ENTERO
+    assert fecha.is_date and fecha.value.date() == date(2025, 3, 14) and fecha.number_format == FORMATO_FECHA
+    assert registrado.value == datetime(2025, 3, 14, 9, 30) and registrado.number_format == FORMATO_FECHA_HORA
+    assert total.value == 12990 and total.number_format == FORMATO_CLP
+    assert cliente.value == "Ana" and cliente.data_type == "s"
+
+    assert hoja["D3"].value == 1500.5
+    assert hoja["B3"].value is None and hoja["E3"].value is None
+
+
+def test_valor_fuera_de_tipo_no_rompe_el_reporte():
+    hoja = _hoja([(1, date(2025, 1, 1), None, Decimal(1), "a"), ("N/A", "sin fecha", None, 5, 7)])
+    assert hoja["A3"].value == "N/A"
+    assert hoja["B3"].value == "sin fecha"
+    assert hoja["E3"].value == 7
+
+
+def test_sin_filas():
+    hoja = _hoja([])
+    assert [c.value for c in hoja[1]] == COLUMNAS
+    assert hoja.max_row == 1
@@ -0,0 +1,51 @@
+# tests/test_exportar_pdf.py
+"""Motor PDF: estructura válida, encabezado repetido y truncado de valores largos."""
+import re
+import zlib
+
+from utils.exportar_pdf import generar
+
+COLUMNAS = ["ID", "Cliente", "Total"]
+
+
+def _leer(columnas, filas, titulo="Reporte"):
+    return generar(columnas, filas, titulo).read()
+
+
+def _flujos(pdf):
+    return [zlib.decompress(m) for m in re.findall(rb"stream\n(.*?)\nendstream", pdf, re.S)]
+
+
+def test_xref_apunta_a_cada_objeto():
+    pdf = _leer(COLUMNAS, [(i, f"Cliente {i}", i * 1000) for i in range(2000)])
+    assert pdf.startswith(b"%PDF-1.4") and pdf.endswith(b"%%EOF\n")
+
+    inicio = int(pdf.rsplit(b"startxref\n", 1)[1].split()[0])
+    lineas = pdf[inicio:].split(b"\n")
+    total = int(lineas[1].split()[1])
+    for id_obj, linea in enumerate(lineas[3:3 + total - 1], start=1):
+        assert pdf[int(linea[:10]):].startswith(b"%d 0 obj" % id_obj)
+
+
+def test_paginas_reutilizan_el_encabezado():
+    pdf = _leer(COLUMNAS, [(i, f"Cliente {i}", i) for i in range(500)], titulo="Ventas")
+    paginas = int(re.search(rb"/Type /Pages /Count (\d+)", pdf).group(1))
+    assert paginas > 1
+    contenidos = [f for f in _flujos(pdf) if f.startswith(b"/Enc Do")]
+    assert len(contenidos) == paginas
+    # título y nombres de columna se escriben una sola vez (en el XObject)
+    assert sum(f.count(b"(Ventas)") for f in _flujos(pdf)) == 1
+
+
+def test_valores_largos_se_truncan_sin_perder_columnas():
+    filas = [(1, "Cliente " + "muy largo " * 100, 990)]
+    pdf = _leer(COLUMNAS, filas)
+    flujo = next(f for f in _flujos(pdf) if f.startswith(b"/Enc Do"))
+    assert b"\x85)" in flujo  # elipsis en WinAnsi
+    assert b"(990)" in flujo
+    assert b"/MediaBox [0 0 612.00 792.00]" in pdf
+
+
+def test_sin_datos():
+    flujos = _flujos(_leer(COLUMNAS, []))
+    assert any(b"(No hay datos para mostrar)" in f for f in flujos)
@@ -0,0 +1,123 @@
+# tests/test_importacion.py
+"""Importación masiva: upsert de productos e inventario por lotes e informe de errores por fila."""
+import io
+
+import pytest
+from sqlalchemy import func, select
+
+from app import create_app
+from models import db, Inventario, Producto, Proveedor, Tienda, ResumenKPI
+from utils.importacion import importar, leer_filas, ArchivoInvalido
+from utils.kpi import reconciliar_kpis
+from utils.movimientos import abrir_libro
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({"APP_ENV": "test", "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'importar.db'}"})
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Proveedor(nombre="Acme"), Proveedor(nombre="Otro"),
+                            Tienda(nombre="Centro"), Tienda(nombre="Norte")])
+        db.session.commit()
+        yield app
+        db.session.remove()
+
+
+def _csv(texto):
+    return leer_filas(io.BytesIO(texto.encode("utf-8")), "datos.csv")
+
+
+def _stock_kpi(id_tienda):
+    return db.session.scalar(select(ResumenKPI.valor).where(
+        ResumenKPI.clave == "stock_tienda", ResumenKPI.id_tienda == id_tienda))
+
+
+def test_productos_inserta_actualiza_y_reporta_errores(app):
+    resultado = importar("productos", _csv(
+        "Nombre;Precio;Stock;Proveedor\n"
+        "Té;1.990,50;3;Acme\n"
+        "Café;2500;;2\n"
+        ";100;1;Acme\n"
+        "Pan;abc;1;Acme\n"
+        "Leche;900;1;Desconocido\n"
+    ), lote=2)
+    assert (resultado.procesadas, resultado.insertadas, resultado.total_errores) == (5, 2, 3)
+    assert [e["fila"] for e in resultado.errores] == [4, 5, 6]
+
+    # Misma clave (nombre, proveedor) -> actualiza; otro proveedor -> producto nuevo
+    resultado = importar("productos", _csv("nombre,precio\nTé,2100\nTé,50\n"))
+    assert resultado.actualizadas == 0 and resultado.insertadas == 1  # sin proveedor: otra clave, la última fila gana
+    resultado = importar("productos", _csv("nombre,precio,proveedor\nTé,2100,Acme\n"))
+    assert resultado.actualizadas == 1
+
+    te = Producto.query.filter_by(nombre="Té", id_proveedor=1).one()
+    assert (te.precio, te.stock) == (2100, 0)  # la columna Stock se ignora: el stock viene del inventario
+    assert Producto.query.count() == 3
+    assert Producto.query.filter_by(nombre="Té", id_proveedor=None).one().precio == 50
+
+
+def test_inventario_upsert_reemplaza_o_suma(app):
+    importar("productos", _csv("nombre,precio,proveedor\nTé,100,Acme\nTé,100,Otro\nCafé,100,Acme\n"))
+    db.session.add(Inventario(id_producto=3, id_tienda=1, cantidad=10))  # cargado por fuera del libro
+    reconciliar_kpis()
+    db.session.commit()
+    assert abrir_libro() == 1
+
+    resultado = importar("inventario", _csv(
+        "producto,proveedor,tienda,cantidad\n"
+        "Café,,Centro,4\n"      # existente -> 4
+        "Té,Otro,Norte,7\n"     # nuevo
+        "Té,,Norte,1\n"         # ambiguo
+        "Café,,Sur,1\n"         # tienda inexistente
+        "Café,,Norte,-2\n"      # cantidad negativa
+    ))
+    assert (resultado.insertadas, resultado.actualizadas, resultado.total_errores) == (1, 1, 3)
+    assert "varios proveedores" in resultado.errores[0]["error"]
+
+    resultado = importar("inventario", _csv("id_producto,tienda,cantidad\n3,1,5\n3,1,5\n"), modo="sumar")
+    assert resultado.total_errores == 0
+
+    cantidades = dict(db.session.execute(select(Inventario.id_producto, Inventario.cantidad)).all())
+    assert cantidades == {3: 14, 2: 7}
+    assert _stock_kpi(1) == 14 and _stock_kpi(2) == 7
+    assert db.session.get(Producto, 3).stock == 14
+
+
+def test_lee_xlsx(app, tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    libro = openpyxl.Workbook()
+    hoja = libro.active
+    hoja.append(["Nombre", "Precio", "Proveedor"])
+    hoja.append(["Azúcar", 1200, "Acme"])
+    hoja.append([None, None, None])
+    hoja.append(["Sal", 500.0, 1])
+    ruta = tmp_path / "productos.xlsx"
+    libro.save(ruta)
+
+    with open(ruta, "rb") as archivo:
+        resultado = importar("productos", leer_filas(archivo, "productos.xlsx"))
+    assert (resultado.insertadas, resultado.total_errores) == (2, 0)
+    assert db.session.scalar(select(func.sum(Producto.precio))) == 1700
+
+
+def test_ruta_solo_admin_y_json(app):
+    cliente = app.test_client()
+    with cliente.session_transaction() as s:
+        s.update(user_id=1, username="admin", rol="administrador")
+
+    datos = {"tipo": "productos", "archivo": (io.BytesIO(b"nombre,precio\nT\xc3\xa9,10\n"), "p.csv")}
+    r = cliente.post("/admin/importar/", data=datos, headers={"Accept": "application/json"})
+    assert r.status_code == 200
+    assert r.get_json()["insertadas"] == 1
+
+    r = cliente.post("/admin/importar/", data={"tipo": "productos", "archivo": (io.BytesIO(b"x"), "p.pdf")},
+                     headers={"Accept": "application/json"})
+    assert r.status_code == 400
+
+    with cliente.session_transaction() as s:
+        s["rol"] = "usuario"
+    assert cliente.get("/admin/importar/").status_code == 302
+
+    with pytest.raises(ArchivoInvalido):
+        list(leer_filas(io.BytesIO(b""), "vacio.csv"))
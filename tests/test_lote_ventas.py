@@ -0,0 +1,83 @@
+# tests/test_lote_ventas.py
+"""Ingesta de ventas en lote: validación por venta, stock todo-o-nada y contadores consistentes."""
+import pytest
+from sqlalchemy import func, select
+
+from app import create_app
+from models import db, Cliente, DetalleVenta, Inventario, Producto, Tienda, Venta
+from utils.kpi import reconciliar_kpis
+from utils.lote_ventas import ingestar_ventas
+from utils.movimientos import abrir_libro, verificar
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({"APP_ENV": "test", "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'lote.db'}"})
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Cliente(nombre="C1"), Tienda(nombre="T1"), Tienda(nombre="T2"),
+                            Producto(nombre="A", precio=1000, stock=0), Producto(nombre="B", precio=250, stock=0)])
+        db.session.flush()
+        db.session.add_all([Inventario(id_producto=1, id_tienda=1, cantidad=5),
+                            Inventario(id_producto=2, id_tienda=1, cantidad=100),
+                            Inventario(id_producto=1, id_tienda=2, cantidad=1)])
+        reconciliar_kpis()
+        db.session.commit()
+        abrir_libro()
+        yield app
+        db.session.remove()
+
+
+def _venta(*lineas, tienda=1, **extra):
+    return {"id_cliente": 1, "id_tienda": tienda, "fecha": "2025-06-01",
+            "detalles": [{"id_producto": p, "cantidad": c} for p, c in lineas], **extra}
+
+
+def _stock():
+    filas = db.session.execute(select(Inventario.id_producto, Inventario.id_tienda, Inventario.cantidad))
+    return {(p, t): c for p, t, c in filas}
+
+
+def test_acepta_y_rechaza_por_venta(app):
+    resultados = ingestar_ventas([
+        _venta((1, 3), (2, 4), ref="a"),    # total 4000
+        _venta((1, 3)),                     # solo quedan 2 de A en T1
+        _venta((1, 1), (1, 1)),             # dos líneas del mismo producto: 2 <= 2
+        _venta((9, 1)),                     # producto inexistente
+        _venta((1, 1), tienda=2),
+        _venta((1, 1), tienda=2),           # T2 ya no tiene
+        {"id_cliente": 1, "id_tienda": 1, "detalles": []},
+        _venta((2, 1), id_cliente=99),
+        "basura",
+    ], tamano_trozo=2)
+
+    assert [r["ok"] for r in resultados] == [True, False, True, False, True, False, False, False, False]
+    assert resultados[0]["ref"] == "a" and resultados[0]["total"] == "4000.00"
+    assert "Stock insuficiente" in resultados[1]["error"]
+    assert "inexistente" in resultados[3]["error"]
+    assert "cliente" in resultados[7]["error"]
+
+    assert _stock() == {(1, 1): 0, (2, 1): 96, (1, 2): 0}
+    assert db.session.scalar(select(func.count(Venta.id_venta))) == 3
+    venta = db.session.get(Venta, resultados[2]["id_venta"])
+    assert [(d.id_producto, d.cantidad) for d in venta.detalles] == [(1, 2)]
+    assert venta.total == 2000
+    assert db.session.scalar(select(func.sum(DetalleVenta.subtotal))) == 4000 + 2000 + 1000
+    assert reconciliar_kpis() == []  # los contadores del dashboard quedaron al día
+    assert verificar() == []  # un movimiento de venta por línea; Producto.stock al día
+
+
+def test_ruta_json(app):
+    cliente = app.test_client()
+    with cliente.session_transaction() as s:
+        s.update(user_id=1, username="admin", rol="administrador")
+
+    r = cliente.post("/venta/api/lote", json={"ventas": [_venta((2, 10)), _venta((2, 1000))]})
+    assert r.status_code == 200
+    cuerpo = r.get_json()
+    assert (cuerpo["aceptadas"], cuerpo["rechazadas"]) == (1, 1)
+    assert cuerpo["resultados"][0]["id_venta"]
+
+    assert cliente.post("/venta/api/lote", json={"ventas": "x"}).status_code == 400
+    app.config["VENTAS_LOTE_MAX"] = 1
+    assert cliente.post("/venta/api/lote", json=[_venta((2, 1))] * 2).status_code == 413
@@ -0,0 +1,55 @@
+# tests/test_perfil_sql.py
+"""Perfil SQL por request: sentencias que fallan y respuestas en streaming."""
+import pytest
+from flask import g
+from sqlalchemy import insert, text
+from sqlalchemy.exc import OperationalError
+
+from app import create_app
+from models import db, Auditoria
+from utils.perfil_sql import perfil_sql
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({"APP_ENV": "test", "SQL_PERFIL_MUESTREO": 1.0,
+                      "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'perfil.db'}"})
+    with app.app_context():
+        db.create_all()
+        db.session.execute(insert(Auditoria), [{"accion": "crear_producto", "usuario_nombre": "u"}] * 3)
+        db.session.commit()
+        perfil_sql.reiniciar()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def admin(app):
+    cliente = app.test_client()
+    with cliente.session_transaction() as s:
+        s.update(user_id=1, username="admin", rol="administrador")
+    return cliente
+
+
+def test_sentencia_que_falla(app):
+    with app.test_request_context("/x"), db.engine.connect() as conexion:
+        perfil_sql._iniciar()
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conexion.execute(text("SELECT * FROM no_existe"))
+            conexion.rollback()
+        conexion.execute(text("SELECT 1"))
+        # Nada queda pendiente en la conexión (vuelve al pool y la reusa otro request)
+        assert not any(conexion.info.values())
+        assert g._perfil_sql["consultas"] == 1
+
+
+def test_respuesta_en_streaming(admin):
+    r = admin.get("/admin/auditoria.csv")
+    assert "db;dur=" in r.headers["Server-Timing"]
+    assert r.get_data(as_text=True).count("crear_producto") == 3
+    r.close()
+
+    _, recientes = perfil_sql.resumen()
+    registro = next(x for x in recientes if x["path"] == "/admin/auditoria.csv")
+    assert registro["consultas"] >= 1  # la consulta de la auditoría corre mientras se envía el cuerpo
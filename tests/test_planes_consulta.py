@@ -0,0 +1,269 @@
+# tests/test_planes_consulta.py
+"""
+Regresión de planes de ejecución: las consultas frecuentes de reportes y
+ventas deben resolverse con índices, nunca recorriendo la tabla completa.
+
+Se ejecuta cada función real de la aplicación sobre una base con datos,
+se capturan las sentencias que emite y se pide su EXPLAIN:
+  - SQLite: EXPLAIN QUERY PLAN; "SCAN <tabla>" sin índice es un recorrido completo.
+  - MySQL:  EXPLAIN; type = ALL es un recorrido completo.
+
+Por defecto usa un archivo SQLite temporal; para probar contra MySQL:
+    PLANES_DB_URI=mysql+pymysql://root:@localhost/inventario_planes pytest tests/test_planes_consulta.py
+"""
+import os
+import random
+import re
+from datetime import date, datetime, timedelta
+
+import pytest
+from flask import Flask
+from sqlalchemy import event, insert, text
+
+from extensions import db
+from models import Auditoria, Cliente, DetalleVenta, Inventario, Producto, Proveedor, Tienda, Venta
+from routes.reportes import obtener_detalle_ventas, obtener_ventas_por_dia, obtener_ventas_por_producto
+from utils import auditoria
+from utils.indices import indices_faltantes
+from utils.recalculo import recalcular_totales_ventas
+from utils.busqueda_productos import buscar as buscar_productos, reindexar as reindexar_productos
+from utils.stock import devolver_stock, reservar_stock
+from utils.ventas_diarias import reconstruir as reconstruir_ventas_diarias, sumar_ventas
+
+TIENDAS = 5
+PRODUCTOS = 200
+CLIENTES = 50
+VENTAS = 3000
+LINEAS_POR_VENTA = 3
+AUDITORIAS = 2000
+INICIO = date(2024, 1, 1)
+
+
+def _sembrar():
+    rnd = random.Random(7)
+    db.session.execute(insert(Proveedor), [{"id_proveedor": 1, "nombre": "Proveedor"}])
+    db.session.execute(insert(Tienda), [
+        {"id_tienda": t, "nombre": f"Tienda {t}"} for t in range(1, TIENDAS + 1)
+    ])
+    db.session.execute(insert(Cliente), [
+        {"id_cliente": c, "nombre": f"Cliente {c}"} for c in range(1, CLIENTES + 1)
+    ])
+    db.session.execute(insert(Producto), [
+        {"id_producto": p, "nombre": f"Producto {p:04d}", "precio": 1000 + p, "stock": TIENDAS * 10_000, "id_proveedor": 1}
+        for p in range(1, PRODUCTOS + 1)
+    ])
+    db.session.execute(insert(Inventario), [
+        {"id_producto": p, "id_tienda": t, "cantidad": 10_000}
+        for p in range(1, PRODUCTOS + 1) for t in range(1, TIENDAS + 1)
+    ])
+    db.session.execute(insert(Venta), [
+        {
+            "id_venta": v,
+            "fecha": INICIO + timedelta(days=rnd.randrange(365)),
+            "total": 0,
+            "id_cliente": rnd.randint(1, CLIENTES),
+            "id_tienda": rnd.randint(1, TIENDAS),
+        }
+        for v in range(1, VENTAS + 1)
+    ])
+    db.session.execute(insert(DetalleVenta), [
+        {"id_venta": v, "id_producto": rnd.randint(1, PRODUCTOS), "cantidad": 1, "subtotal": 1000}
+        for v in range(1, VENTAS + 1) for _ in range(LINEAS_POR_VENTA)
+    ])
+    db.session.execute(insert(Auditoria), [
+        {"fecha_hora": datetime(2024, 1, 1) + timedelta(minutes=7 * i), "accion": ("prueba", "otra")[i % 2],
+         "usuario_id": i % 10, "usuario_nombre": "x"}
+        for i in range(AUDITORIAS)
+    ])
+    db.session.commit()
+    reconstruir_ventas_diarias()
+    reindexar_productos()
+
+    # Estadísticas para el optimizador
+    with db.engine.begin() as conn:
+        if db.engine.dialect.name == "mysql":
+            for tabla in db.metadata.sorted_tables:
+                conn.execute(text(f"ANALYZE TABLE `{tabla.name}`"))
+        else:
+            conn.execute(text("ANALYZE"))
+
+
+@pytest.fixture(scope="module")
+def app(tmp_path_factory):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get(
+        "PLANES_DB_URI", f"sqlite:///{tmp_path_factory.mktemp('planes') / 'planes.db'}"
+    )
+    db.init_app(app)
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        _sembrar()
+    yield app
+    with app.app_context():
+        db.drop_all()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def ctx(app):
+    with app.app_context():
+        yield
+        db.session.rollback()
+
+
+def _capturar(funcion):
+    """Ejecuta la función y retorna las sentencias SELECT/UPDATE que emitió."""
+    sentencias = []
+
+    def registrar(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            # executemany: el plan es el mismo para cada juego de parámetros
+            sentencias.append((statement, parameters[0] if executemany else parameters))
+
+    event.listen(db.engine, "before_cursor_execute", registrar)
+    try:
+        funcion()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", registrar)
+    return sentencias
+
+
+def _recorridos_completos(statement, parameters):
+    """Tablas que el plan recorre completas (sin índice)."""
+    conn = db.session.connection()
+    cursor = conn.connection.cursor()
+    try:
+        if db.engine.dialect.name == "mysql":
+            cursor.execute("EXPLAIN " + statement, parameters)
+            columnas = [c[0] for c in cursor.description]
+            filas = [dict(zip(columnas, f)) for f in cursor.fetchall()]
+            return [f["table"] for f in filas if f["type"] == "ALL"], filas
+
+        cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+        filas = [f[-1] for f in cursor.fetchall()]
+        completos = []
+        for detalle in filas:
+            m = re.match(r"SCAN (\w+)", detalle)
+            if m and "USING" not in detalle:
+                completos.append(m.group(1))
+        return completos, filas
+    finally:
+        cursor.close()
+
+
+def _sin_recorridos(funcion, permitidas=()):
+    sentencias = _capturar(funcion)
+    assert sentencias, "la función no emitió consultas"
+    for statement, parameters in sentencias:
+        completos, plan = _recorridos_completos(statement, parameters)
+        completos = [t for t in completos if t not in permitidas]
+        assert not completos, f"Recorrido completo de {completos}:\n{statement}\nPlan: {plan}"
+
+
+# -------------------------------
+# Esquema
+# -------------------------------
+def test_no_faltan_indices(ctx):
+    assert [ix.name for ix in indices_faltantes()] == []
+
+
+# -------------------------------
+# Reportes
+# -------------------------------
+def test_detalle_ventas_por_rango_de_fechas(ctx):
+    _sin_recorridos(lambda: obtener_detalle_ventas(
+        fecha_inicio=date(2024, 3, 1), fecha_fin=date(2024, 3, 7)
+    ).all())
+
+
+def test_detalle_ventas_por_cliente_y_fechas(ctx):
+    _sin_recorridos(lambda: obtener_detalle_ventas(
+        fecha_inicio=date(2024, 3, 1), fecha_fin=date(2024, 6, 30), cliente=7
+    ).all())
+
+
+def test_detalle_ventas_por_cliente(ctx):
+    _sin_recorridos(lambda: obtener_detalle_ventas(cliente=7).all())
+
+
+FILTROS_AUDITORIA = [
+    {},
+    {"accion": "prueba"},
+    {"usuario_id": 3},
+    {"desde": date(2024, 1, 3), "hasta": date(2024, 1, 5)},
+    {"accion": "prueba", "desde": date(2024, 1, 3)},
+]
+
+
+@pytest.mark.parametrize("filtros", FILTROS_AUDITORIA)
+def test_auditoria_pagina_keyset(ctx, filtros):
+    despues = (datetime(2024, 1, 6), 900)
+    _sin_recorridos(lambda: auditoria.pagina(filtros))
+    _sin_recorridos(lambda: auditoria.pagina(filtros, despues=despues))
+
+
+@pytest.mark.parametrize("filtros", FILTROS_AUDITORIA[:3])
+def test_auditoria_no_ordena_en_memoria(ctx, filtros):
+    # Además de no recorrer la tabla, el orden debe salir del índice
+    ((statement, parameters),) = _capturar(lambda: auditoria.pagina(filtros))
+    _, plan = _recorridos_completos(statement, parameters)
+    if db.engine.dialect.name == "mysql":
+        assert not any("filesort" in (f.get("Extra") or "") for f in plan), plan
+    else:
+        assert not any("TEMP B-TREE" in f for f in plan), plan
+
+
+# -------------------------------
+# Ventas
+# -------------------------------
+def test_reservar_y_devolver_stock(ctx):
+    pedido = {3: 1, 40: 2, 150: 1}
+    _sin_recorridos(lambda: reservar_stock(2, pedido))
+    _sin_recorridos(lambda: devolver_stock(2, pedido))
+
+
+def test_inventario_por_producto_y_tienda(ctx):
+    _sin_recorridos(lambda: Inventario.query.filter_by(id_producto=10, id_tienda=3).first())
+
+
+def test_inventario_de_una_tienda(ctx):
+    _sin_recorridos(lambda: Inventario.query.filter_by(id_tienda=3).all())
+
+
+def test_detalles_de_una_venta(ctx):
+    _sin_recorridos(lambda: DetalleVenta.query.filter_by(id_venta=1234).all())
+
+
+def test_recalculo_de_totales_por_lote(ctx):
+    # El UPDATE recorre su rango de ventas por PK; la suma debe usar el índice de DetalleVenta
+    _sin_recorridos(lambda: recalcular_totales_ventas(lote=500))
+
+
+# -------------------------------
+# Resumen diario de ventas
+# -------------------------------
+def test_reportes_agregados_leen_solo_el_resumen(ctx):
+    rango = {"fecha_inicio": date(2024, 3, 1), "fecha_fin": date(2024, 3, 31)}
+    for funcion in (obtener_ventas_por_dia, obtener_ventas_por_producto):
+        sentencias = _capturar(lambda: funcion(**rango).all())
+        assert not any("Venta\"" in s or "DetalleVenta" in s for s, _ in sentencias)
+        # anon_1 es el agregado ya materializado; Tienda es un catálogo de pocas filas
+        _sin_recorridos(lambda: funcion(**rango).all(), permitidas=("Tienda", "anon_1"))
+    _sin_recorridos(lambda: obtener_ventas_por_dia(tienda=2, **rango).all(), permitidas=("Tienda",))
+
+
+def test_ajuste_del_resumen_por_venta(ctx):
+    _sin_recorridos(lambda: sumar_ventas([1234, 1235], signo=-1))
+
+
+# -------------------------------
+# Búsqueda de productos
+# -------------------------------
+def test_busqueda_por_palabras_del_nombre(ctx):
+    # "012" no es prefijo del nombre: se resuelve con el rango sobre producto_palabras
+    productos, siguiente = buscar_productos("012", id_tienda=3, limite=5)
+    assert [p["id_producto"] for p in productos] == [120, 121, 122, 123, 124]
+    assert siguiente == "2:124"
+    _sin_recorridos(lambda: buscar_productos("012", id_tienda=3, despues=(2, 124)))
@@ -0,0 +1,113 @@
+# tests/test_stock_concurrencia.py
+"""
+Prueba de estrés: muchas ventas concurrentes sobre el mismo inventario no
+pueden sobrevender.
+
+Por defecto usa un archivo SQLite temporal; para probar contra MySQL:
+    STRESS_DB_URI=mysql+pymysql://root:@localhost/inventario_stress pytest tests/test_stock_concurrencia.py
+"""
+import os
+import threading
+
+import pytest
+from flask import Flask
+
+from extensions import db
+from models import Inventario, Producto, Proveedor, Tienda
+from utils.movimientos import abrir_libro
+from utils.stock import StockInsuficiente, reservar_stock
+
+HILOS = 16
+INTENTOS_POR_HILO = 25
+STOCK_INICIAL = 100
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get(
+        "STRESS_DB_URI", f"sqlite:///{tmp_path / 'stress.db'}"
+    )
+    if app.config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite"):
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"connect_args": {"timeout": 30}}
+    db.init_app(app)
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add(Tienda(id_tienda=1, nombre="Tienda"))
+        db.session.add(Proveedor(id_proveedor=1, nombre="Proveedor"))
+        db.session.add_all([
+            Producto(id_producto=i, nombre=f"P{i}", precio=1000, stock=0, id_proveedor=1)
+            for i in (1, 2, 3)
+        ])
+        db.session.add_all([
+            Inventario(id_producto=i, id_tienda=1, cantidad=STOCK_INICIAL) for i in (1, 2, 3)
+        ])
+        db.session.commit()
+        abrir_libro()
+    yield app
+    with app.app_context():
+        db.drop_all()
+        db.engine.dispose()
+
+
+def _cajero(app, pedidos, resultados, barrera):
+    with app.app_context():
+        barrera.wait()
+        for pedido in pedidos:
+            try:
+                reservar_stock(1, pedido)
+                db.session.commit()
+                resultados.append(("ok", pedido))
+            except StockInsuficiente as e:
+                db.session.rollback()
+                resultados.append(("falla", e.fallos))
+
+
+def test_sin_sobreventa_con_cajeros_concurrentes(app):
+    # Cada venta pide 1..3 unidades de varios productos (en distinto orden por hilo)
+    pedidos_por_hilo = [
+        [
+            {1: 1 + (h + k) % 3, 2: 1, 3: 2} if h % 2 else {3: 2, 1: 1 + (h + k) % 3}
+            for k in range(INTENTOS_POR_HILO)
+        ]
+        for h in range(HILOS)
+    ]
+    resultados = []
+    barrera = threading.Barrier(HILOS)
+    hilos = [
+        threading.Thread(target=_cajero, args=(app, pedidos, resultados, barrera))
+        for pedidos in pedidos_por_hilo
+    ]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    vendidos = {1: 0, 2: 0, 3: 0}
+    for estado, pedido in resultados:
+        if estado == "ok":
+            for p, n in pedido.items():
+                vendidos[p] += n
+
+    with app.app_context():
+        finales = dict(db.session.query(Inventario.id_producto, Inventario.cantidad).all())
+
+    assert len(resultados) == HILOS * INTENTOS_POR_HILO
+    assert any(estado == "falla" for estado, _ in resultados)  # la demanda supera el stock
+    for p in (1, 2, 3):
+        assert finales[p] >= 0
+        assert finales[p] == STOCK_INICIAL - vendidos[p]
+
+
+def test_reporta_exactamente_las_lineas_que_fallan(app):
+    with app.app_context():
+        with pytest.raises(StockInsuficiente) as exc:
+            reservar_stock(1, {1: 5, 2: STOCK_INICIAL + 1, 9: 1}, nombres={2: "P2"})
+        assert [f["id_producto"] for f in exc.value.fallos] == [2, 9]
+        assert exc.value.fallos[1]["disponible"] is None
+        assert "P2" in str(exc.value)
+
+        # Todo o nada: la línea que sí alcanzaba no quedó descontada
+        assert db.session.get(Inventario, 1).cantidad == STOCK_INICIAL
@@ -0,0 +1,158 @@
+# tests/test_totales_venta.py
+"""Venta.total = suma de sus subtotales después de cada ruta que crea, edita o borra ventas y detalles."""
+import pytest
+from sqlalchemy import func, insert, select
+
+from app import create_app
+from models import db, Cliente, DetalleVenta, Inventario, Producto, ResumenKPI, Tienda, Venta, VersionDatos
+from utils.cache import invalidar
+from utils.kpi import ajustar_kpi, reconciliar_kpis
+from utils.ventas import insertar_filas_detalle
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({"APP_ENV": "test", "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'totales.db'}"})
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Cliente(nombre="C1"), Tienda(nombre="T1")])
+        db.session.add_all([Producto(nombre=f"P{i}", precio=100 * i + 0.5, stock=1000) for i in range(1, 4)])
+        db.session.flush()
+        db.session.add_all([Inventario(id_producto=i, id_tienda=1, cantidad=1000) for i in range(1, 4)])
+        reconciliar_kpis()
+        db.session.commit()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def admin(app):
+    cliente = app.test_client()
+    with cliente.session_transaction() as s:
+        s.update(user_id=1, username="admin", rol="administrador")
+    return cliente
+
+
+def _lineas(*lineas):
+    datos = {}
+    for i, (id_producto, cantidad) in enumerate(lineas):
+        datos[f"detalles[{i}][id_producto]"] = id_producto
+        datos[f"detalles[{i}][cantidad]"] = cantidad
+    return datos
+
+
+def _descuadres():
+    """Ventas cuyo total no coincide con la suma de sus detalles."""
+    suma = (
+        select(func.coalesce(func.sum(DetalleVenta.subtotal), 0))
+        .where(DetalleVenta.id_venta == Venta.id_venta)
+        .scalar_subquery()
+    )
+    db.session.expire_all()
+    return db.session.execute(select(Venta.id_venta, Venta.total, suma).where(Venta.total != suma)).all()
+
+
+def _assert_consistente():
+    assert _descuadres() == []
+    assert reconciliar_kpis() == []
+    db.session.rollback()
+
+
+# Un flush que borra dos veces la misma fila solo avisa (SAWarning): aquí debe fallar
+@pytest.mark.filterwarnings("error::sqlalchemy.exc.SAWarning")
+def test_rutas_de_venta_y_detalle(admin):
+    base = {"id_cliente": 1, "id_tienda": 1}
+    admin.post("/venta/nuevo", data={**base, **_lineas((1, 2), (2, 1), (1, 1))})
+    admin.post("/venta/nuevo", data={**base, **_lineas((3, 4))})
+    assert db.session.scalar(select(Venta.total).where(Venta.id_venta == 1)) == 3 * 100.5 + 200.5
+    _assert_consistente()
+
+    admin.post("/venta/editar/1", data={"id_cliente": 1, **_lineas((2, 5))})
+    _assert_consistente()
+
+    admin.post("/detalle/nuevo", data={"id_cliente": 1, "id_tienda": 1, **_lineas((1, 1), (3, 2))})
+    _assert_consistente()
+
+    # Editar un detalle: cambia su subtotal y además lo mueve a otra venta
+    id_detalle = db.session.scalar(select(DetalleVenta.id_detalle).where(DetalleVenta.id_venta == 3).limit(1))
+    admin.post(f"/detalle/editar/{id_detalle}", data={"id_venta": 2, "id_producto": 2, "cantidad": 3})
+    assert db.session.get(DetalleVenta, id_detalle).id_venta == 2
+    _assert_consistente()
+
+    admin.post(f"/detalle/eliminar/{id_detalle}")
+    _assert_consistente()
+
+    admin.post("/venta/api/lote", json=[{"id_cliente": 1, "id_tienda": 1, "detalles": [
+        {"id_producto": 1, "cantidad": 2}, {"id_producto": 3, "cantidad": 1}]}])
+    _assert_consistente()
+
+    admin.post("/venta/eliminar/2")
+    assert db.session.get(Venta, 2) is None
+    assert db.session.scalar(select(func.count(DetalleVenta.id_detalle)).where(DetalleVenta.id_venta == 2)) == 0
+    _assert_consistente()
+    assert db.session.scalar(select(func.count(Venta.id_venta))) == 3
+
+
+def test_diferencias_sin_cargar_la_coleccion(app):
+    venta = Venta(id_cliente=1, id_tienda=1, total=0)
+    db.session.add(venta)
+    db.session.flush()
+
+    for i in range(1, 4):
+        db.session.add(DetalleVenta(id_venta=venta.id_venta, id_producto=i, cantidad=1, subtotal=10 * i))
+    db.session.flush()
+    assert venta.total == 60
+    assert "detalles" not in venta.__dict__  # la colección nunca se cargó
+
+    insertar_filas_detalle([{"id_venta": venta.id_venta, "id_producto": 1, "cantidad": 1, "subtotal": 5}] * 2)
+    assert venta.total == 70
+
+    detalle = db.session.scalar(select(DetalleVenta).where(DetalleVenta.subtotal == 30))
+    detalle.subtotal = 1
+    db.session.flush()
+    assert venta.total == 41
+
+    db.session.commit()
+    assert db.session.scalar(select(Venta.total)) == 41
+    assert _descuadres() == []
+
+
+def test_contador_nuevo_creado_por_otro_worker(app):
+    # Dos workers registran la primera venta del día: el segundo en hacer commit suma, no choca
+    ajustar_kpi("ventas_dia", 1, periodo="2031-01-01")
+    ajustar_kpi("ventas_dia", 1, periodo="2031-01-01")
+    with db.engine.begin() as otro_worker:
+        otro_worker.execute(insert(ResumenKPI).values(clave="ventas_dia", id_tienda=0, periodo="2031-01-01", valor=5))
+    db.session.commit()
+    assert db.session.scalar(select(ResumenKPI.valor).where(ResumenKPI.periodo == "2031-01-01")) == 7
+
+    # Lo acumulado en una transacción que se deshace no se escribe
+    ajustar_kpi("ventas_dia", 1, periodo="2031-01-01")
+    db.session.rollback()
+    db.session.commit()
+    assert db.session.scalar(select(ResumenKPI.valor).where(ResumenKPI.periodo == "2031-01-01")) == 7
+
+
+def test_versiones_de_datos(app, admin):
+    def versiones():
+        db.session.rollback()
+        return dict(db.session.execute(select(VersionDatos.nombre, VersionDatos.version)).all())
+
+    # "productos" se incrementa al commit de la ruta; si otro worker creó la fila entretanto, se suma
+    with app.test_request_context():
+        invalidar("productos")
+        with db.engine.begin() as otro_worker:
+            otro_worker.execute(insert(VersionDatos).values(nombre="productos", version=3))
+        db.session.commit()
+    assert versiones()["productos"] == 4
+
+    # "ventas" e "inventario" se incrementan después del commit, una vez por transacción
+    admin.post("/venta/nuevo", data={"id_cliente": 1, "id_tienda": 1, **_lineas((1, 1))})
+    antes = versiones()
+    admin.post("/venta/nuevo", data={"id_cliente": 1, "id_tienda": 1, **_lineas((1, 1), (2, 1))})
+    despues = versiones()
+    assert (despues["ventas"], despues["inventario"]) == (antes["ventas"] + 1, antes["inventario"] + 1)
+
+    # Una venta rechazada no incrementa nada
+    admin.post("/venta/nuevo", data={"id_cliente": 1, "id_tienda": 1, **_lineas((1, 10_000))})
+    assert versiones() == despues
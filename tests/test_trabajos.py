@@ -0,0 +1,194 @@
+# tests/test_trabajos.py
+"""Trabajos en segundo plano: encolar desde las rutas, estado, descarga, límite por usuario, cancelación, tiempo límite y huérfanos."""
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+from sqlalchemy import select
+
+from app import create_app
+from models import db, Cliente, Trabajo
+from utils import trabajos
+from utils.trabajos import gestor_trabajos, tarea, LimiteTrabajos
+
+LIBERAR = threading.Event()
+AVANZO = threading.Event()
+
+
+@tarea("prueba_espera")
+def tarea_espera(ctx):
+    """Informa avance hasta que el test la libera."""
+    n = 0
+    while not LIBERAR.wait(0.01):
+        n += 1
+        ctx.avance(n, f"vuelta {n}")
+        AVANZO.set()
+    return {"mensaje": "Liberada.", "progreso": n}
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(trabajos, "INTERVALO_AVANCE", 0)  # revisar cancelación en cada avance
+    LIBERAR.clear()
+    AVANZO.clear()
+    app = create_app({
+        "APP_ENV": "test",
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'trabajos.db'}",
+        "REPORTES_CACHE_DIR": str(tmp_path / "cache_reportes"),
+        "TRABAJOS_DIR": str(tmp_path / "trabajos"),
+    })
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Cliente(nombre="C1"), Cliente(nombre="C2")])
+        db.session.commit()
+        yield app
+        LIBERAR.set()
+        for _ in range(200):  # que ningún hilo del pool siga usando esta base
+            db.session.rollback()
+            if not db.session.scalar(select(Trabajo.id_trabajo).where(Trabajo.estado.in_(trabajos.ESTADOS_ACTIVOS))):
+                break
+            time.sleep(0.02)
+        db.session.remove()
+
+
+def _cliente(app, user_id, rol):
+    cliente = app.test_client()
+    with cliente.session_transaction() as s:
+        s.update(user_id=user_id, username=f"u{user_id}", rol=rol)
+    return cliente
+
+
+@pytest.fixture
+def admin(app):
+    return _cliente(app, 1, "administrador")
+
+
+@pytest.fixture
+def usuario(app):
+    return _cliente(app, 2, "usuario")
+
+
+def _estado(cliente, id_trabajo):
+    return cliente.get(f"/trabajos/{id_trabajo}", headers={"Accept": "application/json"}).get_json()
+
+
+def _esperar(cliente, id_trabajo, hasta=("completado", "error", "cancelado")):
+    for _ in range(250):
+        datos = _estado(cliente, id_trabajo)
+        if datos["estado"] in hasta:
+            return datos
+        time.sleep(0.02)
+    raise AssertionError(f"el trabajo #{id_trabajo} quedó en {datos['estado']}")
+
+
+def _encolar_espera(app, usuario_id=1):
+    return gestor_trabajos.encolar(app, "prueba_espera", usuario_id=usuario_id).id_trabajo
+
+
+def test_reporte_se_encola_y_se_descarga(usuario):
+    r = usuario.get("/reporte/clientes?formato=csv")
+    assert r.status_code == 302 and r.headers["Location"].startswith("/trabajos/")
+    id_trabajo = int(r.headers["Location"].rsplit("/", 1)[1])
+
+    pagina = usuario.get(r.headers["Location"])
+    assert pagina.status_code == 200 and f"Trabajo #{id_trabajo}" in pagina.get_data(as_text=True)
+
+    datos = _esperar(usuario, id_trabajo)
+    assert datos["estado"] == "completado" and datos["descargable"]
+    assert datos["tipo"] == "reporte" and datos["parametros"]["nombre"] == "clientes"
+    assert datos["progreso"] == 2 and datos["mensaje"] == "2 filas exportadas."
+
+    descarga = usuario.get(f"/trabajos/{id_trabajo}/descargar")
+    assert descarga.status_code == 200
+    assert descarga.headers["Content-Disposition"].endswith("reporte_clientes.csv")
+    assert "C1" in descarga.get_data(as_text=True)
+
+    # El reporte quedó en caché: ahora se sirve en el mismo request, sin trabajo nuevo
+    r = usuario.get("/reporte/clientes?formato=csv")
+    assert r.status_code == 200 and "C2" in r.get_data(as_text=True)
+    assert db.session.scalar(select(db.func.count(Trabajo.id_trabajo))) == 1
+
+    # En JSON: 202 con las URLs de estado y descarga
+    r = usuario.get("/reporte/clientes?formato=pdf", headers={"Accept": "application/json"})
+    assert r.status_code == 202 and r.get_json()["url_estado"] == f"/trabajos/{r.get_json()['id_trabajo']}"
+
+
+def test_estado_y_descarga_mientras_ejecuta(app, admin, usuario):
+    id_trabajo = _encolar_espera(app)
+    assert _esperar(admin, id_trabajo, hasta=("ejecutando",))["estado"] == "ejecutando"
+
+    r = admin.get(f"/trabajos/{id_trabajo}/descargar", headers={"Accept": "application/json"})
+    assert r.status_code == 409 and r.get_json()["estado"] == "ejecutando"
+    assert usuario.get(f"/trabajos/{id_trabajo}").status_code == 404  # trabajo de otro usuario
+
+    assert AVANZO.wait(5)
+    LIBERAR.set()
+    datos = _esperar(admin, id_trabajo)
+    assert (datos["estado"], datos["mensaje"]) == ("completado", "Liberada.")
+    assert datos["progreso"] > 0 and datos["iniciado"] and datos["terminado"]
+
+
+def test_limite_de_trabajos_por_usuario(app, admin, usuario):
+    app.config["TRABAJOS_MAX_POR_USUARIO"] = 1
+    _encolar_espera(app, usuario_id=1)
+    with pytest.raises(LimiteTrabajos):
+        _encolar_espera(app, usuario_id=1)
+
+    r = admin.get("/reporte/clientes?formato=csv")
+    assert r.status_code == 302 and r.headers["Location"] == "/"
+    assert admin.get("/reporte/clientes?formato=csv", headers={"Accept": "application/json"}).status_code == 429
+    assert admin.post("/admin/recalcular_totales").headers["Location"] == "/"
+
+    # El límite es por usuario
+    r = usuario.get("/reporte/clientes?formato=csv")
+    assert r.headers["Location"].startswith("/trabajos/")
+
+
+def test_cancelar(app, admin):
+    # Pendiente: se cancela de inmediato y el pool ya no lo ejecuta
+    pendiente = Trabajo(tipo="prueba_espera", usuario_id=1, estado="pendiente", parametros={})
+    db.session.add(pendiente)
+    db.session.commit()
+    assert admin.post(f"/trabajos/{pendiente.id_trabajo}/cancelar").status_code == 302
+    gestor_trabajos._ejecutar(app, pendiente.id_trabajo)
+    assert _estado(admin, pendiente.id_trabajo)["estado"] == "cancelado"
+
+    # En ejecución: se detiene en su próximo avance
+    id_trabajo = _encolar_espera(app)
+    _esperar(admin, id_trabajo, hasta=("ejecutando",))
+    r = admin.post(f"/trabajos/{id_trabajo}/cancelar", headers={"Accept": "application/json"})
+    assert r.status_code == 200
+    datos = _esperar(admin, id_trabajo)
+    assert (datos["estado"], datos["mensaje"]) == ("cancelado", "Cancelado por el usuario.")
+
+
+def test_tiempo_limite(app, admin):
+    app.config["TRABAJOS_TIMEOUT"] = 0
+    datos = _esperar(admin, _encolar_espera(app))
+    assert (datos["estado"], datos["mensaje"]) == ("cancelado", "Se superó el tiempo límite del trabajo.")
+
+
+def test_recupera_huerfanos_al_reiniciar(app, admin, monkeypatch):
+    proceso = subprocess.Popen([sys.executable, "-c", "pass"])
+    proceso.wait()  # pid de un proceso que ya terminó
+    host = socket.gethostname()
+    huerfano = Trabajo(tipo="reporte", usuario_id=1, estado="ejecutando", parametros={},
+                       proceso=f"{host}:{proceso.pid}")
+    otro_host = Trabajo(tipo="reporte", usuario_id=1, estado="ejecutando", parametros={},
+                        proceso="otro-host:1")
+    db.session.add_all([huerfano, otro_host])
+    db.session.commit()
+
+    # Proceso nuevo: la recuperación corre una vez, al primer encolar
+    monkeypatch.setattr(gestor_trabajos, "_recuperado", False)
+    LIBERAR.set()
+    _esperar(admin, _encolar_espera(app))
+
+    assert _estado(admin, huerfano.id_trabajo)["estado"] == "error"
+    assert _estado(admin, huerfano.id_trabajo)["mensaje"].startswith("Interrumpido")
+    assert _estado(admin, otro_host.id_trabajo)["estado"] == "ejecutando"  # no se puede saber si sigue vivo
+    otro_host.estado = "error"
+    db.session.commit()
@@ -0,0 +1,176 @@
+# utils/auditoria.py
+"""
+Consulta, exportación y retención de la auditoría.
+
+La tabla crece sin límite, así que nada aquí usa OFFSET ni carga la tabla
+completa:
+
+- Orden (fecha_hora DESC, id_auditoria DESC) servido por los índices
+  ix_auditoria_* (InnoDB agrega la PK a cada índice secundario, así que el
+  desempate por id sale del mismo índice).
+- Paginación por keyset: el cursor es la clave (fecha_hora, id) de la
+  última fila vista, "2025-03-14T09:30:00_1234".
+- La exportación recorre la tabla en lotes keyset, cada uno en su propia
+  consulta corta (no mantiene un cursor abierto durante toda la descarga).
+- archivar_auditoria() mueve por lotes los registros más antiguos que la
+  retención a auditoria_historica, con commit por lote.
+"""
+import json
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, delete, insert, or_, select
+
+from models import db, Auditoria, AuditoriaHistorica
+
+TAMANO_PAGINA = 50
+TAMANO_LOTE = 1000
+LOTE_ARCHIVO = 5000
+
+COLUMNAS_CSV = ["id", "fecha_hora", "usuario_id", "usuario_nombre", "accion", "detalles", "detalles_json", "ip"]
+_COLUMNAS = ("id_auditoria", "fecha_hora", "usuario_id", "usuario_nombre", "accion", "detalles", "detalles_json", "ip")
+
+ORIGENES = {"activa": Auditoria, "historica": AuditoriaHistorica}
+
+# Acciones que registra la aplicación (el primer argumento de auditar(...)):
+# opciones del filtro de la vista, sin un SELECT DISTINCT sobre toda la tabla
+ACCIONES = (
+    "archivar_auditoria",
+    "crear_cliente", "crear_detalle", "crear_inventario", "crear_producto",
+    "crear_proveedor", "crear_tienda", "crear_venta", "crear_ventas_lote",
+    "editar_cliente", "editar_detalle", "editar_inventario", "editar_producto",
+    "editar_proveedor", "editar_tienda", "editar_venta",
+    "eliminar_cliente", "eliminar_detalle", "eliminar_inventario", "eliminar_producto",
+    "eliminar_proveedor", "eliminar_tienda", "eliminar_venta",
+    "generar_datos_sinteticos", "importar_inventario", "importar_productos",
+    "recalcular_totales", "reconciliar_kpis", "transferir_inventario",
+)
+
+
+def _fecha(value):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def filtros_desde(args):
+    """Filtros de la vista/CSV desde el querystring: accion, usuario_id, desde, hasta, origen."""
+    try:
+        usuario_id = int(args.get("usuario_id")) if args.get("usuario_id") else None
+    except ValueError:
+        usuario_id = None
+    origen = args.get("origen")
+    return {
+        "accion": (args.get("accion") or "").strip() or None,
+        "usuario_id": usuario_id,
+        "desde": _fecha(args.get("desde")),
+        "hasta": _fecha(args.get("hasta")),
+        "origen": origen if origen in ORIGENES else "activa",
+    }
+
+
+def cursor_de(fila):
+    return f"{fila.fecha_hora.isoformat()}_{fila.id_auditoria}"
+
+
+def parse_cursor(value):
+    """(fecha_hora, id) desde el cursor, o None si es inválido."""
+    try:
+        fecha_hora, id_auditoria = value.rsplit("_", 1)
+        return datetime.fromisoformat(fecha_hora), int(id_auditoria)
+    except (AttributeError, ValueError):
+        return None
+
+
+def consulta(filtros=None, despues=None, limite=TAMANO_PAGINA):
+    """SELECT ordenado por (fecha_hora, id) descendente, filtrado y a partir del cursor."""
+    filtros = filtros or {}
+    modelo = ORIGENES[filtros.get("origen") or "activa"]
+    query = modelo.query
+    if filtros.get("accion"):
+        query = query.filter(modelo.accion == filtros["accion"])
+    if filtros.get("usuario_id") is not None:
+        query = query.filter(modelo.usuario_id == filtros["usuario_id"])
+    if filtros.get("desde"):
+        query = query.filter(modelo.fecha_hora >= filtros["desde"])
+    if filtros.get("hasta"):
+        query = query.filter(modelo.fecha_hora < filtros["hasta"] + timedelta(days=1))
+    if despues:
+        fecha_hora, id_auditoria = despues
+        query = query.filter(or_(
+            modelo.fecha_hora < fecha_hora,
+            and_(modelo.fecha_hora == fecha_hora, modelo.id_auditoria < id_auditoria),
+        ))
+    return query.order_by(modelo.fecha_hora.desc(), modelo.id_auditoria.desc()).limit(limite)
+
+
+def pagina(filtros=None, despues=None, limite=TAMANO_PAGINA):
+    """(filas, cursor de la siguiente página o None)."""
+    filas = consulta(filtros, despues, limite + 1).all()
+    if len(filas) > limite:
+        return filas[:limite], cursor_de(filas[limite - 1])
+    return filas, None
+
+
+def iterar(filtros=None, lote=TAMANO_LOTE):
+    """Todas las filas que cumplen los filtros, en lotes keyset."""
+    modelo = ORIGENES[(filtros or {}).get("origen") or "activa"]
+    columnas = [getattr(modelo, c) for c in _COLUMNAS]  # tuplas: no se acumulan objetos en la sesión
+    despues = None
+    while True:
+        filas = consulta(filtros, despues, lote).with_entities(*columnas).all()
+        yield from filas
+        if len(filas) < lote:
+            return
+        despues = (filas[-1].fecha_hora, filas[-1].id_auditoria)
+
+
+def fila_csv(l):
+    return [
+        l.id_auditoria,
+        l.fecha_hora,
+        l.usuario_id or "",
+        l.usuario_nombre or "",
+        l.accion,
+        (l.detalles or "").replace("\n", " ").strip(),
+        json.dumps(l.detalles_json, ensure_ascii=False) if l.detalles_json else "",
+        l.ip or "",
+    ]
+
+
+def archivar_auditoria(dias=None, lote=LOTE_ARCHIVO, progreso=None):
+    """
+    Mueve a auditoria_historica los registros con más de `dias` días
+    (AUDITORIA_RETENCION_DIAS por defecto), por lotes de ids con commit por
+    lote: INSERT ... SELECT y DELETE de los mismos ids en una transacción.
+    Retorna cuántos registros movió.
+    """
+    if dias is None:
+        dias = current_app.config.get("AUDITORIA_RETENCION_DIAS", 365)
+    corte = datetime.now() - timedelta(days=dias)
+    columnas = [getattr(Auditoria, c) for c in _COLUMNAS]
+
+    movidos = 0
+    while True:
+        ids = db.session.scalars(
+            select(Auditoria.id_auditoria)
+            .where(Auditoria.fecha_hora < corte)
+            .order_by(Auditoria.fecha_hora, Auditoria.id_auditoria)
+            .limit(lote)
+        ).all()
+        if not ids:
+            break
+        db.session.execute(
+            insert(AuditoriaHistorica).from_select(
+                list(_COLUMNAS), select(*columnas).where(Auditoria.id_auditoria.in_(ids))
+            )
+        )
+        db.session.execute(delete(Auditoria).where(Auditoria.id_auditoria.in_(ids)))
+        db.session.commit()
+        movidos += len(ids)
+        if progreso:
+            progreso(movidos)
+        if len(ids) < lote:
+            break
+    return movidos
@@ -0,0 +1,200 @@
+# utils/busqueda_productos.py
+"""
+Búsqueda incremental de productos para los formularios de venta
+(/producto/buscar), en lugar de incrustar el catálogo completo en cada
+<select>.
+
+Cada búsqueda recorre dos fases, cada una ordenada por (nombre, id) y
+paginada por keyset:
+  1) prefijo:  el nombre empieza con el texto (LIKE 'texto%' sobre
+               idx_producto_nombre).
+  2) palabra:  cada palabra del texto es prefijo de alguna palabra del
+               nombre ("entera" encuentra "Leche Entera 1L"). Se resuelve
+               con rangos sobre la PK de producto_palabras, no con
+               LIKE '%texto%' sobre todo el catálogo. Excluye lo que ya
+               salió en la fase 1.
+Coincidencias en medio de una palabra ("ntera") no se buscan: no tienen
+un índice que las respalde.
+
+El cursor "fase:id_producto" permite pedir la página siguiente sin OFFSET.
+
+producto_palabras se mantiene en las rutas de producto y en la
+importación (indexar / quitar, dentro de su transacción);
+`flask reindexar-productos` la reconstruye en bases existentes.
+"""
+import re
+import unicodedata
+
+from sqlalchemy import and_, delete, func, insert, not_, or_, select
+
+from models import db, Inventario, PalabraProducto, Producto
+
+LIMITE = 20
+LIMITE_MAX = 50
+MIN_PALABRA = 2  # con menos caracteres solo se busca por prefijo del nombre
+TAMANO_LOTE = 1000
+
+PREFIJO, PALABRA = 1, 2
+_COINCIDENCIA = {PREFIJO: "prefijo", PALABRA: "palabra"}
+
+
+# -------------------------------
+# NORMALIZACIÓN
+# -------------------------------
+def normalizar(texto):
+    """Minúsculas y sin tildes: 'Café Molido' -> 'cafe molido'."""
+    descompuesto = unicodedata.normalize("NFKD", texto or "")
+    return "".join(c for c in descompuesto if not unicodedata.combining(c)).lower()
+
+
+def palabras(texto):
+    """Palabras normalizadas del texto, sin repetir y en orden."""
+    return list(dict.fromkeys(p[:100] for p in re.findall(r"\w+", normalizar(texto))))
+
+
+def _siguiente(prefijo):
+    """Primer texto mayor que todos los que empiezan con prefijo: 'lec' -> 'led'."""
+    return prefijo[:-1] + chr(ord(prefijo[-1]) + 1)
+
+
+def _escapar_like(texto):
+    return texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+# -------------------------------
+# MANTENCIÓN DEL ÍNDICE
+# -------------------------------
+def quitar(ids_producto):
+    """Borra las palabras de los productos indicados. No hace commit."""
+    ids = list(ids_producto)
+    if ids:
+        db.session.execute(delete(PalabraProducto).where(PalabraProducto.id_producto.in_(ids)))
+
+
+def indexar(productos):
+    """Reescribe las palabras de [(id_producto, nombre)]. No hace commit."""
+    productos = list(productos)
+    quitar(id_producto for id_producto, _ in productos)
+    filas = [
+        {"palabra": palabra, "id_producto": id_producto}
+        for id_producto, nombre in productos
+        for palabra in palabras(nombre)
+    ]
+    if filas:
+        db.session.execute(insert(PalabraProducto), filas)
+
+
+def reindexar(lote=TAMANO_LOTE, progreso=None):
+    """
+    Reconstruye producto_palabras recorriendo Producto por id (keyset), con
+    commit por lote. progreso(productos) se llama después de cada lote.
+    Retorna la cantidad de productos indexados.
+    """
+    db.session.execute(delete(PalabraProducto))
+    db.session.commit()
+
+    total, despues = 0, 0
+    while True:
+        productos = db.session.execute(
+            select(Producto.id_producto, Producto.nombre)
+            .where(Producto.id_producto > despues)
+            .order_by(Producto.id_producto)
+            .limit(lote)
+        ).all()
+        if not productos:
+            return total
+        indexar(productos)
+        db.session.commit()
+        total += len(productos)
+        despues = productos[-1].id_producto
+        if progreso:
+            progreso(total)
+
+
+# -------------------------------
+# BÚSQUEDA
+# -------------------------------
+def parse_cursor(valor):
+    """'2:154' -> (2, 154). Retorna None si es inválido."""
+    try:
+        fase, id_producto = (int(v) for v in (valor or "").split(":"))
+    except ValueError:
+        return None
+    return (fase, id_producto) if fase in _COINCIDENCIA else None
+
+
+def _consulta(fase, texto, terminos, id_tienda):
+    if id_tienda is None:
+        stock = Producto.stock
+    else:
+        stock = func.coalesce(Inventario.cantidad, 0)
+    consulta = select(Producto.id_producto, Producto.nombre, Producto.precio, stock.label("stock"))
+    if id_tienda is not None:
+        # Un solo registro por (producto, tienda): uq_inventario_producto_tienda
+        consulta = consulta.outerjoin(Inventario, and_(
+            Inventario.id_producto == Producto.id_producto, Inventario.id_tienda == id_tienda,
+        ))
+
+    prefijo = Producto.nombre.like(_escapar_like(texto) + "%", escape="\\")
+    if fase == PREFIJO:
+        return consulta.where(prefijo)
+    for termino in terminos:
+        consulta = consulta.where(Producto.id_producto.in_(
+            select(PalabraProducto.id_producto)
+            .where(PalabraProducto.palabra >= termino, PalabraProducto.palabra < _siguiente(termino))
+        ))
+    return consulta.where(not_(prefijo))
+
+
+def buscar(texto, id_tienda=None, despues=None, limite=LIMITE):
+    """
+    Productos que coinciden con texto: primero los que empiezan con él y
+    luego los que lo contienen al inicio de alguna palabra. El stock es el
+    de id_tienda (0 si no tiene inventario ahí) o el total si no se indica.
+    despues: cursor (fase, id_producto) de parse_cursor.
+    Retorna (productos, siguiente) con siguiente=None si no hay más.
+    """
+    texto = (texto or "").strip()[:100]
+    terminos = palabras(texto)
+    fases = [PREFIJO]
+    if terminos and len(texto) >= MIN_PALABRA:
+        fases.append(PALABRA)
+    fase_cursor, id_cursor = despues or (PREFIJO, None)
+
+    encontrados = []
+    for fase in fases:
+        if fase < fase_cursor:
+            continue
+        consulta = _consulta(fase, texto, terminos, id_tienda)
+        if fase == fase_cursor and id_cursor is not None:
+            nombre = db.session.scalar(select(Producto.nombre).where(Producto.id_producto == id_cursor))
+            if nombre is not None:
+                consulta = consulta.where(or_(
+                    Producto.nombre > nombre,
+                    and_(Producto.nombre == nombre, Producto.id_producto > id_cursor),
+                ))
+        filas = db.session.execute(
+            consulta.order_by(Producto.nombre, Producto.id_producto).limit(limite + 1 - len(encontrados))
+        ).all()
+        encontrados += [(fase, fila) for fila in filas]
+        if len(encontrados) > limite:
+            break
+
+    hay_mas = len(encontrados) > limite
+    encontrados = encontrados[:limite]
+    siguiente = None
+    if hay_mas and encontrados:
+        fase, fila = encontrados[-1]
+        siguiente = f"{fase}:{fila.id_producto}"
+
+    productos = [
+        {
+            "id_producto": fila.id_producto,
+            "nombre": fila.nombre,
+            "precio": float(fila.precio),
+            "stock": int(fila.stock or 0),
+            "coincidencia": _COINCIDENCIA[fase],
+        }
+        for fase, fila in encontrados
+    ]
+    return productos, siguiente
@@ -0,0 +1,115 @@
+# utils/cache.py
+"""
+Caché en proceso para las listas de referencia de los formularios
+(clientes, productos, tiendas, proveedores).
+
+Cada lista se guarda bajo (nombre, versión). La versión vive en la tabla
+version_datos y la incrementan las rutas que escriben esos datos con
+invalidar(); así todos los workers de gunicorn ven el cambio en su
+siguiente request. Las entradas además expiran por TTL y se descartan por LRU.
+
+El incremento es un upsert (dos primeras escrituras a la vez no chocan) que
+se escribe al commit de la ruta, después de sus demás filas
+(utils/diferidos.py). Los grupos de VOLATILES cambian con cada venta: su
+versión se incrementa después del commit, en una sentencia aparte, para
+que las ventas no se serialicen en esa fila. Un lector puede ver por un
+instante los datos nuevos con la versión anterior; nunca al revés.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, current_app
+
+from models import db, VersionDatos, Cliente, Producto, Tienda, Proveedor
+from utils import diferidos
+
+TTL_POR_DEFECTO = 300  # segundos
+MAX_ENTRADAS = 32
+VOLATILES = frozenset({"ventas", "inventario"})  # se escriben en cada venta
+
+
+class CacheLRU:
+    """Diccionario LRU con expiración por TTL, seguro entre hilos."""
+
+    def __init__(self, max_entradas=MAX_ENTRADAS):
+        self.max_entradas = max_entradas
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def get(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None or entrada[0] < time.monotonic():
+                self._datos.pop(clave, None)
+                self.fallos += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[1]
+
+    def set(self, clave, valor, ttl=TTL_POR_DEFECTO):
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._datos.clear()
+
+
+_cache = CacheLRU()
+
+# Solo las columnas que usan las plantillas: filas livianas, sin sesión asociada
+CONSULTAS = {
+    "clientes": lambda: db.session.query(Cliente.id_cliente, Cliente.nombre).order_by(Cliente.id_cliente),
+    # Sin Producto.stock: cambia con cada movimiento y la lista solo se invalida al editar productos
+    "productos": lambda: db.session.query(
+        Producto.id_producto, Producto.nombre, Producto.precio
+    ).order_by(Producto.id_producto),
+    "tiendas": lambda: db.session.query(Tienda.id_tienda, Tienda.nombre).order_by(Tienda.id_tienda),
+    "proveedores": lambda: db.session.query(Proveedor.id_proveedor, Proveedor.nombre).order_by(Proveedor.id_proveedor),
+}
+
+
+def _versiones():
+    """Versiones actuales (una consulta por request, memorizada en flask.g)."""
+    if "_versiones_datos" not in g:
+        g._versiones_datos = dict(db.session.query(VersionDatos.nombre, VersionDatos.version).all())
+    return g._versiones_datos
+
+
+def versiones(*nombres):
+    """{nombre: versión actual} de los grupos indicados (0 si nunca se invalidaron)."""
+    actuales = _versiones()
+    return {nombre: actuales.get(nombre, 0) for nombre in nombres}
+
+
+def obtener_lista(nombre):
+    """Lista de referencia cacheada (tupla de filas con atributos)."""
+    clave = (nombre, versiones(nombre)[nombre])
+    valor = _cache.get(clave)
+    if valor is None:
+        valor = tuple(CONSULTAS[nombre]().all())
+        _cache.set(clave, valor, ttl=current_app.config.get("CACHE_REFERENCIA_TTL", TTL_POR_DEFECTO))
+    return valor
+
+
+def invalidar(*nombres):
+    """Incrementa la versión de cada lista al confirmar la transacción de la ruta."""
+    for nombre in nombres:
+        diferidos.sumar("version_datos", nombre, 1, tras_commit=nombre in VOLATILES)
+    g.pop("_versiones_datos", None)
+
+
+def _escribir_versiones(filas, conexion):
+    diferidos.upsert_sumando(
+        VersionDatos.__table__, ("nombre",), [{"nombre": n, "version": v} for n, (v,) in filas], conexion
+    )
+
+
+diferidos.registrar_escritor("version_datos", _escribir_versiones)
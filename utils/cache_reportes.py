@@ -0,0 +1,178 @@
+# utils/cache_reportes.py
+"""
+Caché en disco de los archivos de reporte (Excel, PDF, CSV).
+
+La clave combina nombre del reporte, formato, filtros y la versión de cada
+grupo de datos que el reporte lee (tabla version_datos, ver utils/cache.py).
+Las rutas que escriben esos datos llaman a invalidar(...), que incrementa
+la versión al confirmar (o justo después, para ventas e inventario), así
+un reporte no se sirve con datos anteriores al último cambio confirmado;
+las entradas viejas simplemente dejan de pedirse y salen por LRU.
+
+- Un archivo por entrada en REPORTES_CACHE_DIR (compartido entre workers).
+- Se escribe a un temporal y se publica con os.replace (atómico).
+- LRU por fecha de modificación: cada acierto "toca" el archivo y al guardar
+  se borran los más antiguos hasta quedar bajo REPORTES_CACHE_MAX_MB.
+
+Configuración (app.config):
+    REPORTES_CACHE_DIR      carpeta (default instance/cache_reportes)
+    REPORTES_CACHE_MAX_MB   tamaño máximo total (default 256)
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+from flask import current_app
+
+from utils.cache import versiones
+
+# Grupos de datos (version_datos.nombre) que lee cada reporte
+DEPENDENCIAS = {
+    "inventario": ("inventario", "productos", "tiendas"),
+    "ventas": ("ventas", "clientes"),
+    "clientes": ("clientes",),
+    "proveedores": ("proveedores",),
+    "detalle_ventas": ("ventas", "clientes", "tiendas", "productos"),
+    "ventas_por_dia": ("ventas", "tiendas"),
+    "ventas_por_producto": ("ventas", "productos"),
+}
+
+
+def _serializar(valor):
+    return valor.isoformat() if hasattr(valor, "isoformat") else valor
+
+
+class CacheReportes:
+    """Caché LRU de archivos acotado por tamaño total en bytes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+
+    def init_app(self, app):
+        app.config.setdefault("REPORTES_CACHE_DIR", os.path.join(app.instance_path, "cache_reportes"))
+        app.config.setdefault("REPORTES_CACHE_MAX_MB", 256)
+        app.extensions["cache_reportes"] = self
+
+    @property
+    def directorio(self):
+        return current_app.config["REPORTES_CACHE_DIR"]
+
+    @property
+    def max_bytes(self):
+        return int(current_app.config["REPORTES_CACHE_MAX_MB"] * 1024 * 1024)
+
+    # -------------------------------
+    # Claves
+    # -------------------------------
+    def clave(self, nombre, formato, filtros=None):
+        """Hash estable de (reporte, formato, filtros, versiones de sus datos)."""
+        datos = {
+            "reporte": nombre,
+            "formato": formato,
+            "filtros": {k: _serializar(v) for k, v in sorted((filtros or {}).items()) if v is not None},
+            "versiones": versiones(*DEPENDENCIAS.get(nombre, ())),
+        }
+        texto = json.dumps(datos, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, clave)
+
+    # -------------------------------
+    # Lectura / escritura
+    # -------------------------------
+    def obtener(self, clave):
+        """Ruta del archivo cacheado o None. Un acierto lo marca como recién usado."""
+        ruta = self._ruta(clave)
+        try:
+            os.utime(ruta)
+        except FileNotFoundError:
+            with self._lock:
+                self.fallos += 1
+            return None
+        with self._lock:
+            self.aciertos += 1
+        return ruta
+
+    def guardar(self, clave, archivo):
+        """Copia un archivo binario abierto (desde su posición actual) a la caché."""
+        os.makedirs(self.directorio, exist_ok=True)
+        fd, temporal = tempfile.mkstemp(dir=self.directorio, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as destino:
+                shutil.copyfileobj(archivo, destino)
+            os.replace(temporal, self._ruta(clave))
+        except BaseException:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+        self._recortar(conservar=self._ruta(clave))
+
+    # -------------------------------
+    # Mantención
+    # -------------------------------
+    def _entradas(self):
+        """[(mtime, tamaño, ruta)] de los archivos publicados."""
+        entradas = []
+        try:
+            nombres = os.listdir(self.directorio)
+        except FileNotFoundError:
+            return entradas
+        for nombre in nombres:
+            if nombre.startswith("."):
+                continue
+            ruta = os.path.join(self.directorio, nombre)
+            try:
+                st = os.stat(ruta)
+            except FileNotFoundError:
+                continue  # otro worker lo desalojó
+            entradas.append((st.st_mtime, st.st_size, ruta))
+        return entradas
+
+    def _recortar(self, conservar=None):
+        """Borra las entradas menos usadas hasta quedar bajo el tamaño máximo."""
+        entradas = sorted(self._entradas())
+        total = sum(tam for _, tam, _ in entradas)
+        limite = self.max_bytes
+        for _, tam, ruta in entradas:
+            if total <= limite:
+                break
+            if ruta == conservar:
+                continue  # la entrada recién escrita se conserva aunque exceda
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
+            total -= tam
+            with self._lock:
+                self.desalojos += 1
+
+    def vaciar(self):
+        for _, _, ruta in self._entradas():
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
+
+    def estadisticas(self):
+        """Contadores de este proceso + ocupación actual del directorio."""
+        entradas = self._entradas()
+        consultas = self.aciertos + self.fallos
+        return {
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "desalojos": self.desalojos,
+            "tasa_aciertos": round(100.0 * self.aciertos / consultas, 1) if consultas else 0.0,
+            "entradas": len(entradas),
+            "bytes": sum(tam for _, tam, _ in entradas),
+            "max_bytes": self.max_bytes,
+        }
+
+
+cache_reportes = CacheReportes()
@@ -0,0 +1,190 @@
+# utils/cola_auditoria.py
+"""
+Escritura de auditoría en segundo plano, por lotes.
+
+Las rutas que modifican datos llaman a auditar(...) después de su commit.
+Eso solo encola la fila: un hilo por proceso la junta con otras y las
+inserta con un INSERT multi-fila cuando se alcanzan AUDITORIA_LOTE filas o
+pasan AUDITORIA_INTERVALO segundos desde la primera pendiente. El request no
+espera ningún INSERT de auditoría.
+
+- Contrapresión: la cola tiene un máximo (AUDITORIA_COLA_MAX). Si está llena,
+  el request espera hasta AUDITORIA_ESPERA segundos a que se libere espacio;
+  si aun así no hay, escribe esa fila él mismo (más lento, pero no se pierde).
+- Al cerrar el proceso (atexit) se escriben las filas pendientes.
+- Un lote que falla se reintenta; si vuelve a fallar queda en el log.
+
+Con SQLite en memoria (una sola conexión compartida entre hilos) se escribe
+en el mismo request: AUDITORIA_ASINCRONA queda en False.
+
+Configuración (app.config):
+    AUDITORIA_ASINCRONA     encolar (True) o escribir en el request (False)
+    AUDITORIA_LOTE          filas por INSERT (default 200)
+    AUDITORIA_INTERVALO     segundos máximos que espera una fila (default 2)
+    AUDITORIA_COLA_MAX      filas pendientes antes de aplicar contrapresión (default 10000)
+    AUDITORIA_ESPERA        segundos que un request espera espacio en la cola (default 0.5)
+"""
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app, request, session
+from sqlalchemy import insert
+
+from models import db, Auditoria
+
+log = logging.getLogger(__name__)
+
+REINTENTOS = 3
+_VACIAR = object()   # marca: escribir lo pendiente ya
+_DETENER = object()  # marca: escribir lo pendiente y terminar
+
+
+def _sqlite_en_memoria(uri):
+    return uri in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in uri
+
+
+class _Lotes:
+    """Cola, hilo escritor y contadores de una aplicación."""
+
+    def __init__(self, app):
+        self.app = app
+        self.cola = queue.Queue(maxsize=app.config["AUDITORIA_COLA_MAX"])
+        self.hilo = None
+        self.lock = threading.Lock()
+        self.contadores = {"encoladas": 0, "escritas": 0, "lotes": 0, "directas": 0, "perdidas": 0}
+
+    def _contar(self, clave, n=1):
+        with self.lock:
+            self.contadores[clave] += n
+
+    def iniciar(self):
+        with self.lock:
+            if self.hilo is None or not self.hilo.is_alive():
+                self.hilo = threading.Thread(target=self._bucle, name="auditoria", daemon=True)
+                self.hilo.start()
+                atexit.register(self.cerrar)
+
+    # -------------------------------
+    # Hilo escritor
+    # -------------------------------
+    def _bucle(self):
+        lote_max = self.app.config["AUDITORIA_LOTE"]
+        intervalo = self.app.config["AUDITORIA_INTERVALO"]
+        pendientes, limite = [], None
+        while True:
+            espera = None if limite is None else max(limite - time.monotonic(), 0)
+            try:
+                item = self.cola.get(timeout=espera)
+            except queue.Empty:
+                item = None  # se cumplió el intervalo
+
+            marca = item is None or item is _VACIAR or item is _DETENER
+            if not marca:
+                pendientes.append(item)
+                limite = limite or time.monotonic() + intervalo
+
+            if pendientes and (marca or len(pendientes) >= lote_max):
+                self._escribir(pendientes)
+                for _ in pendientes:
+                    self.cola.task_done()
+                pendientes, limite = [], None
+            if item is _VACIAR or item is _DETENER:
+                self.cola.task_done()
+            if item is _DETENER:
+                return
+
+    def _escribir(self, filas):
+        for intento in range(1, REINTENTOS + 1):
+            try:
+                with self.app.app_context():
+                    with db.engine.begin() as conn:
+                        conn.execute(insert(Auditoria), filas)
+                self._contar("escritas", len(filas))
+                self._contar("lotes")
+                return
+            except Exception:
+                if intento == REINTENTOS:
+                    self._contar("perdidas", len(filas))
+                    log.exception("No se pudieron escribir %s filas de auditoría: %s", len(filas), filas)
+                    return
+                time.sleep(0.2 * intento)
+
+    # -------------------------------
+    # Productores (requests)
+    # -------------------------------
+    def registrar(self, fila):
+        self.iniciar()
+        try:
+            self.cola.put(fila, timeout=self.app.config["AUDITORIA_ESPERA"])
+            self._contar("encoladas")
+        except queue.Full:
+            # Contrapresión: el escritor no da abasto; este request escribe su fila
+            log.warning("Cola de auditoría llena (%s filas); escritura directa.", self.cola.qsize())
+            with db.engine.begin() as conn:
+                conn.execute(insert(Auditoria), [fila])
+            self._contar("directas")
+
+    def vaciar(self):
+        """Escribe lo pendiente y espera a que termine."""
+        if self.hilo is not None and self.hilo.is_alive():
+            self.cola.put(_VACIAR)
+            self.cola.join()
+
+    def cerrar(self, timeout=10):
+        if self.hilo is not None and self.hilo.is_alive():
+            self.cola.put(_DETENER)
+            self.hilo.join(timeout)
+
+
+class ColaAuditoria:
+    def init_app(self, app):
+        uri = app.config.get("SQLALCHEMY_DATABASE_URI", "")
+        app.config.setdefault("AUDITORIA_ASINCRONA", not _sqlite_en_memoria(uri))
+        app.config.setdefault("AUDITORIA_LOTE", 200)
+        app.config.setdefault("AUDITORIA_INTERVALO", 2.0)
+        app.config.setdefault("AUDITORIA_COLA_MAX", 10_000)
+        app.config.setdefault("AUDITORIA_ESPERA", 0.5)
+        app.extensions["cola_auditoria"] = _Lotes(app)
+
+    def _lotes(self, app=None):
+        return (app or current_app).extensions["cola_auditoria"]
+
+    def registrar(self, fila, app=None):
+        app = app or current_app
+        if app.config["AUDITORIA_ASINCRONA"]:
+            self._lotes(app).registrar(fila)
+        else:
+            db.session.execute(insert(Auditoria), [fila])
+            db.session.commit()
+
+    def vaciar(self, app=None):
+        self._lotes(app).vaciar()
+
+    def cerrar(self, app=None):
+        self._lotes(app).cerrar()
+
+    def estadisticas(self, app=None):
+        lotes = self._lotes(app)
+        return dict(lotes.contadores, pendientes=lotes.cola.qsize())
+
+
+cola_auditoria = ColaAuditoria()
+
+
+def auditar(accion, detalles=None, **datos):
+    """Registra (en segundo plano) una acción del usuario del request actual."""
+    cola_auditoria.registrar({
+        "fecha_hora": datetime.now(),
+        "usuario_id": session.get("user_id"),
+        "usuario_nombre": session.get("username"),
+        "accion": accion,
+        "detalles": detalles,
+        # JSON ya serializable (Decimal, fechas -> str) antes de salir del request
+        "detalles_json": json.loads(json.dumps(datos, default=str)) if datos else None,
+        "ip": request.headers.get("X-Forwarded-For", request.remote_addr),
+    })
@@ -0,0 +1,115 @@
+# utils/diferidos.py
+"""
+Sumas a contadores compartidos (resumen_kpi, ventas_diarias, version_datos)
+diferidas hasta el commit de la transacción.
+
+Las rutas ajustan estos contadores en medio de su trabajo (p. ej. el libro
+de stock suma stock_tienda entre la devolución y la reserva de una edición
+de venta). Si cada ajuste bloqueara su fila en ese momento, dos rutas que
+tocan Inventario y contadores en distinto orden podrían bloquearse
+mutuamente. En cambio, sumar() solo acumula en la sesión y, justo antes del
+commit, cada tabla escribe sus sumas con un upsert por lote, en orden de
+clave. Así el orden de bloqueos es el mismo en toda escritura:
+
+    Inventario (utils/stock) -> Producto.stock (libro de movimientos)
+    -> resumen_kpi -> ventas_diarias -> version_datos
+
+sumar(..., tras_commit=True) escribe en cambio después del commit, en una
+transacción propia de una sentencia: para contadores que todas las ventas
+tocan (versiones de "ventas" e "inventario") y que no necesitan ser
+atómicos con la venta, así ninguna venta retiene esa fila hasta su commit.
+Si el proceso cae entre el commit y esa escritura, el incremento se pierde.
+
+Si la transacción se deshace, lo acumulado se descarta con ella.
+"""
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db
+
+_EN_COMMIT = "sumas_diferidas"
+_TRAS_COMMIT = "sumas_tras_commit"
+ORDEN = ("resumen_kpi", "ventas_diarias", "version_datos")  # orden de bloqueo entre tablas
+_ESCRITORES = {}  # tabla -> escribir(filas, conexion) con filas [(clave, (valores...))] ordenadas por clave
+
+
+def upsert_sumando(tabla, claves, filas, conexion=None):
+    """
+    INSERT ... ON DUPLICATE KEY UPDATE (MySQL) / ON CONFLICT DO UPDATE que
+    suma las columnas que no son clave (executemany). claves: columnas del
+    índice único. conexion: db.session por defecto.
+    """
+    columnas = [c for c in filas[0] if c not in claves]
+    dialecto = db.engine.dialect.name
+    if dialecto == "mysql":
+        from sqlalchemy.dialects.mysql import insert as insert_dialecto
+        stmt = insert_dialecto(tabla)
+        stmt = stmt.on_duplicate_key_update({c: tabla.c[c] + stmt.inserted[c] for c in columnas})
+    else:
+        if dialecto == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as insert_dialecto
+        else:
+            from sqlalchemy.dialects.sqlite import insert as insert_dialecto
+        stmt = insert_dialecto(tabla)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[tabla.c[c] for c in claves],
+            set_={c: tabla.c[c] + stmt.excluded[c] for c in columnas},
+        )
+    (conexion or db.session).execute(stmt, filas)
+
+
+def registrar_escritor(tabla, escribir):
+    """Declara cómo escribir las sumas de una tabla (una de ORDEN)."""
+    if tabla not in ORDEN:
+        raise ValueError(f"Tabla sin lugar en el orden de bloqueo: {tabla}")
+    _ESCRITORES[tabla] = escribir
+
+
+def sumar(tabla, clave, *valores, tras_commit=False):
+    """Acumula valores (se suman posición a posición) para clave en la transacción actual."""
+    grupo = _TRAS_COMMIT if tras_commit else _EN_COMMIT
+    pendientes = db.session.info.setdefault(grupo, {}).setdefault(tabla, {})
+    previo = pendientes.get(clave)
+    pendientes[clave] = valores if previo is None else tuple(a + b for a, b in zip(previo, valores))
+
+
+def _escribir(pendientes, conexion):
+    for tabla in ORDEN:
+        filas = sorted((c, v) for c, v in pendientes.get(tabla, {}).items() if any(v))
+        if filas:
+            _ESCRITORES[tabla](filas, conexion)
+
+
+def aplicar(sesion=None):
+    """Escribe ahora lo acumulado para el commit (útil antes de leer en la misma transacción)."""
+    sesion = sesion or db.session()
+    pendientes = sesion.info.pop(_EN_COMMIT, None)
+    if pendientes:
+        _escribir(pendientes, sesion)
+
+
+def descartar(tabla):
+    """Olvida lo acumulado para tabla (p. ej. antes de reconstruirla desde cero)."""
+    for grupo in (_EN_COMMIT, _TRAS_COMMIT):
+        db.session.info.get(grupo, {}).pop(tabla, None)
+
+
+@event.listens_for(Session, "before_commit")
+def _antes_del_commit(sesion):
+    aplicar(sesion)
+
+
+@event.listens_for(Session, "after_commit")
+def _despues_del_commit(sesion):
+    pendientes = sesion.info.pop(_TRAS_COMMIT, None)
+    if pendientes:
+        # La sesión ya no puede emitir SQL aquí: transacción propia, fuera de la ya confirmada
+        with sesion.get_bind().begin() as conexion:
+            _escribir(pendientes, conexion)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _al_terminar(sesion, transaccion):
+    if transaccion.parent is None:
+        sesion.info.pop(_EN_COMMIT, None)
+        sesion.info.pop(_TRAS_COMMIT, None)
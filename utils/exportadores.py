@@ -0,0 +1,50 @@
+# utils/exportadores.py
+"""
+Registro de motores de exportación (Excel, PDF, CSV) con carga diferida.
+
+reportlab y xlsxwriter tardan en importarse y la mayoría de los procesos
+(workers que solo atienden ventas, pruebas, comandos CLI) nunca generan un
+reporte. Por eso cada motor se declara con el módulo que lo implementa y
+ese módulo recién se importa la primera vez que se pide ese formato.
+
+Cada motor expone generar(columnas, filas, titulo) -> archivo binario
+(spooled, posicionado al inicio).
+"""
+import importlib
+import threading
+
+# Los archivos se escriben a un SpooledTemporaryFile: queda en memoria si es
+# pequeño y pasa a disco al superar MAX_SPOOL, así la memoria no crece con
+# la cantidad de filas.
+MAX_SPOOL = 8 * 1024 * 1024
+
+# formato -> (módulo, extensión)
+MOTORES = {
+    "excel": ("utils.exportar_excel", "xlsx"),
+    "pdf": ("utils.exportar_pdf", "pdf"),
+    "csv": ("utils.exportar_csv", "csv"),
+}
+
+EXTENSIONES = {formato: extension for formato, (_, extension) in MOTORES.items()}
+
+_cargados = {}
+_lock = threading.Lock()
+
+
+def obtener_motor(formato):
+    """Módulo del motor (importado la primera vez que se usa)."""
+    motor = _cargados.get(formato)
+    if motor is None:
+        with _lock:
+            motor = _cargados.get(formato)
+            if motor is None:
+                motor = importlib.import_module(MOTORES[formato][0])
+                _cargados[formato] = motor
+    return motor
+
+
+def generar_archivo(formato, columnas, filas, titulo):
+    """Archivo (spooled) en el formato pedido; excel por defecto."""
+    if formato not in MOTORES:
+        formato = "excel"
+    return obtener_motor(formato).generar(columnas, filas, titulo)
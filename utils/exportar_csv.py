@@ -0,0 +1,31 @@
+# utils/exportar_csv.py
+"""Motor CSV: generador de trozos para respuestas chunked, o archivo completo."""
+import csv
+from io import StringIO
+from tempfile import SpooledTemporaryFile
+
+from utils.exportadores import MAX_SPOOL
+
+FILAS_POR_TROZO = 1000
+
+
+def generar_trozos(columnas, filas):
+    """Generador de trozos CSV (texto) para respuestas chunked."""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columnas)
+    for n, fila in enumerate(filas, start=1):
+        writer.writerow(fila)
+        if n % FILAS_POR_TROZO == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue()
+
+
+def generar(columnas, filas, titulo=None):
+    archivo = SpooledTemporaryFile(max_size=MAX_SPOOL)
+    for trozo in generar_trozos(columnas, filas):
+        archivo.write(trozo.encode("utf-8"))
+    archivo.seek(0)
+    return archivo
@@ -0,0 +1,113 @@
+# utils/exportar_excel.py
+"""
+Motor Excel: escribe las filas del cursor directo con xlsxwriter en modo
+constant_memory (cada fila se vuelca al disco al empezar la siguiente), sin
+armar estructuras intermedias. Memoria y tiempo por fila no dependen del
+tamaño del reporte.
+
+El tipo de cada columna se decide una vez mirando una muestra de filas:
+
+    date / datetime   -> celda fecha (formato dd-mm-aaaa [hh:mm])
+    Decimal / float   -> número con formato CLP ($ y miles, sin decimales)
+    int               -> entero
+    otro              -> texto
+
+y cada celda se escribe con el método tipado correspondiente (write_number,
+write_datetime, write_string) en vez del write() genérico que vuelve a
+adivinar el tipo en cada celda.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import chain, islice
+from tempfile import SpooledTemporaryFile
+
+import xlsxwriter
+
+from utils.exportadores import MAX_SPOOL
+
+MUESTRA_FILAS = 100
+
+FORMATO_CLP = '"$"#,##0'
+FORMATO_ENTERO = "0"
+FORMATO_FECHA = "dd-mm-yyyy"
+FORMATO_FECHA_HORA = "dd-mm-yyyy hh:mm"
+
+# tipo -> (ancho de columna mínimo, formato)
+TIPOS = {
+    "fecha": (11, FORMATO_FECHA),
+    "fecha_hora": (16, FORMATO_FECHA_HORA),
+    "clp": (12, FORMATO_CLP),
+    "entero": (8, FORMATO_ENTERO),
+    "texto": (10, None),
+}
+ANCHO_MAX_TEXTO = 50
+
+
+def tipo_de(valor):
+    if isinstance(valor, datetime):
+        return "fecha_hora"
+    if isinstance(valor, date):
+        return "fecha"
+    if isinstance(valor, bool):
+        return "texto"
+    if isinstance(valor, int):
+        return "entero"
+    if isinstance(valor, (Decimal, float)):
+        return "clp"
+    return "texto"
+
+
+def tipos_columnas(n_columnas, muestra):
+    """Tipo de cada columna según el primer valor no nulo de la muestra."""
+    tipos = []
+    for i in range(n_columnas):
+        valor = next((fila[i] for fila in muestra if fila[i] is not None), None)
+        tipos.append(tipo_de(valor))
+    return tipos
+
+
+def generar(columnas, filas, titulo=None):
+    filas = iter(filas)
+    muestra = list(islice(filas, MUESTRA_FILAS))
+    tipos = tipos_columnas(len(columnas), muestra)
+
+    output = SpooledTemporaryFile(max_size=MAX_SPOOL)
+    workbook = xlsxwriter.Workbook(output, {"constant_memory": True})
+    hoja = workbook.add_worksheet("Reporte")
+    negrita = workbook.add_format({"bold": True})
+    formatos = {t: workbook.add_format({"num_format": f}) for t, (_, f) in TIPOS.items() if f}
+
+    # Un escritor tipado por columna; anchos según encabezado, tipo y muestra
+    escritores = []
+    for i, (columna, tipo) in enumerate(zip(columnas, tipos)):
+        ancho = max(TIPOS[tipo][0], len(str(columna)) + 2)
+        if tipo == "texto":
+            ancho = max([ancho] + [len(str(fila[i])) + 1 for fila in muestra if fila[i] is not None])
+        hoja.set_column(i, i, min(ancho, ANCHO_MAX_TEXTO), formatos.get(tipo))
+
+        if tipo in ("fecha", "fecha_hora"):
+            escritores.append((hoja.write_datetime, formatos[tipo]))
+        elif tipo in ("clp", "entero"):
+            escritores.append((hoja.write_number, formatos[tipo]))
+        else:
+            escritores.append((hoja.write_string, None))
+
+    hoja.write_row(0, 0, columnas, negrita)
+    hoja.freeze_panes(1, 0)
+
+    n = 0
+    for n, fila in enumerate(chain(muestra, filas), start=1):
+        for col, (valor, (escribir, formato)) in enumerate(zip(fila, escritores)):
+            if valor is None:
+                continue
+            try:
+                escribir(n, col, valor, formato)
+            except TypeError:
+                # Valor que no calza con el tipo de la columna: dejar que xlsxwriter decida
+                hoja.write(n, col, valor if isinstance(valor, (int, float, str)) else str(valor))
+
+    if n:
+        hoja.autofilter(0, 0, n, len(columnas) - 1)
+    workbook.close()
+    output.seek(0)
+    return output
@@ -0,0 +1,246 @@
+# utils/exportar_pdf.py
+"""
+Motor PDF para reportes tabulares grandes.
+
+En vez de armar el documento completo en memoria con el canvas de reportlab,
+las páginas se escriben una a una (contenido comprimido) directo al archivo
+spooled, y al final solo se agregan el árbol de páginas y la tabla xref. La
+memoria queda acotada por una página, sin importar cuántas filas tenga el
+reporte.
+
+- Los anchos de columna se miden una vez sobre una muestra de filas
+  (encabezado incluido) y se ajustan al ancho de la página; si la tabla no
+  cabe vertical, se usa la hoja apaisada.
+- Los encabezados largos se parten en dos líneas; los valores que no caben
+  en su columna se truncan con "…". Las columnas numéricas van a la derecha.
+- Título y encabezados se dibujan una sola vez como Form XObject y cada página
+  solo lo referencia.
+
+reportlab se usa únicamente por las métricas de Helvetica; los textos se
+codifican una vez a WinAnsi (cp1252) y se miden con esa tabla de anchos.
+"""
+import zlib
+from decimal import Decimal
+from itertools import chain, islice
+from tempfile import SpooledTemporaryFile
+
+from reportlab.lib.pagesizes import letter, landscape
+from reportlab.pdfbase.pdfmetrics import getFont
+
+from utils.exportadores import MAX_SPOOL
+
+MUESTRA_FILAS = 500
+MARGEN = 36
+RELLENO = 4  # espacio entre columnas
+TAM_TITULO = 14
+TAM_ENCABEZADO = 8
+TAM_TEXTO = 8
+ALTO_FILA = 11
+ANCHO_MAX_GLIFO = 1.015  # glifo más ancho de Helvetica ("@"), en em
+ELIPSIS = "…".encode("cp1252")
+NORMAL, NEGRITA = "Helvetica", "Helvetica-Bold"
+
+# Objetos con id fijo; el resto (contenido + página) se numera desde PRIMER_ID
+ID_CATALOGO, ID_PAGINAS, ID_FUENTE, ID_FUENTE_NEGRITA, ID_ENCABEZADO = 1, 2, 3, 4, 5
+PRIMER_ID = 6
+
+
+_ANCHOS = {}  # fuente -> anchos por byte WinAnsi (milésimas de em)
+
+
+def _tabla(fuente):
+    if fuente not in _ANCHOS:
+        _ANCHOS[fuente] = list(getFont(fuente).widths)
+    return _ANCHOS[fuente]
+
+
+def _crudo(v):
+    """Valor -> bytes WinAnsi (caracteres fuera de cp1252 -> '?')."""
+    return b"" if v is None else str(v).encode("cp1252", errors="replace")
+
+
+def _ancho(crudo, fuente, tam):
+    return sum(map(_tabla(fuente).__getitem__, crudo)) * tam / 1000
+
+
+def _pdf_str(crudo):
+    """Literal de cadena PDF."""
+    return b"(" + crudo.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def _truncar(crudo, ancho, fuente, tam):
+    """texto recortado con elipsis para que mida a lo más `ancho` puntos."""
+    if len(crudo) * tam * ANCHO_MAX_GLIFO <= ancho or _ancho(crudo, fuente, tam) <= ancho:
+        return crudo
+    lo, hi = 0, len(crudo)
+    while lo < hi:  # mayor prefijo que cabe junto a la elipsis
+        medio = (lo + hi + 1) // 2
+        if _ancho(crudo[:medio] + ELIPSIS, fuente, tam) <= ancho:
+            lo = medio
+        else:
+            hi = medio - 1
+    return crudo[:lo] + ELIPSIS
+
+
+def _partir(crudo, ancho, fuente, tam, lineas=2):
+    """Parte un encabezado en hasta `lineas` líneas por palabras; la última se trunca."""
+    palabras = crudo.split()
+    resultado = []
+    while palabras and len(resultado) < lineas - 1:
+        linea = palabras.pop(0)
+        while palabras and _ancho(linea + b" " + palabras[0], fuente, tam) <= ancho:
+            linea += b" " + palabras.pop(0)
+        resultado.append(_truncar(linea, ancho, fuente, tam))
+    if palabras:
+        resultado.append(_truncar(b" ".join(palabras), ancho, fuente, tam))
+    return resultado or [b""]
+
+
+def medir_columnas(columnas, muestra, ancho_util):
+    """
+    Anchos (pt) por columna a partir del encabezado y de la muestra. Si la suma
+    excede `ancho_util`, se recortan las columnas más anchas (nivelación) hasta
+    que quepan; las angostas conservan su ancho natural.
+    """
+    naturales = []
+    for i, col in enumerate(columnas):
+        ancho = _ancho(col, NEGRITA, TAM_ENCABEZADO)
+        for fila in muestra:
+            ancho = max(ancho, _ancho(fila[i], NORMAL, TAM_TEXTO))
+        naturales.append(ancho + RELLENO * 2)
+
+    if sum(naturales) <= ancho_util:
+        return naturales
+
+    # Mayor tope C tal que sum(min(natural, C)) <= ancho_util
+    restantes = sorted(naturales)
+    disponible = ancho_util
+    for n, ancho in enumerate(restantes):
+        tope = disponible / (len(restantes) - n)
+        if ancho > tope:
+            break
+        disponible -= ancho
+    return [min(ancho, tope) for ancho in naturales]
+
+
+class _EscritorPDF:
+    """Escribe objetos PDF en orden y recuerda sus posiciones para la xref."""
+
+    def __init__(self, archivo):
+        self.archivo = archivo
+        self.posiciones = {}
+        self.archivo.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def objeto(self, id_obj, cuerpo):
+        self.posiciones[id_obj] = self.archivo.tell()
+        self.archivo.write(b"%d 0 obj\n" % id_obj + cuerpo + b"\nendobj\n")
+
+    def flujo(self, id_obj, datos, diccionario=b""):
+        comprimido = zlib.compress(datos, 6)
+        self.objeto(id_obj, (
+            b"<< " + diccionario + b" /Filter /FlateDecode /Length %d >>\nstream\n" % len(comprimido)
+            + comprimido + b"\nendstream"
+        ))
+
+    def cerrar(self):
+        ultimo = max(self.posiciones)
+        inicio_xref = self.archivo.tell()
+        lineas = [b"xref\n0 %d\n" % (ultimo + 1), b"0000000000 65535 f \n"]
+        for id_obj in range(1, ultimo + 1):
+            lineas.append(b"%010d 00000 n \n" % self.posiciones[id_obj])
+        self.archivo.write(b"".join(lineas))
+        self.archivo.write(
+            b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (ultimo + 1, ID_CATALOGO, inicio_xref)
+        )
+
+
+def generar(columnas, filas, titulo="Reporte"):
+    columnas = [_crudo(c) for c in columnas]
+    filas = iter(filas)
+
+    # ---- Muestra: define anchos, alineación y orientación ----
+    muestra_cruda = list(islice(filas, MUESTRA_FILAS))
+    muestra = [tuple(_crudo(v) for v in fila) for fila in muestra_cruda]
+    numericas = [
+        any(fila[i] is not None for fila in muestra_cruda)
+        and all(fila[i] is None or isinstance(fila[i], (int, float, Decimal)) for fila in muestra_cruda)
+        for i in range(len(columnas))
+    ]
+
+    ancho_pag, alto_pag = letter
+    anchos = medir_columnas(columnas, muestra, ancho_pag - 2 * MARGEN)
+    if sum(anchos) > ancho_pag - 2 * MARGEN:
+        ancho_pag, alto_pag = landscape(letter)
+        anchos = medir_columnas(columnas, muestra, ancho_pag - 2 * MARGEN)
+    xs = [MARGEN + sum(anchos[:i]) for i in range(len(anchos))]
+    utiles = [max(a - 2 * RELLENO, 0) for a in anchos]
+
+    # ---- Encabezado (título + nombres de columna) como Form XObject ----
+    partes = [_partir(col, util, NEGRITA, TAM_ENCABEZADO) for col, util in zip(columnas, utiles)]
+    lineas_enc = max((len(p) for p in partes), default=1)
+    y_titulo = alto_pag - MARGEN - TAM_TITULO
+    y_enc = y_titulo - 24
+    enc = [b"BT /F2 %d Tf 1 0 0 1 %.2f %.2f Tm %s Tj" % (
+        TAM_TITULO, MARGEN, y_titulo, _pdf_str(_truncar(_crudo(titulo), ancho_pag - 2 * MARGEN, NEGRITA, TAM_TITULO)))]
+    enc.append(b"/F2 %d Tf" % TAM_ENCABEZADO)
+    for x, util, lineas, numerica in zip(xs, utiles, partes, numericas):
+        for n, linea in enumerate(lineas):
+            dx = util - _ancho(linea, NEGRITA, TAM_ENCABEZADO) if numerica else 0
+            enc.append(b"1 0 0 1 %.2f %.2f Tm %s Tj" % (x + RELLENO + dx, y_enc - n * ALTO_FILA, _pdf_str(linea)))
+    enc.append(b"ET")
+    y_linea = y_enc - (lineas_enc - 1) * ALTO_FILA - 4
+    enc.append(b"0.5 w %.2f %.2f m %.2f %.2f l S" % (MARGEN, y_linea, MARGEN + sum(anchos), y_linea))
+    y_primera = y_linea - ALTO_FILA
+
+    archivo = SpooledTemporaryFile(max_size=MAX_SPOOL)
+    pdf = _EscritorPDF(archivo)
+    fuentes = b"<< /F1 %d 0 R /F2 %d 0 R >>" % (ID_FUENTE, ID_FUENTE_NEGRITA)
+    pdf.objeto(ID_FUENTE, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    pdf.objeto(ID_FUENTE_NEGRITA, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>")
+    pdf.flujo(ID_ENCABEZADO, b"\n".join(enc), b"/Type /XObject /Subtype /Form /BBox [0 0 %.2f %.2f] /Resources << /Font %s >>" % (
+        ancho_pag, alto_pag, fuentes))
+
+    recursos = b"<< /Font %s /XObject << /Enc %d 0 R >> >>" % (fuentes, ID_ENCABEZADO)
+    paginas = []
+    siguiente_id = PRIMER_ID
+
+    def escribir_pagina(cuerpo):
+        nonlocal siguiente_id
+        id_contenido, id_pagina = siguiente_id, siguiente_id + 1
+        siguiente_id += 2
+        pie = b"BT /F1 7 Tf 1 0 0 1 %.2f %.2f Tm (P\xe1gina %d) Tj ET" % (ancho_pag - MARGEN - 40, MARGEN / 2, len(paginas) + 1)
+        pdf.flujo(id_contenido, b"/Enc Do\nBT /F1 %d Tf\n" % TAM_TEXTO + b"\n".join(cuerpo) + b"\nET\n" + pie)
+        pdf.objeto(id_pagina, b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %.2f %.2f] /Resources %s /Contents %d 0 R >>" % (
+            ID_PAGINAS, ancho_pag, alto_pag, recursos, id_contenido))
+        paginas.append(id_pagina)
+
+    # ---- Filas: una página en memoria a la vez ----
+    cuerpo = []
+    y = y_primera
+    restantes = (tuple(map(_crudo, fila)) for fila in filas)
+    for fila in chain(muestra, restantes):
+        for crudo, x, util, numerica in zip(fila, xs, utiles, numericas):
+            if not crudo:
+                continue
+            crudo = _truncar(crudo, util, NORMAL, TAM_TEXTO)
+            dx = util - _ancho(crudo, NORMAL, TAM_TEXTO) if numerica else 0
+            cuerpo.append(b"1 0 0 1 %.2f %.2f Tm %s Tj" % (x + RELLENO + dx, y, _pdf_str(crudo)))
+        y -= ALTO_FILA
+        if y < MARGEN:
+            escribir_pagina(cuerpo)
+            cuerpo = []
+            y = y_primera
+
+    if not paginas and not muestra:
+        cuerpo.append(b"/F1 12 Tf 1 0 0 1 %.2f %.2f Tm %s Tj" % (MARGEN, y_primera - 20, _pdf_str(b"No hay datos para mostrar")))
+    if cuerpo or not paginas:
+        escribir_pagina(cuerpo)
+
+    # ---- Árbol de páginas, catálogo y xref ----
+    pdf.objeto(ID_PAGINAS, b"<< /Type /Pages /Count %d /Kids [%s] >>" % (
+        len(paginas), b" ".join(b"%d 0 R" % p for p in paginas)))
+    pdf.objeto(ID_CATALOGO, b"<< /Type /Catalog /Pages %d 0 R >>" % ID_PAGINAS)
+    pdf.cerrar()
+    archivo.seek(0)
+    return archivo
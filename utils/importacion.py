@@ -0,0 +1,386 @@
+# utils/importacion.py
+"""
+Importación masiva de productos e inventario desde CSV o XLSX.
+
+El archivo se lee como un flujo de filas (csv.DictReader / openpyxl en modo
+read_only) y se procesa por lotes de TAMANO_LOTE filas. Por cada lote:
+
+1. Se validan las filas y se resuelven nombres a ids con consultas IN
+   (proveedores y tiendas se precargan una vez: son tablas pequeñas).
+2. Se escribe todo el lote con pocas sentencias:
+     Producto   -> INSERT multi-fila de los nuevos + UPDATE por PK (executemany)
+                   de los existentes, identificados por (nombre, proveedor),
+                   y sus palabras en el índice de búsqueda (producto_palabras).
+     Inventario -> INSERT ... ON DUPLICATE KEY UPDATE (MySQL) / ON CONFLICT
+                   DO UPDATE (SQLite, PostgreSQL) sobre
+                   uq_inventario_producto_tienda, con las filas afectadas
+                   bloqueadas, y un movimiento "importacion" por cada cambio
+                   en el libro de stock (que mantiene Producto.stock).
+   Producto.stock no se importa: es la suma del inventario de las tiendas.
+3. Commit del lote. Si la base rechaza el lote, se deshace solo ese lote y
+   sus filas quedan en el informe de errores.
+
+El resultado incluye un informe de errores por fila (número de fila del
+archivo, contando el encabezado como fila 1).
+"""
+import csv
+import io
+import unicodedata
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import db, Producto, Proveedor, Tienda, Inventario
+from utils.busqueda_productos import indexar
+from utils.cache import invalidar
+from utils.kpi import ajustar_productos
+from utils.movimientos import registrar
+from utils.stock import upsert_inventario
+
+TAMANO_LOTE = 2000
+MAX_ERRORES = 1000  # errores detallados que se conservan (el total se cuenta igual)
+
+TIPOS = ("productos", "inventario")
+MODOS_INVENTARIO = ("reemplazar", "sumar")
+
+
+class ArchivoInvalido(Exception):
+    """El archivo no se puede leer o le faltan columnas obligatorias."""
+
+
+# -------------------------------
+# Lectura del archivo
+# -------------------------------
+def _columna(nombre):
+    """'ID Producto' -> 'id_producto', 'Categoría' -> 'categoria'."""
+    nombre = unicodedata.normalize("NFKD", str(nombre or "")).encode("ascii", "ignore").decode()
+    return "_".join(nombre.strip().lower().split())
+
+
+def _filas_csv(stream):
+    texto = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    muestra = texto.read(4096)
+    texto.seek(0)
+    try:
+        dialecto = csv.Sniffer().sniff(muestra, delimiters=",;\t")
+    except csv.Error:
+        dialecto = csv.excel
+    lector = csv.reader(texto, dialecto)
+    encabezado = next(lector, None)
+    if not encabezado:
+        raise ArchivoInvalido("El archivo está vacío.")
+    columnas = [_columna(c) for c in encabezado]
+    for fila in lector:
+        if any(v.strip() for v in fila):
+            yield dict(zip(columnas, fila))
+        else:
+            yield None  # fila en blanco: conserva la numeración
+
+
+def _filas_xlsx(stream):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ArchivoInvalido("Para importar XLSX se necesita openpyxl (pip install openpyxl).")
+    try:
+        libro = load_workbook(stream, read_only=True, data_only=True)
+    except Exception as e:
+        raise ArchivoInvalido(f"No se pudo leer el XLSX: {e}")
+    try:
+        filas = libro.worksheets[0].iter_rows(values_only=True)
+        encabezado = next(filas, None)
+        if not encabezado:
+            raise ArchivoInvalido("El archivo está vacío.")
+        columnas = [_columna(c) for c in encabezado]
+        for fila in filas:
+            if any(v not in (None, "") for v in fila):
+                yield dict(zip(columnas, fila))
+            else:
+                yield None
+    finally:
+        libro.close()
+
+
+def leer_filas(stream, nombre_archivo):
+    """(número de fila, dict columna -> valor) de un CSV o XLSX, sin cargarlo completo."""
+    if nombre_archivo.lower().endswith((".xlsx", ".xlsm")):
+        filas = _filas_xlsx(stream)
+    elif nombre_archivo.lower().endswith((".csv", ".txt")):
+        filas = _filas_csv(stream)
+    else:
+        raise ArchivoInvalido("Formato no soportado: sube un archivo .csv o .xlsx.")
+    for n, fila in enumerate(filas, start=2):
+        if fila is not None:
+            yield n, fila
+
+
+# -------------------------------
+# Conversión de valores
+# -------------------------------
+class _ErrorFila(Exception):
+    pass
+
+
+def _texto(fila, *columnas):
+    for c in columnas:
+        v = fila.get(c)
+        if v not in (None, ""):
+            return str(v).strip()
+    return ""
+
+
+def _entero(valor, campo, minimo=0):
+    try:
+        n = int(Decimal(str(valor).strip()))
+    except (InvalidOperation, ValueError):
+        raise _ErrorFila(f"{campo} inválido: {valor!r}")
+    if n < minimo:
+        raise _ErrorFila(f"{campo} no puede ser menor que {minimo}: {n}")
+    return n
+
+
+def _precio(valor):
+    texto = str(valor).strip().replace("$", "").replace(" ", "")
+    if "," in texto:  # formato chileno 1.990,50
+        texto = texto.replace(".", "").replace(",", ".")
+    try:
+        precio = Decimal(texto)
+    except InvalidOperation:
+        raise _ErrorFila(f"precio inválido: {valor!r}")
+    if precio < 0:
+        raise _ErrorFila(f"precio no puede ser negativo: {precio}")
+    return precio
+
+
+def _resolver(valor, por_id, por_nombre, entidad):
+    """Id desde un id numérico o un nombre (sin distinguir mayúsculas)."""
+    texto = str(valor).strip()
+    if texto.isdigit() and int(texto) in por_id:
+        return int(texto)
+    id_ = por_nombre.get(texto.lower())
+    if id_ is None:
+        raise _ErrorFila(f"{entidad} no existe: {texto!r}")
+    return id_
+
+
+def _mapa(modelo, columna_id):
+    por_id, por_nombre = set(), {}
+    for id_, nombre in db.session.execute(select(columna_id, modelo.nombre)):
+        por_id.add(id_)
+        por_nombre.setdefault((nombre or "").strip().lower(), id_)
+    return por_id, por_nombre
+
+
+# -------------------------------
+# Importación
+# -------------------------------
+class Resultado:
+    def __init__(self):
+        self.procesadas = 0
+        self.insertadas = 0
+        self.actualizadas = 0
+        self.total_errores = 0
+        self.errores = []
+
+    def error(self, n, mensaje):
+        self.total_errores += 1
+        if len(self.errores) < MAX_ERRORES:
+            self.errores.append({"fila": n, "error": mensaje})
+
+    def como_dict(self):
+        return {
+            "procesadas": self.procesadas,
+            "insertadas": self.insertadas,
+            "actualizadas": self.actualizadas,
+            "total_errores": self.total_errores,
+            "errores": self.errores,
+        }
+
+
+def _por_lotes(filas, lote):
+    filas = iter(filas)
+    while True:
+        bloque = list(islice(filas, lote))
+        if not bloque:
+            return
+        yield bloque
+
+
+def importar(tipo, filas, modo="reemplazar", lote=TAMANO_LOTE, progreso=None):
+    """
+    Importa `filas` [(n, dict)] de tipo "productos" o "inventario" por lotes
+    (commit por lote). Retorna un Resultado.
+    """
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo de importación desconocido: {tipo}")
+    resultado = Resultado()
+    proveedores = _mapa(Proveedor, Proveedor.id_proveedor)
+    tiendas = _mapa(Tienda, Tienda.id_tienda) if tipo == "inventario" else None
+
+    for bloque in _por_lotes(filas, lote):
+        try:
+            if tipo == "productos":
+                _lote_productos(bloque, proveedores, resultado)
+            else:
+                _lote_inventario(bloque, proveedores, tiendas, modo == "sumar", resultado)
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            motivo = str(getattr(e, "orig", e)).splitlines()[0][:200]
+            for n, _ in bloque:
+                resultado.error(n, f"Lote rechazado por la base de datos: {motivo}")
+        resultado.procesadas += len(bloque)
+        if progreso:
+            progreso(resultado)
+
+    if resultado.insertadas or resultado.actualizadas:
+        invalidar("productos" if tipo == "productos" else "inventario")
+        db.session.commit()
+    return resultado
+
+
+def _lote_productos(bloque, proveedores, resultado):
+    validas = {}  # (nombre, id_proveedor) -> (n, valores); la última fila repetida gana
+    for n, fila in bloque:
+        try:
+            nombre = _texto(fila, "nombre", "producto")
+            if not nombre:
+                raise _ErrorFila("nombre es obligatorio")
+            if len(nombre) > 100:
+                raise _ErrorFila("nombre supera 100 caracteres")
+            id_proveedor = None
+            proveedor = _texto(fila, "proveedor", "id_proveedor")
+            if proveedor:
+                id_proveedor = _resolver(proveedor, *proveedores, "proveedor")
+            valores = {"nombre": nombre, "id_proveedor": id_proveedor}
+            if _texto(fila, "precio"):
+                valores["precio"] = _precio(fila["precio"])
+            validas[(nombre.lower(), id_proveedor)] = (n, valores)
+        except _ErrorFila as e:
+            resultado.error(n, str(e))
+
+    if not validas:
+        return
+
+    nombres = {v["nombre"] for _, v in validas.values()}
+    existentes = {
+        (nombre.lower(), id_proveedor): id_producto
+        for id_producto, nombre, id_proveedor in db.session.execute(
+            select(Producto.id_producto, Producto.nombre, Producto.id_proveedor)
+            .where(Producto.nombre.in_(nombres))
+        )
+    }
+
+    nuevos, cambios = [], []
+    for clave, (n, valores) in validas.items():
+        id_producto = existentes.get(clave)
+        if id_producto is None:
+            if "precio" not in valores:
+                resultado.error(n, "precio es obligatorio para un producto nuevo")
+                continue
+            nuevos.append({"stock": 0, **valores})
+        else:
+            cambios.append({"id_producto": id_producto, **valores})
+
+    if nuevos:
+        db.session.execute(insert(Producto), nuevos)
+        ajustar_productos(len(nuevos))
+    # UPDATE por PK en executemany, agrupado por columnas presentes
+    for columnas in {tuple(sorted(c)) for c in cambios}:
+        grupo = [c for c in cambios if tuple(sorted(c)) == columnas]
+        db.session.execute(update(Producto), grupo)
+    # Palabras para la búsqueda de los formularios de venta (ids de los nuevos por nombre)
+    indexar(db.session.execute(
+        select(Producto.id_producto, Producto.nombre).where(Producto.nombre.in_(nombres))
+    ).all())
+    resultado.insertadas += len(nuevos)
+    resultado.actualizadas += len(cambios)
+
+
+def _lote_inventario(bloque, proveedores, tiendas, sumar, resultado):
+    # Productos del lote por id o por nombre (una consulta IN de cada tipo)
+    ids = set()
+    nombres = set()
+    for _, fila in bloque:
+        producto = _texto(fila, "id_producto", "producto", "nombre")
+        if producto.isdigit() and not _texto(fila, "producto", "nombre"):
+            ids.add(int(producto))
+        elif producto:
+            nombres.add(producto)
+    por_id, por_nombre = set(), {}
+    for id_producto, nombre, id_proveedor in db.session.execute(
+        select(Producto.id_producto, Producto.nombre, Producto.id_proveedor)
+        .where(Producto.id_producto.in_(ids) | Producto.nombre.in_(nombres))
+    ):
+        por_id.add(id_producto)
+        por_nombre.setdefault(nombre.lower(), []).append((id_producto, id_proveedor))
+
+    validas = {}  # (id_producto, id_tienda) -> (n, cantidad)
+    for n, fila in bloque:
+        try:
+            id_producto = _producto_de(fila, por_id, por_nombre, proveedores)
+            tienda = _texto(fila, "tienda", "id_tienda")
+            if not tienda:
+                raise _ErrorFila("tienda es obligatoria")
+            id_tienda = _resolver(tienda, *tiendas, "tienda")
+            if not _texto(fila, "cantidad"):
+                raise _ErrorFila("cantidad es obligatoria")
+            cantidad = _entero(fila["cantidad"], "cantidad")
+            clave = (id_producto, id_tienda)
+            if sumar and clave in validas:
+                cantidad += validas[clave][1]
+            validas[clave] = (n, cantidad)
+        except _ErrorFila as e:
+            resultado.error(n, str(e))
+
+    if not validas:
+        return
+
+    # Cantidades actuales, bloqueadas hasta el commit del lote: el movimiento
+    # registrado es exactamente la diferencia que aplica el upsert
+    claves = list(validas)
+    actuales = {}
+    for id_tienda in sorted({t for _, t in claves}):
+        productos_tienda = [p for p, t in claves if t == id_tienda]
+        actuales.update({
+            (id_producto, id_tienda): cantidad
+            for id_producto, cantidad in db.session.execute(
+                select(Inventario.id_producto, Inventario.cantidad).where(
+                    Inventario.id_tienda == id_tienda, Inventario.id_producto.in_(productos_tienda)
+                ).order_by(Inventario.id_producto).with_for_update()
+            )
+        })
+
+    filas = [{"id_producto": p, "id_tienda": t, "cantidad": c} for (p, t), (_, c) in sorted(validas.items())]
+    upsert_inventario(filas, sumar)
+    registrar("importacion", {
+        clave: cantidad if sumar else cantidad - actuales.get(clave, 0)
+        for clave, (_, cantidad) in validas.items()
+    })
+
+    resultado.actualizadas += sum(1 for clave in validas if clave in actuales)
+    resultado.insertadas += sum(1 for clave in validas if clave not in actuales)
+
+
+def _producto_de(fila, por_id, por_nombre, proveedores):
+    nombre = _texto(fila, "producto", "nombre")
+    if not nombre:
+        id_texto = _texto(fila, "id_producto")
+        if not id_texto:
+            raise _ErrorFila("producto es obligatorio")
+        if not id_texto.isdigit() or int(id_texto) not in por_id:
+            raise _ErrorFila(f"producto no existe: {id_texto!r}")
+        return int(id_texto)
+
+    candidatos = por_nombre.get(nombre.lower(), [])
+    proveedor = _texto(fila, "proveedor", "id_proveedor")
+    if proveedor:
+        id_proveedor = _resolver(proveedor, *proveedores, "proveedor")
+        candidatos = [c for c in candidatos if c[1] == id_proveedor]
+    if not candidatos:
+        raise _ErrorFila(f"producto no existe: {nombre!r}")
+    if len(candidatos) > 1:
+        raise _ErrorFila(f"producto {nombre!r} existe con varios proveedores: indica la columna proveedor")
+    return candidatos[0][0]
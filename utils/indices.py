@@ -0,0 +1,48 @@
+# utils/indices.py
+"""
+Migración de índices para bases de datos existentes.
+
+db.create_all() solo crea tablas nuevas: si la tabla ya existe, los índices
+declarados después en models.py no se agregan. Aquí se comparan los índices
+del modelo con los que reporta la base de datos y se crean los que faltan.
+
+En MySQL 8, CREATE INDEX sobre InnoDB es una operación en línea (no bloquea
+escrituras), así que se puede ejecutar con la aplicación funcionando.
+"""
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateIndex
+
+from models import db
+
+
+def indices_faltantes():
+    """Índices declarados en los modelos que no existen en la base de datos."""
+    inspector = inspect(db.engine)
+    tablas = set(inspector.get_table_names())
+
+    faltantes = []
+    for tabla in db.metadata.sorted_tables:
+        if tabla.name not in tablas:
+            continue  # la crea db.create_all() con todos sus índices
+        existentes = {ix["name"] for ix in inspector.get_indexes(tabla.name)}
+        existentes |= {uq["name"] for uq in inspector.get_unique_constraints(tabla.name)}
+        for indice in sorted(tabla.indexes, key=lambda ix: ix.name):
+            if indice.name not in existentes:
+                faltantes.append(indice)
+    return faltantes
+
+
+def sql_indice(indice):
+    """Sentencia CREATE INDEX en el dialecto de la base de datos actual."""
+    return str(CreateIndex(indice).compile(dialect=db.engine.dialect)).strip()
+
+
+def crear_indices_faltantes(progreso=None):
+    """Crea (uno por uno) los índices que faltan. Retorna sus nombres."""
+    creados = []
+    for indice in indices_faltantes():
+        if progreso:
+            progreso(indice)
+        indice.create(bind=db.engine, checkfirst=True)
+        creados.append(indice.name)
+    return creados
@@ -0,0 +1,214 @@
+# utils/kpi.py
+"""
+Contadores del dashboard (tabla resumen_kpi).
+
+Las rutas que escriben ventas, detalles, inventario o productos llaman a estas
+funciones dentro de su misma transacción, de modo que el dashboard nunca
+necesita recorrer Venta/DetalleVenta. `reconciliar_kpis` reconstruye todo
+desde cero y reporta las diferencias (pensado para ejecutarse periódicamente).
+
+Los ajustes se acumulan y se escriben al commit con un upsert por lote en
+orden de clave (utils/diferidos.py): el primer contador de un día nuevo no
+choca con uq_resumen_kpi aunque dos workers lo creen a la vez, y las filas
+de resumen_kpi se bloquean siempre después de las de Inventario.
+"""
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import func
+
+from models import db, ResumenKPI, Producto, Inventario, Venta, Tienda
+from utils import diferidos
+
+
+def _fecha(valor):
+    """Acepta date o 'YYYY-MM-DD' (como llega desde el formulario)."""
+    if isinstance(valor, date):
+        return valor
+    try:
+        return date.fromisoformat(str(valor))
+    except (TypeError, ValueError):
+        return date.today()
+
+
+def _decimal(valor):
+    return Decimal(str(valor or 0))
+
+
+# -------------------------------
+# AJUSTES INCREMENTALES
+# -------------------------------
+def ajustar_kpi(clave, delta, id_tienda=0, periodo=""):
+    """Suma delta al contador (lo crea si no existe) al hacer commit."""
+    delta = _decimal(delta)
+    if delta:
+        diferidos.sumar("resumen_kpi", (clave, id_tienda or 0, periodo), delta)
+
+
+def _escribir_kpis(filas, conexion):
+    diferidos.upsert_sumando(ResumenKPI.__table__, ("clave", "id_tienda", "periodo"), [
+        {"clave": clave, "id_tienda": id_tienda, "periodo": periodo, "valor": valor}
+        for (clave, id_tienda, periodo), (valor,) in filas
+    ], conexion)
+
+
+diferidos.registrar_escritor("resumen_kpi", _escribir_kpis)
+
+
+def ajustar_ingresos(venta, delta):
+    """Ajusta los ingresos del día, del mes y de la tienda de la venta."""
+    fecha = _fecha(venta.fecha)
+    ajustar_kpi("ingresos_dia", delta, periodo=fecha.isoformat())
+    ajustar_kpi("ingresos_mes", delta, periodo=fecha.strftime("%Y-%m"))
+    ajustar_kpi("ingresos_tienda", delta, id_tienda=venta.id_tienda)
+
+
+def registrar_venta(venta, signo=1):
+    """Suma (signo=1) o resta (signo=-1) una venta completa de los contadores."""
+    fecha = _fecha(venta.fecha)
+    ajustar_kpi("ventas_dia", signo, periodo=fecha.isoformat())
+    ajustar_kpi("ventas_mes", signo, periodo=fecha.strftime("%Y-%m"))
+    ajustar_ingresos(venta, signo * _decimal(venta.total))
+
+
+def registrar_ventas(ventas):
+    """
+    Suma un lote de ventas [(fecha, id_tienda, total)] a los contadores con
+    un ajuste por día, mes y tienda en vez de cinco por venta.
+    """
+    acumulado = {}
+    for fecha, id_tienda, total in ventas:
+        fecha = _fecha(fecha)
+        for clave, id_t, periodo, valor in (
+            ("ventas_dia", 0, fecha.isoformat(), 1),
+            ("ventas_mes", 0, fecha.strftime("%Y-%m"), 1),
+            ("ingresos_dia", 0, fecha.isoformat(), total),
+            ("ingresos_mes", 0, fecha.strftime("%Y-%m"), total),
+            ("ingresos_tienda", id_tienda, "", total),
+        ):
+            acumulado[clave, id_t, periodo] = acumulado.get((clave, id_t, periodo), 0) + _decimal(valor)
+    for (clave, id_tienda, periodo), delta in acumulado.items():
+        ajustar_kpi(clave, delta, id_tienda=id_tienda, periodo=periodo)
+
+
+def ajustar_total_venta(venta, total_anterior):
+    """Registra el cambio de total de una venta ya contabilizada."""
+    ajustar_ingresos(venta, _decimal(venta.total) - _decimal(total_anterior))
+
+
+def ajustar_stock(id_tienda, delta):
+    ajustar_kpi("stock_tienda", delta, id_tienda=id_tienda)
+
+
+def ajustar_productos(delta):
+    ajustar_kpi("productos", delta)
+
+
+# -------------------------------
+# LECTURA PARA EL DASHBOARD
+# -------------------------------
+def obtener_kpis(hoy=None):
+    """Lee los indicadores del dashboard con una sola consulta sobre resumen_kpi."""
+    hoy = hoy or date.today()
+    dia, mes = hoy.isoformat(), hoy.strftime("%Y-%m")
+
+    filas = db.session.query(ResumenKPI, Tienda.nombre).outerjoin(
+        Tienda, ResumenKPI.id_tienda == Tienda.id_tienda
+    ).filter(
+        ResumenKPI.periodo.in_(("", dia, mes))
+    ).all()
+
+    kpis = {
+        "productos": 0,
+        "ventas_hoy": 0, "ingresos_hoy": Decimal(0),
+        "ventas_mes": 0, "ingresos_mes": Decimal(0),
+        "tiendas": {},
+    }
+    for r, nombre_tienda in filas:
+        if r.clave == "productos":
+            kpis["productos"] = int(r.valor)
+        elif r.clave == "ventas_dia" and r.periodo == dia:
+            kpis["ventas_hoy"] = int(r.valor)
+        elif r.clave == "ingresos_dia" and r.periodo == dia:
+            kpis["ingresos_hoy"] = r.valor
+        elif r.clave == "ventas_mes" and r.periodo == mes:
+            kpis["ventas_mes"] = int(r.valor)
+        elif r.clave == "ingresos_mes" and r.periodo == mes:
+            kpis["ingresos_mes"] = r.valor
+        elif r.clave in ("stock_tienda", "ingresos_tienda"):
+            tienda = kpis["tiendas"].setdefault(
+                r.id_tienda, {"nombre": nombre_tienda or f"#{r.id_tienda}", "stock": 0, "ingresos": Decimal(0)}
+            )
+            if r.clave == "stock_tienda":
+                tienda["stock"] = int(r.valor)
+            else:
+                tienda["ingresos"] = r.valor
+    return kpis
+
+
+# -------------------------------
+# RECONCILIACIÓN COMPLETA
+# -------------------------------
+def calcular_kpis():
+    """Calcula todos los contadores desde las tablas base (consultas agrupadas)."""
+    valores = {}
+
+    def sumar(clave, id_tienda, periodo, valor):
+        k = (clave, id_tienda or 0, periodo)
+        valores[k] = valores.get(k, Decimal(0)) + _decimal(valor)
+
+    sumar("productos", 0, "", db.session.query(func.count(Producto.id_producto)).scalar())
+
+    for id_tienda, unidades in db.session.query(
+        Inventario.id_tienda, func.sum(Inventario.cantidad)
+    ).group_by(Inventario.id_tienda):
+        sumar("stock_tienda", id_tienda, "", unidades)
+
+    for id_tienda, ingresos in db.session.query(
+        Venta.id_tienda, func.sum(Venta.total)
+    ).group_by(Venta.id_tienda):
+        sumar("ingresos_tienda", id_tienda, "", ingresos)
+
+    # Por día en SQL; el mes se agrega en Python para no depender del motor
+    for fecha, cantidad, ingresos in db.session.query(
+        Venta.fecha, func.count(Venta.id_venta), func.sum(Venta.total)
+    ).group_by(Venta.fecha):
+        fecha = _fecha(fecha)
+        sumar("ventas_dia", 0, fecha.isoformat(), cantidad)
+        sumar("ingresos_dia", 0, fecha.isoformat(), ingresos)
+        sumar("ventas_mes", 0, fecha.strftime("%Y-%m"), cantidad)
+        sumar("ingresos_mes", 0, fecha.strftime("%Y-%m"), ingresos)
+
+    return {k: v for k, v in valores.items() if v}
+
+
+def reconciliar_kpis():
+    """
+    Reconstruye resumen_kpi desde cero y retorna la lista de desviaciones
+    encontradas respecto de los contadores incrementales. No hace commit.
+    Los ajustes aún no escritos se descartan: ya están en las tablas base.
+    """
+    diferidos.descartar("resumen_kpi")
+    esperados = calcular_kpis()
+    actuales = {
+        (r.clave, r.id_tienda, r.periodo): _decimal(r.valor)
+        for r in ResumenKPI.query.all()
+    }
+
+    desviaciones = []
+    for k in sorted(set(esperados) | set(actuales)):
+        esperado = esperados.get(k, Decimal(0))
+        actual = actuales.get(k, Decimal(0))
+        if esperado != actual:
+            clave, id_tienda, periodo = k
+            desviaciones.append({
+                "clave": clave, "id_tienda": id_tienda, "periodo": periodo,
+                "actual": str(actual), "esperado": str(esperado),
+            })
+
+    ResumenKPI.query.delete()
+    db.session.add_all([
+        ResumenKPI(clave=clave, id_tienda=id_tienda, periodo=periodo, valor=valor)
+        for (clave, id_tienda, periodo), valor in esperados.items()
+    ])
+    return desviaciones
@@ -0,0 +1,235 @@
+# utils/lote_ventas.py
+"""
+Ingesta por lotes de las ventas que los terminales (POS) acumulan sin
+conexión y envían en ráfagas.
+
+    {"ventas": [{"ref": "caja2-000123", "id_cliente": 1, "id_tienda": 3,
+                 "fecha": "2025-06-01",
+                 "detalles": [{"id_producto": 10, "cantidad": 2}, ...]}, ...]}
+
+1. Se valida la forma de cada venta y se precargan, con una consulta IN
+   cada uno, los productos (precio), clientes y tiendas de TODO el lote.
+2. Las ventas se procesan en trozos de VENTAS_LOTE, una transacción por
+   trozo:
+     - se leen y bloquean (SELECT ... FOR UPDATE, en orden de índice) las
+       filas de Inventario que usa el trozo;
+     - cada venta se valida contra ese stock en memoria, en orden de
+       llegada: se acepta completa o se rechaza completa;
+     - las Venta se insertan en bloque; el stock de las aceptadas se
+       descuenta con un UPDATE condicional por fila en un solo executemany y
+       cada línea queda como movimiento de venta en el libro (utils/stock.py);
+     - los DetalleVenta se insertan en bloque, los totales se suman con un
+       executemany (utils/ventas.insertar_filas_detalle) y los contadores
+       del dashboard y el resumen diario se ajustan una vez por trozo.
+3. El resultado trae una entrada por venta, en el orden recibido:
+   {"indice", "ref", "ok", "id_venta", "total"} o {"indice", "ref", "ok": False, "error"}.
+
+Una venta rechazada no afecta a las demás. Si la base rechaza un trozo
+completo, sus ventas se informan con el error y el resto sigue.
+"""
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import db, Cliente, Inventario, Producto, Tienda, Venta
+from utils.cache import invalidar
+from utils.kpi import registrar_ventas
+from utils.ventas_diarias import sumar_lineas
+from utils.stock import StockInsuficiente, reservar_stock_lote
+from utils.ventas import insertar_filas_detalle
+
+REINTENTOS_TROZO = 3  # el stock cambió entre la lectura y el UPDATE (solo sin FOR UPDATE, p. ej. SQLite)
+
+
+class _Rechazo(Exception):
+    pass
+
+
+def _entero_positivo(valor, campo):
+    if isinstance(valor, bool) or not isinstance(valor, (int, str)):
+        raise _Rechazo(f"{campo} inválido: {valor!r}")
+    try:
+        n = int(valor)
+    except ValueError:
+        raise _Rechazo(f"{campo} inválido: {valor!r}")
+    if n <= 0:
+        raise _Rechazo(f"{campo} debe ser > 0")
+    return n
+
+
+def _normalizar(venta):
+    """Valida la forma de una venta; retorna (id_cliente, id_tienda, fecha, {id_producto: cantidad})."""
+    if not isinstance(venta, dict):
+        raise _Rechazo("cada venta debe ser un objeto JSON")
+    id_cliente = _entero_positivo(venta.get("id_cliente"), "id_cliente")
+    id_tienda = _entero_positivo(venta.get("id_tienda"), "id_tienda")
+    fecha = venta.get("fecha")
+    if fecha in (None, ""):
+        fecha = date.today()
+    else:
+        try:
+            fecha = date.fromisoformat(str(fecha)[:10])
+        except ValueError:
+            raise _Rechazo(f"fecha inválida: {fecha!r}")
+
+    detalles = venta.get("detalles")
+    if not isinstance(detalles, list) or not detalles:
+        raise _Rechazo("la venta debe tener al menos un detalle")
+    lineas = []
+    for det in detalles:
+        if not isinstance(det, dict):
+            raise _Rechazo("cada detalle debe ser un objeto JSON")
+        lineas.append((_entero_positivo(det.get("id_producto"), "id_producto"),
+                       _entero_positivo(det.get("cantidad"), "cantidad")))
+    return id_cliente, id_tienda, fecha, lineas
+
+
+def _ids_existentes(columna, ids):
+    if not ids:
+        return set()
+    return set(db.session.scalars(select(columna).where(columna.in_(ids))))
+
+
+def _insertar_ventas(filas):
+    """INSERT de las cabeceras; retorna los id_venta en el orden de `filas`."""
+    if db.engine.dialect.insert_executemany_returning_sort_by_parameter_order:
+        return list(db.session.scalars(
+            insert(Venta).returning(Venta.id_venta, sort_by_parameter_order=True), filas
+        ))
+    # MySQL no tiene RETURNING: un INSERT por cabecera (sin viaje extra para leer el id)
+    return [db.session.execute(insert(Venta), fila).inserted_primary_key[0] for fila in filas]
+
+
+def _bloquear_inventario(pares):
+    """{(id_producto, id_tienda): cantidad} de las filas del trozo, bloqueadas en orden de índice."""
+    stock = {}
+    pares = sorted(pares)
+    for i in range(0, len(pares), 1000):
+        consulta = (
+            select(Inventario.id_producto, Inventario.id_tienda, Inventario.cantidad)
+            .where(tuple_(Inventario.id_producto, Inventario.id_tienda).in_(pares[i:i + 1000]))
+            .order_by(Inventario.id_producto, Inventario.id_tienda)
+            .with_for_update()
+        )
+        stock.update({(p, t): c for p, t, c in db.session.execute(consulta)})
+    return stock
+
+
+def _procesar_trozo(trozo, precios):
+    """Valida el trozo contra el stock bloqueado y escribe las ventas aceptadas. Retorna {indice: resultado}."""
+    stock = _bloquear_inventario({(p, v[1]) for _, v in trozo for p in v[3]})
+
+    salida = {}
+    aceptadas = []  # (indice, venta, total)
+    for indice, (id_cliente, id_tienda, fecha, pedido) in trozo:
+        faltantes = []
+        for id_producto, cantidad in pedido.items():
+            disponible = stock.get((id_producto, id_tienda))
+            if disponible is None or disponible < cantidad:
+                faltantes.append(f"#{id_producto} (solicitado {cantidad}, disponible {disponible or 0})")
+        if faltantes:
+            salida[indice] = {"ok": False, "error": "Stock insuficiente: " + "; ".join(faltantes)}
+            continue
+        for id_producto, cantidad in pedido.items():
+            stock[id_producto, id_tienda] -= cantidad
+        total = sum(precios[p] * c for p, c in pedido.items())
+        aceptadas.append((indice, (id_cliente, id_tienda, fecha, pedido), total))
+
+    if not aceptadas:
+        return salida
+
+    ids = _insertar_ventas([
+        {"fecha": fecha, "total": 0, "id_cliente": id_cliente, "id_tienda": id_tienda}
+        for _, (id_cliente, id_tienda, fecha, _), _ in aceptadas
+    ])
+
+    # Stock: UPDATE condicional por fila en un executemany; con las filas ya bloqueadas siempre alcanza
+    reservar_stock_lote([
+        (id_producto, venta[1], cantidad, id_venta)
+        for id_venta, (_, venta, _) in zip(ids, aceptadas)
+        for id_producto, cantidad in venta[3].items()
+    ])
+    insertar_filas_detalle([
+        {"id_venta": id_venta, "id_producto": id_producto, "cantidad": cantidad,
+         "subtotal": precios[id_producto] * cantidad}
+        for id_venta, (_, venta, _) in zip(ids, aceptadas)
+        for id_producto, cantidad in venta[3].items()
+    ])
+    registrar_ventas((fecha, id_tienda, total) for _, (_, id_tienda, fecha, _), total in aceptadas)
+    sumar_lineas(
+        (fecha, id_tienda, id_producto, cantidad, precios[id_producto] * cantidad)
+        for _, (_, id_tienda, fecha, pedido), _ in aceptadas
+        for id_producto, cantidad in pedido.items()
+    )
+    invalidar("ventas", "inventario")
+    db.session.commit()
+
+    for id_venta, (indice, _, total) in zip(ids, aceptadas):
+        salida[indice] = {"ok": True, "id_venta": id_venta, "total": str(total)}
+    return salida
+
+
+def ingestar_ventas(ventas, tamano_trozo=500):
+    """
+    Registra una lista de ventas (dicts con la forma de la cabecera del
+    módulo). Retorna la lista de resultados, uno por venta y en el mismo orden.
+    """
+    resultados = [{"indice": i, "ref": v.get("ref") if isinstance(v, dict) else None} for i, v in enumerate(ventas)]
+
+    normalizadas = []
+    for i, venta in enumerate(ventas):
+        try:
+            id_cliente, id_tienda, fecha, lineas = _normalizar(venta)
+        except _Rechazo as e:
+            resultados[i].update(ok=False, error=str(e))
+            continue
+        pedido = {}
+        for id_producto, cantidad in lineas:
+            pedido[id_producto] = pedido.get(id_producto, 0) + cantidad
+        normalizadas.append((i, (id_cliente, id_tienda, fecha, pedido)))
+
+    # Catálogos del lote completo: una consulta IN por tabla
+    ids_producto = {p for _, v in normalizadas for p in v[3]}
+    precios = {
+        p: Decimal(precio) for p, precio in db.session.execute(
+            select(Producto.id_producto, Producto.precio).where(Producto.id_producto.in_(ids_producto))
+        )
+    } if ids_producto else {}
+    clientes = _ids_existentes(Cliente.id_cliente, {v[0] for _, v in normalizadas})
+    tiendas = _ids_existentes(Tienda.id_tienda, {v[1] for _, v in normalizadas})
+
+    validas = []
+    for i, venta in normalizadas:
+        id_cliente, id_tienda, _, pedido = venta
+        if id_cliente not in clientes:
+            resultados[i].update(ok=False, error=f"El cliente #{id_cliente} no existe.")
+        elif id_tienda not in tiendas:
+            resultados[i].update(ok=False, error=f"La tienda #{id_tienda} no existe.")
+        elif any(p not in precios for p in pedido):
+            faltan = ", ".join(f"#{p}" for p in pedido if p not in precios)
+            resultados[i].update(ok=False, error=f"Producto inexistente: {faltan}")
+        else:
+            validas.append((i, venta))
+    db.session.rollback()  # soltar la transacción de lectura antes de bloquear inventario
+
+    for inicio in range(0, len(validas), tamano_trozo):
+        trozo = validas[inicio:inicio + tamano_trozo]
+        for intento in range(1, REINTENTOS_TROZO + 1):
+            try:
+                for i, resultado in _procesar_trozo(trozo, precios).items():
+                    resultados[i].update(resultado)
+                break
+            except StockInsuficiente:
+                # reservar_stock ya deshizo la transacción: releer el stock y repetir el trozo
+                if intento == REINTENTOS_TROZO:
+                    for i, _ in trozo:
+                        resultados[i].update(ok=False, error="El stock cambió durante el registro; reintenta la venta.")
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                motivo = str(getattr(e, "orig", e)).splitlines()[0][:200]
+                for i, _ in trozo:
+                    resultados[i].update(ok=False, error=f"Error de base de datos: {motivo}")
+                break
+    return resultados
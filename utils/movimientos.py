@@ -0,0 +1,314 @@
+# utils/movimientos.py
+"""
+Libro de movimientos de stock (tabla movimiento_stock).
+
+Todo cambio de existencias de un producto en una tienda queda como una fila
+inmutable: venta, devolucion, ajuste, transferencia o importacion, con la
+cantidad con signo. Las funciones de utils/stock.py actualizan el saldo
+materializado (Inventario.cantidad) y llaman a registrar() en la MISMA
+transacción, que además mantiene por diferencias:
+
+    Producto.stock          suma de los saldos del producto en todas las tiendas
+    resumen_kpi.stock_tienda  unidades por tienda del dashboard
+
+Consultas a una fecha pasada sin recorrer todo el libro: `flask corte-stock`
+(programado, p. ej. cada noche) guarda una foto de los saldos (corte_stock /
+saldo_corte) calculada a partir del corte anterior más los movimientos
+nuevos. saldos_al(fecha) parte del último corte anterior a la fecha y suma
+solo los movimientos posteriores.
+
+El corte toma los ids hasta el último movimiento con más de MARGEN_CORTE
+segundos, suponiendo que las transacciones que los escribieron ya se
+confirmaron. Una transacción abierta más tiempo puede confirmar después
+movimientos con ids dentro del rango de un corte, que ese corte no incluye:
+cada corte guarda cuántos movimientos de su rango vio, y `flask
+verificar-stock` (y el corte siguiente, para el anterior) recalcula los que
+hoy tienen más. Hasta entonces, saldos_al() desde ese corte no ve esos
+movimientos.
+
+En una base que ya tenía inventario, `flask abrir-libro-stock` registra un
+movimiento de apertura por cada diferencia entre Inventario y el libro, y
+recalcula Producto.stock desde Inventario. `flask verificar-stock` recalcula
+los cortes incompletos y reporta cualquier descuadre entre las tres fuentes.
+"""
+from datetime import datetime, timedelta
+
+from flask import has_request_context, session
+from sqlalchemy import bindparam, delete, func, insert, literal, select, union_all, update
+
+from models import db, CorteStock, Inventario, MovimientoStock, Producto, SaldoCorte
+from utils.kpi import ajustar_stock
+
+TIPOS = ("venta", "devolucion", "ajuste", "transferencia", "importacion")
+MARGEN_CORTE = 60  # segundos: un corte solo incluye movimientos de transacciones ya confirmadas (heurística)
+TAMANO_LOTE = 5000
+
+_tabla_producto = Producto.__table__
+_SUMAR_STOCK_PRODUCTO = (
+    update(_tabla_producto)
+    .where(_tabla_producto.c.id_producto == bindparam("p"))
+    .values(stock=_tabla_producto.c.stock + bindparam("d"))
+)
+
+
+# -------------------------------
+# ESCRITURA
+# -------------------------------
+def registrar_filas(filas):
+    """
+    Agrega movimientos [{tipo, id_producto, id_tienda, cantidad, id_venta?, nota?}]
+    al libro (un INSERT executemany) y ajusta Producto.stock y los contadores
+    por tienda. No toca Inventario (eso lo hace quien llama) ni hace commit.
+    """
+    filas = [f for f in filas if f["cantidad"]]
+    if not filas:
+        return
+    ahora = datetime.now()
+    usuario = session.get("user_id") if has_request_context() else None
+    db.session.execute(insert(MovimientoStock), [
+        {"fecha_hora": ahora, "usuario_id": usuario, "id_venta": None, "nota": None, **f} for f in filas
+    ])
+
+    por_producto, por_tienda = {}, {}
+    for f in filas:
+        por_producto[f["id_producto"]] = por_producto.get(f["id_producto"], 0) + f["cantidad"]
+        por_tienda[f["id_tienda"]] = por_tienda.get(f["id_tienda"], 0) + f["cantidad"]
+    cambios = [{"p": p, "d": d} for p, d in sorted(por_producto.items()) if d]
+    if cambios:
+        db.session.execute(_SUMAR_STOCK_PRODUCTO, cambios)
+    for id_tienda, delta in por_tienda.items():
+        ajustar_stock(id_tienda, delta)
+
+
+def registrar(tipo, deltas, id_venta=None, nota=None):
+    """Registra {(id_producto, id_tienda): unidades con signo} con un mismo tipo y referencia."""
+    registrar_filas([
+        {"tipo": tipo, "id_producto": p, "id_tienda": t, "cantidad": n, "id_venta": id_venta, "nota": nota}
+        for (p, t), n in sorted(deltas.items())
+    ])
+
+
+# -------------------------------
+# CORTES Y CONSULTA A UNA FECHA
+# -------------------------------
+def _ultimo_corte(hasta_fecha=None):
+    consulta = select(CorteStock).order_by(CorteStock.id_corte.desc()).limit(1)
+    if hasta_fecha is not None:
+        consulta = consulta.where(CorteStock.fecha_hora <= hasta_fecha)
+    return db.session.scalar(consulta)
+
+
+def _anterior_a(corte):
+    return db.session.scalar(
+        select(CorteStock).where(CorteStock.id_corte < corte.id_corte).order_by(CorteStock.id_corte.desc()).limit(1)
+    )
+
+
+def _contar(desde, hasta):
+    return db.session.scalar(
+        select(func.count()).select_from(MovimientoStock)
+        .where(MovimientoStock.id_movimiento.between(desde + 1, hasta))
+    )
+
+
+def _calcular_saldos(corte, anterior):
+    """
+    (Re)escribe los saldos de `corte`: los de `anterior` + los movimientos de
+    su rango, en un INSERT ... SELECT. Actualiza la fecha y el conteo del corte.
+    """
+    desde = anterior.id_movimiento_hasta if anterior else 0
+    rango = MovimientoStock.id_movimiento.between(desde + 1, corte.id_movimiento_hasta)
+    corte.movimientos = _contar(desde, corte.id_movimiento_hasta)
+    corte.fecha_hora = db.session.scalar(select(func.max(MovimientoStock.fecha_hora)).where(rango))
+    db.session.flush()
+
+    db.session.execute(delete(SaldoCorte).where(SaldoCorte.id_corte == corte.id_corte))
+    partes = [select(MovimientoStock.id_producto, MovimientoStock.id_tienda, MovimientoStock.cantidad).where(rango)]
+    if anterior:
+        partes.append(
+            select(SaldoCorte.id_producto, SaldoCorte.id_tienda, SaldoCorte.cantidad)
+            .where(SaldoCorte.id_corte == anterior.id_corte)
+        )
+    union = union_all(*partes).subquery()
+    db.session.execute(insert(SaldoCorte).from_select(
+        ["id_corte", "id_producto", "id_tienda", "cantidad"],
+        select(literal(corte.id_corte), union.c.id_producto, union.c.id_tienda, func.sum(union.c.cantidad))
+        .group_by(union.c.id_producto, union.c.id_tienda)
+        .having(func.sum(union.c.cantidad) != 0),
+    ))
+
+
+def _incompleto(corte, anterior):
+    desde = anterior.id_movimiento_hasta if anterior else 0
+    return _contar(desde, corte.id_movimiento_hasta) != corte.movimientos
+
+
+def crear_corte(margen=MARGEN_CORTE):
+    """
+    Guarda los saldos al último movimiento con más de `margen` segundos:
+    saldos del corte anterior + movimientos nuevos. Si el corte anterior quedó
+    incompleto, lo recalcula antes de partir de él.
+    Retorna el corte creado, o None si no hubo movimientos nuevos. Hace commit.
+    """
+    anterior = _ultimo_corte()
+    if anterior:
+        previo = _anterior_a(anterior)
+        if _incompleto(anterior, previo):
+            _calcular_saldos(anterior, previo)
+    desde = anterior.id_movimiento_hasta if anterior else 0
+    hasta = db.session.scalar(
+        select(func.max(MovimientoStock.id_movimiento)).where(
+            MovimientoStock.id_movimiento > desde,
+            MovimientoStock.fecha_hora <= datetime.now() - timedelta(seconds=margen),
+        )
+    )
+    if hasta is None:
+        db.session.commit()
+        return None
+
+    corte = CorteStock(fecha_hora=datetime.now(), id_movimiento_hasta=hasta)
+    db.session.add(corte)
+    db.session.flush()
+    _calcular_saldos(corte, anterior)
+    db.session.commit()
+    return corte
+
+
+def cortes_incompletos():
+    """
+    Cortes cuyo rango de ids tiene hoy más movimientos que cuando se
+    calcularon: los confirmó tarde una transacción abierta durante el corte.
+    """
+    incompletos, anterior = [], None
+    for corte in db.session.scalars(select(CorteStock).order_by(CorteStock.id_corte)):
+        if _incompleto(corte, anterior):
+            incompletos.append(corte)
+        anterior = corte
+    return incompletos
+
+
+def reparar_cortes():
+    """
+    Recalcula desde el primer corte incompleto en adelante (cada corte parte
+    del anterior). Retorna la cantidad de cortes recalculados. Hace commit.
+    """
+    incompletos = cortes_incompletos()
+    if not incompletos:
+        return 0
+    anterior = _anterior_a(incompletos[0])
+    cortes = db.session.scalars(
+        select(CorteStock).where(CorteStock.id_corte >= incompletos[0].id_corte).order_by(CorteStock.id_corte)
+    ).all()
+    for corte in cortes:
+        _calcular_saldos(corte, anterior)
+        anterior = corte
+    db.session.commit()
+    return len(cortes)
+
+
+def saldos_al(fecha=None, id_tienda=None, id_producto=None):
+    """
+    {(id_producto, id_tienda): cantidad} a la fecha/hora indicada (None = ahora):
+    saldos del último corte anterior a la fecha + movimientos posteriores a él.
+    Las combinaciones con saldo cero no aparecen.
+    """
+    corte = _ultimo_corte(fecha)
+    movimientos = select(MovimientoStock.id_producto, MovimientoStock.id_tienda, MovimientoStock.cantidad)
+    if corte:
+        movimientos = movimientos.where(MovimientoStock.id_movimiento > corte.id_movimiento_hasta)
+    if fecha is not None:
+        movimientos = movimientos.where(MovimientoStock.fecha_hora <= fecha)
+    if id_tienda is not None:
+        movimientos = movimientos.where(MovimientoStock.id_tienda == id_tienda)
+    if id_producto is not None:
+        movimientos = movimientos.where(MovimientoStock.id_producto == id_producto)
+    partes = [movimientos]
+
+    if corte:
+        base = select(SaldoCorte.id_producto, SaldoCorte.id_tienda, SaldoCorte.cantidad).where(
+            SaldoCorte.id_corte == corte.id_corte
+        )
+        if id_tienda is not None:
+            base = base.where(SaldoCorte.id_tienda == id_tienda)
+        if id_producto is not None:
+            base = base.where(SaldoCorte.id_producto == id_producto)
+        partes.append(base)
+
+    union = union_all(*partes).subquery()
+    filas = db.session.execute(
+        select(union.c.id_producto, union.c.id_tienda, func.sum(union.c.cantidad))
+        .group_by(union.c.id_producto, union.c.id_tienda)
+    )
+    return {(p, t): int(n) for p, t, n in filas if n}
+
+
+# -------------------------------
+# APERTURA Y VERIFICACIÓN
+# -------------------------------
+def _saldos_inventario():
+    return {(p, t): c for p, t, c in db.session.execute(
+        select(Inventario.id_producto, Inventario.id_tienda, Inventario.cantidad)
+    ) if c}
+
+
+def _suma_inventario():
+    """Subconsulta correlacionada: unidades del producto en todas las tiendas."""
+    return (
+        select(func.coalesce(func.sum(Inventario.cantidad), 0))
+        .where(Inventario.id_producto == Producto.id_producto)
+        .scalar_subquery()
+    )
+
+
+def abrir_libro(lote=TAMANO_LOTE):
+    """
+    Registra un movimiento de ajuste ("apertura") por cada diferencia entre
+    Inventario y el libro y recalcula Producto.stock desde Inventario.
+    Pensado para ejecutarse una vez (o tras una carga directa a la base), sin
+    ventas en curso. Retorna la cantidad de movimientos de apertura. Hace commit.
+    """
+    libro = saldos_al()
+    inventario = _saldos_inventario()
+    ahora = datetime.now()
+    aperturas = [
+        {"fecha_hora": ahora, "tipo": "ajuste", "id_producto": p, "id_tienda": t,
+         "cantidad": inventario.get((p, t), 0) - libro.get((p, t), 0), "nota": "apertura"}
+        for p, t in sorted(set(libro) | set(inventario))
+        if inventario.get((p, t), 0) != libro.get((p, t), 0)
+    ]
+    for i in range(0, len(aperturas), lote):
+        db.session.execute(insert(MovimientoStock), aperturas[i:i + lote])
+        db.session.commit()
+
+    suma = _suma_inventario()
+    db.session.execute(
+        update(Producto).where(Producto.stock != suma).values(stock=suma)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return len(aperturas)
+
+
+def verificar():
+    """
+    Lista de descuadres (sin corregir nada):
+      - cortes incompletos (ver reparar_cortes)
+      - Inventario.cantidad distinto del saldo según el libro
+      - Producto.stock distinto de la suma de Inventario
+    """
+    descuadres = [
+        {"tipo": "corte", "id_corte": c.id_corte, "movimientos": c.movimientos} for c in cortes_incompletos()
+    ]
+    libro = saldos_al()
+    inventario = _saldos_inventario()
+    for p, t in sorted(set(libro) | set(inventario)):
+        if libro.get((p, t), 0) != inventario.get((p, t), 0):
+            descuadres.append({"tipo": "inventario", "id_producto": p, "id_tienda": t,
+                               "libro": libro.get((p, t), 0), "inventario": inventario.get((p, t), 0)})
+
+    suma = _suma_inventario()
+    for p, stock, esperado in db.session.execute(
+        select(Producto.id_producto, Producto.stock, suma).where(Producto.stock != suma)
+    ):
+        descuadres.append({"tipo": "producto", "id_producto": p, "stock": stock, "inventario": int(esperado)})
+    return descuadres
@@ -0,0 +1,28 @@
+TAMANO_PAGINA = 25
+
+
+def paginar_keyset(query, columna, despues=None, limite=TAMANO_PAGINA, descendente=False):
+    """
+    Paginación por keyset (sin OFFSET): filtra por la última clave vista y
+    pide un registro extra para saber si hay más páginas.
+    Retorna (filas, siguiente) donde siguiente es la clave para la próxima
+    página o None si no hay más.
+    """
+    if despues is not None:
+        query = query.filter(columna < despues if descendente else columna > despues)
+
+    orden = columna.desc() if descendente else columna.asc()
+    filas = query.order_by(orden).limit(limite + 1).all()
+
+    hay_mas = len(filas) > limite
+    filas = filas[:limite]
+    siguiente = getattr(filas[-1], columna.key) if hay_mas and filas else None
+    return filas, siguiente
+
+
+def parse_cursor(value):
+    """Parsea el cursor recibido por querystring. Retorna None si es inválido."""
+    try:
+        return int(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,207 @@
+# utils/perfil_sql.py
+"""
+Instrumentación SQL por request.
+
+Se engancha a los eventos before/after_cursor_execute del engine de
+extensions.db y, para cada request muestreado, registra:
+
+- cantidad de consultas y tiempo total en la base de datos,
+- las sentencias más lentas,
+- sentencias de la misma "forma" (mismo SQL sin valores) repetidas muchas
+  veces: probable N+1 (un lazy load o una consulta por línea dentro de un for).
+
+El resultado va en el header Server-Timing (visible en las DevTools del
+navegador) y en la página de administración /admin/perfil_sql. Los datos
+viven en memoria de cada proceso.
+
+En respuestas en streaming (p. ej. /admin/auditoria.csv) los headers salen
+antes de generar el cuerpo: Server-Timing solo cubre hasta ese punto, y la
+página de administración registra el request completo al cerrarse la
+respuesta.
+
+Configuración (app.config):
+    SQL_PERFIL_MUESTREO     fracción de requests medidos, 0..1 (default 1.0)
+    SQL_PERFIL_UMBRAL_N1    repeticiones de una misma forma para marcar N+1 (default 5)
+    SQL_PERFIL_LENTAS       sentencias más lentas que se guardan por request (default 3)
+    SQL_PERFIL_HISTORIAL    requests recientes que muestra la página (default 100)
+"""
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+
+from flask import current_app, g, request
+from sqlalchemy import event
+
+from extensions import db
+
+_RE_LISTA = re.compile(r"\(\s*(?:\?|%s|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))*\s*\)")
+_RE_NUMERO = re.compile(r"\b\d+\b")
+_RE_ESPACIOS = re.compile(r"\s+")
+
+
+def forma_sentencia(sql):
+    """SQL sin valores: listas IN de cualquier largo y números quedan como '?'."""
+    sql = _RE_LISTA.sub("(?)", sql)
+    sql = _RE_NUMERO.sub("?", sql)
+    return _RE_ESPACIOS.sub(" ", sql).strip()
+
+
+class PerfilSQL:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.recientes = deque(maxlen=100)
+        self.por_ruta = {}
+
+    def init_app(self, app):
+        app.config.setdefault("SQL_PERFIL_MUESTREO", 1.0)
+        app.config.setdefault("SQL_PERFIL_UMBRAL_N1", 5)
+        app.config.setdefault("SQL_PERFIL_LENTAS", 3)
+        app.config.setdefault("SQL_PERFIL_HISTORIAL", 100)
+        self.recientes = deque(maxlen=app.config["SQL_PERFIL_HISTORIAL"])
+        app.extensions["perfil_sql"] = self
+
+        with app.app_context():
+            event.listen(db.engine, "before_cursor_execute", self._antes)
+            event.listen(db.engine, "after_cursor_execute", self._despues)
+
+        app.before_request(self._iniciar)
+        app.after_request(self._terminar)
+
+    # -------------------------------
+    # Eventos del engine
+    # -------------------------------
+    @staticmethod
+    def _medicion():
+        try:
+            return g.get("_perfil_sql")
+        except RuntimeError:  # fuera de contexto (scripts, hilos sin app)
+            return None
+
+    # El inicio se guarda en el contexto de ejecución de la sentencia: si la
+    # sentencia falla, after_cursor_execute no llega y el inicio se va con él.
+    def _antes(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None and self._medicion() is not None:
+            context._perfil_inicio = time.perf_counter()
+
+    def _despues(self, conn, cursor, statement, parameters, context, executemany):
+        medicion = self._medicion()
+        inicio = getattr(context, "_perfil_inicio", None)
+        if medicion is None or inicio is None:
+            return
+        duracion = time.perf_counter() - inicio
+        medicion["consultas"] += 1
+        medicion["tiempo"] += duracion
+        medicion["formas"][forma_sentencia(statement)] += 1
+        medicion["sentencias"].append((duracion, statement))
+
+    # -------------------------------
+    # Ciclo del request
+    # -------------------------------
+    def _iniciar(self):
+        if random.random() < current_app.config["SQL_PERFIL_MUESTREO"]:
+            g._perfil_sql = {
+                "inicio": time.perf_counter(),
+                "consultas": 0,
+                "tiempo": 0.0,
+                "formas": Counter(),
+                "sentencias": [],
+            }
+
+    def _terminar(self, response):
+        medicion = g.get("_perfil_sql")
+        if medicion is None:
+            return response
+
+        response.headers.add(
+            "Server-Timing",
+            f'db;dur={medicion["tiempo"] * 1000:.1f};desc="{medicion["consultas"]} consultas", '
+            f'app;dur={(time.perf_counter() - medicion["inicio"]) * 1000:.1f}',
+        )
+        origen = {
+            "ruta": request.endpoint or request.path,
+            "metodo": request.method,
+            "path": request.path,
+            "estado": response.status_code,
+        }
+        if response.is_streamed:
+            # El cuerpo (y sus consultas) se genera después de enviar los headers:
+            # se registra completo cuando el servidor cierra la respuesta
+            app = current_app._get_current_object()
+            response.call_on_close(lambda: self._cerrar(medicion, origen, app))
+        else:
+            g.pop("_perfil_sql")
+            self._cerrar(medicion, origen, current_app)
+        return response
+
+    def _cerrar(self, medicion, origen, app):
+        config = app.config
+        total_ms = (time.perf_counter() - medicion["inicio"]) * 1000
+        db_ms = medicion["tiempo"] * 1000
+        lentas = sorted(medicion["sentencias"], key=lambda s: s[0], reverse=True)[:config["SQL_PERFIL_LENTAS"]]
+        n1 = [
+            {"forma": forma, "veces": veces}
+            for forma, veces in medicion["formas"].most_common()
+            if veces >= config["SQL_PERFIL_UMBRAL_N1"]
+        ]
+
+        if n1:
+            app.logger.warning(
+                "Probable N+1 en %s %s: %s", origen["metodo"], origen["path"],
+                "; ".join(f"{p['veces']}x {p['forma'][:120]}" for p in n1),
+            )
+
+        self._registrar({
+            **origen,
+            "consultas": medicion["consultas"],
+            "db_ms": round(db_ms, 1),
+            "total_ms": round(total_ms, 1),
+            "lentas": [{"ms": round(d * 1000, 1), "sql": sql} for d, sql in lentas],
+            "n1": n1,
+            "cuando": time.time(),
+        })
+
+    # -------------------------------
+    # Agregados para la página de administración
+    # -------------------------------
+    def _registrar(self, registro):
+        with self._lock:
+            self.recientes.appendleft(registro)
+            agregado = self.por_ruta.setdefault(registro["ruta"], {
+                "requests": 0, "consultas": 0, "max_consultas": 0,
+                "db_ms": 0.0, "total_ms": 0.0, "con_n1": 0,
+            })
+            agregado["requests"] += 1
+            agregado["consultas"] += registro["consultas"]
+            agregado["max_consultas"] = max(agregado["max_consultas"], registro["consultas"])
+            agregado["db_ms"] += registro["db_ms"]
+            agregado["total_ms"] += registro["total_ms"]
+            agregado["con_n1"] += 1 if registro["n1"] else 0
+
+    def resumen(self):
+        """[(ruta, promedios)] ordenado por tiempo de BD promedio, descendente."""
+        with self._lock:
+            filas = []
+            for ruta, a in self.por_ruta.items():
+                n = a["requests"]
+                filas.append({
+                    "ruta": ruta,
+                    "requests": n,
+                    "consultas_prom": round(a["consultas"] / n, 1),
+                    "max_consultas": a["max_consultas"],
+                    "db_ms_prom": round(a["db_ms"] / n, 1),
+                    "total_ms_prom": round(a["total_ms"] / n, 1),
+                    "con_n1": a["con_n1"],
+                })
+            recientes = list(self.recientes)
+        filas.sort(key=lambda f: f["db_ms_prom"], reverse=True)
+        return filas, recientes
+
+    def reiniciar(self):
+        with self._lock:
+            self.recientes.clear()
+            self.por_ruta.clear()
+
+
+perfil_sql = PerfilSQL()
@@ -0,0 +1,85 @@
+# utils/recalculo.py
+"""
+Recálculo de subtotales y totales con sentencias set-based.
+
+    DetalleVenta.subtotal = cantidad * Producto.precio   (UPDATE ... JOIN Producto)
+    Venta.total = SUM(DetalleVenta.subtotal)             (UPDATE con subconsulta agrupada)
+
+Se procesa por rangos de id de tamaño fijo y se hace commit por rango, así la
+transacción nunca queda abierta sobre toda la tabla y el avance se puede
+informar mientras corre.
+"""
+from sqlalchemy import func, select, update
+
+from models import db, DetalleVenta, Producto, Venta
+
+TAMANO_LOTE = 5000
+
+
+def _rangos(columna, lote):
+    """Rangos [desde, hasta] de tamaño lote entre el id mínimo y máximo."""
+    minimo, maximo = db.session.query(func.min(columna), func.max(columna)).one()
+    if minimo is None:
+        return
+    desde = minimo
+    while desde <= maximo:
+        yield desde, desde + lote - 1
+        desde += lote
+
+
+def recalcular_subtotales(lote=TAMANO_LOTE, progreso=None):
+    """Retorna la cantidad de detalles actualizados. Hace commit por lote."""
+    nuevo_subtotal = DetalleVenta.cantidad * Producto.precio
+    actualizados = 0
+    for desde, hasta in _rangos(DetalleVenta.id_detalle, lote):
+        resultado = db.session.execute(
+            update(DetalleVenta)
+            .where(
+                DetalleVenta.id_producto == Producto.id_producto,
+                DetalleVenta.id_detalle.between(desde, hasta),
+                DetalleVenta.subtotal != nuevo_subtotal,
+            )
+            .values(subtotal=nuevo_subtotal)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        actualizados += resultado.rowcount
+        if progreso:
+            progreso("detalles", hasta, actualizados)
+    return actualizados
+
+
+def recalcular_totales_ventas(lote=TAMANO_LOTE, progreso=None):
+    """Retorna la cantidad de ventas actualizadas. Hace commit por lote."""
+    suma = (
+        select(func.coalesce(func.sum(DetalleVenta.subtotal), 0))
+        .where(DetalleVenta.id_venta == Venta.id_venta)
+        .scalar_subquery()
+    )
+    actualizados = 0
+    for desde, hasta in _rangos(Venta.id_venta, lote):
+        resultado = db.session.execute(
+            update(Venta)
+            .where(Venta.id_venta.between(desde, hasta), Venta.total != suma)
+            .values(total=suma)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        actualizados += resultado.rowcount
+        if progreso:
+            progreso("ventas", hasta, actualizados)
+    return actualizados
+
+
+def recalcular_totales(lote=TAMANO_LOTE, progreso=None):
+    """
+    Ejecuta ambos recálculos y retorna los conteos para la auditoría.
+    progreso(fase, ultimo_id, actualizados) se llama después de cada lote.
+    """
+    conteos = {
+        "detalles_tocados": db.session.query(func.count(DetalleVenta.id_detalle)).scalar(),
+        "ventas_tocadas": db.session.query(func.count(Venta.id_venta)).scalar(),
+    }
+    conteos["detalles_actualizados"] = recalcular_subtotales(lote, progreso)
+    conteos["ventas_actualizadas"] = recalcular_totales_ventas(lote, progreso)
+    return conteos
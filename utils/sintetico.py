@@ -0,0 +1,192 @@
+# utils/sintetico.py
+"""
+Generador determinista de datos sintéticos para pruebas de carga y benchmarks.
+
+Con la misma semilla y los mismos volúmenes se obtienen exactamente los
+mismos registros (ids incluidos). Las distribuciones imitan una PYME real:
+
+- precios log-normales (muchos productos baratos, pocos caros),
+- popularidad de productos y clientes tipo Zipf (pocos concentran las ventas),
+- más ventas en fin de semana y 1 a 5 líneas por venta,
+- cada producto está en la mayoría de las tiendas, con existencias variables.
+
+Los registros se insertan por lotes con INSERT multi-fila y commit por lote.
+"""
+import random
+from datetime import date, datetime, time, timedelta
+from itertools import accumulate
+
+from sqlalchemy import func, insert
+
+from models import (
+    db, Usuario, Proveedor, Producto, Cliente, Tienda, Inventario, Venta, DetalleVenta, Auditoria, MovimientoStock,
+)
+from utils.kpi import reconciliar_kpis
+from utils.ventas_diarias import reconstruir as reconstruir_ventas_diarias
+from utils.busqueda_productos import reindexar as reindexar_productos
+
+VOLUMENES = {
+    "pequeno": {"tiendas": 3, "proveedores": 5, "productos": 100, "clientes": 200, "ventas": 2_000},
+    "mediano": {"tiendas": 10, "proveedores": 30, "productos": 2_000, "clientes": 5_000, "ventas": 100_000},
+    "grande": {"tiendas": 40, "proveedores": 120, "productos": 20_000, "clientes": 50_000, "ventas": 1_000_000},
+}
+
+TAMANO_LOTE = 5000
+DIAS_HISTORIA = 365
+HASTA = date(2025, 12, 31)  # fija: los datos no dependen del día en que se generan
+PESO_DIA_SEMANA = (0.8, 0.8, 0.9, 1.0, 1.3, 1.6, 1.2)  # lunes..domingo
+
+
+class BaseNoVacia(Exception):
+    """La base ya tiene productos; el generador solo llena bases vacías."""
+
+
+def _pesos_zipf(n, s, rnd):
+    """Pesos acumulados 1/rango^s asignados a ids en orden aleatorio."""
+    pesos = [1.0 / (rango ** s) for rango in range(1, n + 1)]
+    rnd.shuffle(pesos)
+    return list(accumulate(pesos))
+
+
+def _insertar_por_lotes(modelo, filas, progreso=None, etiqueta=None):
+    lote = []
+    total = 0
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) >= TAMANO_LOTE:
+            db.session.execute(insert(modelo), lote)
+            db.session.commit()
+            total += len(lote)
+            lote = []
+            if progreso:
+                progreso(etiqueta or modelo.__tablename__, total)
+    if lote:
+        db.session.execute(insert(modelo), lote)
+        db.session.commit()
+        total += len(lote)
+    if progreso:
+        progreso(etiqueta or modelo.__tablename__, total)
+    return total
+
+
+def generar_datos(volumen="pequeno", semilla=42, progreso=None, password="admin123", **ajustes):
+    """
+    Llena una base vacía. `volumen` es un nombre de VOLUMENES y `ajustes`
+    permite sobreescribir cantidades (tiendas=, productos=, ventas=, ...).
+    progreso(tabla, filas_insertadas) se llama después de cada lote.
+    Retorna {tabla: filas}.
+    """
+    if db.session.query(func.count(Producto.id_producto)).scalar():
+        raise BaseNoVacia("La base ya tiene productos: usa una base vacía para los datos sintéticos.")
+
+    v = dict(VOLUMENES[volumen], **{k: n for k, n in ajustes.items() if n is not None})
+    rnd = random.Random(semilla)
+    conteos = {}
+
+    # ---- Usuarios de prueba (uno por rol) ----
+    for username, rol in (("admin", "administrador"), ("usuario", "usuario")):
+        if not Usuario.query.filter_by(username=username).first():
+            u = Usuario(username=username, email=f"{username}@example.com", rol=rol)
+            u.set_password(password)
+            db.session.add(u)
+    db.session.commit()
+
+    # ---- Maestros ----
+    conteos["proveedores"] = _insertar_por_lotes(Proveedor, (
+        {"id_proveedor": i, "nombre": f"Proveedor {i:04d}", "contacto": f"Contacto {i}",
+         "email": f"proveedor{i}@example.com", "ubicacion": f"Región {rnd.randint(1, 16)}"}
+        for i in range(1, v["proveedores"] + 1)
+    ), progreso)
+    conteos["tiendas"] = _insertar_por_lotes(Tienda, (
+        {"id_tienda": i, "nombre": f"Tienda {i:03d}", "ubicacion": f"Comuna {rnd.randint(1, 52)}",
+         "contacto": f"Encargado {i}", "email": f"tienda{i}@example.com"}
+        for i in range(1, v["tiendas"] + 1)
+    ), progreso)
+    conteos["clientes"] = _insertar_por_lotes(Cliente, (
+        {"id_cliente": i, "nombre": f"Cliente {i:06d}", "email": f"cliente{i}@example.com",
+         "telefono": f"+569{rnd.randint(10_000_000, 99_999_999)}"}
+        for i in range(1, v["clientes"] + 1)
+    ), progreso)
+
+    # Precios log-normales redondeados a $10 (mediana ~ $8.000)
+    precios = {
+        i: max(100, round(rnd.lognormvariate(9.0, 0.9), -1))
+        for i in range(1, v["productos"] + 1)
+    }
+
+    # ---- Inventario: ~80% de los productos en cada tienda ----
+    inventario = []
+    stock_total = dict.fromkeys(precios, 0)
+    for id_producto in precios:
+        for id_tienda in range(1, v["tiendas"] + 1):
+            if rnd.random() < 0.8:
+                cantidad = int(rnd.expovariate(1 / 60))
+                inventario.append({"id_producto": id_producto, "id_tienda": id_tienda, "cantidad": cantidad})
+                stock_total[id_producto] += cantidad
+
+    conteos["productos"] = _insertar_por_lotes(Producto, (
+        {"id_producto": i, "nombre": f"Producto {i:06d}", "precio": precio,
+         "stock": stock_total[i], "id_proveedor": rnd.randint(1, v["proveedores"])}
+        for i, precio in precios.items()
+    ), progreso)
+    conteos["inventario"] = _insertar_por_lotes(Inventario, inventario, progreso)
+    # Apertura del libro de stock: los saldos sembrados son el estado actual (las
+    # ventas históricas se generan aparte y no descuentan inventario)
+    apertura = datetime.combine(HASTA, time(23, 59))
+    conteos["movimientos"] = _insertar_por_lotes(MovimientoStock, (
+        {"fecha_hora": apertura, "tipo": "ajuste", "id_producto": f["id_producto"], "id_tienda": f["id_tienda"],
+         "cantidad": f["cantidad"], "nota": "apertura"}
+        for f in inventario if f["cantidad"]
+    ), progreso)
+
+    # ---- Ventas y detalles ----
+    acum_productos = _pesos_zipf(v["productos"], 1.1, rnd)
+    acum_clientes = _pesos_zipf(v["clientes"], 0.8, rnd)
+    dias = [HASTA - timedelta(days=d) for d in range(DIAS_HISTORIA)]
+    acum_dias = list(accumulate(PESO_DIA_SEMANA[d.weekday()] for d in dias))
+    ids_productos = list(precios)
+    ids_clientes = list(range(1, v["clientes"] + 1))
+
+    ventas, detalles = [], []
+    id_detalle = 0
+    for id_venta in range(1, v["ventas"] + 1):
+        lineas = min(5, 1 + int(rnd.expovariate(0.9)))
+        elegidos = set(rnd.choices(ids_productos, cum_weights=acum_productos, k=lineas))
+        total = 0
+        for id_producto in sorted(elegidos):
+            cantidad = rnd.choice((1, 1, 1, 2, 2, 3))
+            subtotal = cantidad * precios[id_producto]
+            total += subtotal
+            id_detalle += 1
+            detalles.append({"id_detalle": id_detalle, "id_venta": id_venta, "id_producto": id_producto,
+                             "cantidad": cantidad, "subtotal": subtotal})
+        ventas.append({
+            "id_venta": id_venta,
+            "fecha": rnd.choices(dias, cum_weights=acum_dias)[0],
+            "total": total,
+            "id_cliente": rnd.choices(ids_clientes, cum_weights=acum_clientes)[0],
+            "id_tienda": rnd.randint(1, v["tiendas"]),
+        })
+        if len(ventas) >= TAMANO_LOTE:
+            conteos["ventas"] = conteos.get("ventas", 0) + _insertar_por_lotes(Venta, ventas)
+            conteos["detalles"] = conteos.get("detalles", 0) + _insertar_por_lotes(DetalleVenta, detalles)
+            ventas, detalles = [], []
+            if progreso:
+                progreso("Venta", conteos["ventas"])
+    conteos["ventas"] = conteos.get("ventas", 0) + _insertar_por_lotes(Venta, ventas)
+    conteos["detalles"] = conteos.get("detalles", 0) + _insertar_por_lotes(DetalleVenta, detalles)
+    if progreso:
+        progreso("Venta", conteos["ventas"])
+
+    # ---- Contadores del dashboard, resumen diario, búsqueda + rastro en auditoría ----
+    reconciliar_kpis()
+    conteos["ventas_diarias"] = reconstruir_ventas_diarias()
+    reindexar_productos()
+    db.session.add(Auditoria(
+        usuario_nombre="sistema",
+        accion="generar_datos_sinteticos",
+        detalles=f"Volumen={volumen}, semilla={semilla}",
+        detalles_json={"volumen": volumen, "semilla": semilla, "conteos": conteos},
+    ))
+    db.session.commit()
+    return conteos
@@ -0,0 +1,254 @@
+# utils/stock.py
+"""
+Reserva atómica de stock por tienda.
+
+El descuento se hace en la base de datos con un único UPDATE condicional:
+
+    UPDATE Inventario
+       SET cantidad = cantidad - CASE id_producto WHEN :p THEN :n ... END
+     WHERE id_tienda = :t AND id_producto IN (...)
+       AND cantidad >= CASE id_producto WHEN :p THEN :n ... END
+
+Dos cajeros vendiendo el mismo producto no pueden sobrevender: el motor
+serializa las escrituras sobre cada fila y la condición se evalúa sobre el
+valor vigente. Al ser una sola sentencia que recorre el índice
+(id_producto, id_tienda) en orden, los bloqueos se toman siempre en el mismo
+orden y no hay deadlocks entre ventas concurrentes.
+
+Toda función de este módulo que cambia Inventario registra el movimiento en
+el libro de stock (utils/movimientos.py) dentro de la misma transacción; el
+libro mantiene a su vez Producto.stock y el contador de stock por tienda.
+Ninguna ruta debe modificar Inventario.cantidad ni Producto.stock directamente.
+
+Orden de bloqueos: filas de Inventario por (id_producto, id_tienda), luego
+Producto por id (el libro), y al commit los contadores (utils/diferidos.py).
+Una ruta que devuelve y reserva en la misma transacción (edición de una
+venta o de un detalle) toma antes todas sus filas con bloquear_stock, para
+no quedar con una parte tomada esperando la otra.
+"""
+from sqlalchemy import bindparam, case, select, update
+
+from models import db, Inventario, Producto
+from utils import movimientos
+from utils.ventas import ErrorVenta
+
+
+class StockInsuficiente(ErrorVenta):
+    """No se pudo reservar el stock; `fallos` indica exactamente qué líneas fallaron."""
+
+    def __init__(self, fallos, nombres=None):
+        self.fallos = fallos
+        nombres = nombres or {}
+        partes = []
+        for f in fallos:
+            nombre = nombres.get(f["id_producto"], f"#{f['id_producto']}")
+            if f["disponible"] is None:
+                partes.append(f"'{nombre}' sin inventario en la tienda")
+            else:
+                partes.append(f"{nombre} (solicitado {f['solicitado']}, disponible {f['disponible']})")
+        if partes:
+            mensaje = "❌ Stock insuficiente: " + "; ".join(partes)
+        else:
+            mensaje = "❌ El stock cambió mientras se registraba la venta. Intenta nuevamente."
+        super().__init__(mensaje)
+
+
+def _cantidades(pedido):
+    return case(pedido, value=Inventario.id_producto)
+
+
+def bloquear_stock(pares):
+    """
+    SELECT ... FOR UPDATE de las filas de Inventario de los pares
+    (id_producto, id_tienda) y luego de sus Producto, en orden de clave.
+    No cambia nada: las escrituras posteriores de la transacción ya tienen
+    sus filas.
+    """
+    pares = set(pares)
+    if not pares:
+        return
+    productos = sorted({p for p, _ in pares})
+    tiendas = sorted({t for _, t in pares})
+    db.session.execute(
+        select(Inventario.id_inventario)
+        .where(Inventario.id_producto.in_(productos), Inventario.id_tienda.in_(tiendas))
+        .order_by(Inventario.id_producto, Inventario.id_tienda)
+        .with_for_update()
+    ).all()
+    db.session.execute(
+        select(Producto.id_producto)
+        .where(Producto.id_producto.in_(productos))
+        .order_by(Producto.id_producto)
+        .with_for_update()
+    ).all()
+
+
+def reservar_stock(id_tienda, pedido, nombres=None, tipo="venta", id_venta=None, nota=None):
+    """
+    Descuenta {id_producto: unidades} del inventario de la tienda, todo o nada,
+    y lo registra en el libro como `tipo`. Si alguna línea no alcanza, deshace
+    la transacción en curso y lanza StockInsuficiente con el detalle de cada
+    línea que falló.
+    """
+    pedido = {p: n for p, n in pedido.items() if n}
+    if not pedido:
+        return
+
+    resultado = db.session.execute(
+        update(Inventario)
+        .where(
+            Inventario.id_tienda == id_tienda,
+            Inventario.id_producto.in_(pedido),
+            Inventario.cantidad >= _cantidades(pedido),
+        )
+        .values(cantidad=Inventario.cantidad - _cantidades(pedido))
+        .execution_options(synchronize_session=False)
+    )
+    if resultado.rowcount == len(pedido):
+        movimientos.registrar(tipo, {(p, id_tienda): -n for p, n in pedido.items()}, id_venta=id_venta, nota=nota)
+        return
+
+    # Alguna fila no cumplió la condición: deshacer y reportar línea por línea
+    db.session.rollback()
+    disponibles = dict(
+        db.session.query(Inventario.id_producto, Inventario.cantidad).filter(
+            Inventario.id_tienda == id_tienda,
+            Inventario.id_producto.in_(pedido),
+        ).all()
+    )
+    fallos = [
+        {"id_producto": p, "solicitado": n, "disponible": disponibles.get(p)}
+        for p, n in sorted(pedido.items())
+        if disponibles.get(p) is None or disponibles[p] < n
+    ]
+    raise StockInsuficiente(fallos, nombres)
+
+
+def reservar_stock_lote(lineas):
+    """
+    Descuenta las líneas [(id_producto, id_tienda, unidades, id_venta)] de
+    varias ventas y tiendas con un UPDATE condicional por fila en un solo
+    executemany (sentencia fija, se compila una vez) y registra un movimiento
+    de venta por línea. Pensado para lotes cuyo stock ya se validó bajo
+    bloqueo: si alguna fila no alcanza, deshace la transacción y lanza
+    StockInsuficiente sin detalle.
+    """
+    pedido = {}
+    for id_producto, id_tienda, cantidad, _ in lineas:
+        pedido[id_producto, id_tienda] = pedido.get((id_producto, id_tienda), 0) + cantidad
+    filas = [{"p": p, "t": t, "n": n} for (p, t), n in sorted(pedido.items()) if n]
+    if not filas:
+        return
+    tabla = Inventario.__table__
+    resultado = db.session.execute(
+        update(tabla)
+        .where(
+            tabla.c.id_producto == bindparam("p"),
+            tabla.c.id_tienda == bindparam("t"),
+            tabla.c.cantidad >= bindparam("n"),
+        )
+        .values(cantidad=tabla.c.cantidad - bindparam("n")),
+        filas,
+    )
+    if resultado.rowcount != len(filas):
+        db.session.rollback()
+        raise StockInsuficiente([])
+    movimientos.registrar_filas([
+        {"tipo": "venta", "id_producto": p, "id_tienda": t, "cantidad": -n, "id_venta": id_venta}
+        for p, t, n, id_venta in lineas
+    ])
+
+
+def devolver_stock(id_tienda, pedido, tipo="devolucion", id_venta=None, nota=None):
+    """
+    Suma {id_producto: unidades} al inventario de la tienda y lo registra.
+    Si la fila ya no existe (inventario eliminado) se vuelve a crear con lo
+    devuelto: las unidades nunca se pierden del libro.
+    """
+    ingresar_stock(id_tienda, pedido, tipo=tipo, id_venta=id_venta, nota=nota)
+
+
+def upsert_inventario(filas, sumar):
+    """
+    INSERT ... ON DUPLICATE KEY UPDATE / ON CONFLICT DO UPDATE sobre
+    (id_producto, id_tienda). No registra movimientos: quien llama los calcula.
+    """
+    dialecto = db.engine.dialect.name
+    if dialecto == "mysql":
+        from sqlalchemy.dialects.mysql import insert as insert_dialecto
+        stmt = insert_dialecto(Inventario)
+        nueva = stmt.inserted.cantidad
+        stmt = stmt.on_duplicate_key_update(cantidad=Inventario.cantidad + nueva if sumar else nueva)
+    else:
+        if dialecto == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as insert_dialecto
+        else:
+            from sqlalchemy.dialects.sqlite import insert as insert_dialecto
+        stmt = insert_dialecto(Inventario)
+        nueva = stmt.excluded.cantidad
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Inventario.id_producto, Inventario.id_tienda],
+            set_={"cantidad": Inventario.cantidad + nueva if sumar else nueva},
+        )
+    db.session.execute(stmt, filas)
+
+
+def ingresar_stock(id_tienda, pedido, tipo="ajuste", id_venta=None, nota=None):
+    """Suma {id_producto: unidades} a la tienda (crea las filas que falten) y lo registra."""
+    pedido = {p: n for p, n in pedido.items() if n}
+    if not pedido:
+        return
+    upsert_inventario(
+        [{"id_producto": p, "id_tienda": id_tienda, "cantidad": n} for p, n in sorted(pedido.items())],
+        sumar=True,
+    )
+    movimientos.registrar(tipo, {(p, id_tienda): n for p, n in pedido.items()}, id_venta=id_venta, nota=nota)
+
+
+def corregir_inventario(id_inventario, id_producto, id_tienda, cantidad, nota=None):
+    """
+    Edición manual de una fila de Inventario (conteo físico, corrección o
+    cambio de producto/tienda). La fila se lee con FOR UPDATE para que una
+    venta concurrente no quede fuera del ajuste; se registra la salida del
+    par anterior y la entrada en el nuevo (si es el mismo par, solo la
+    diferencia). Retorna la cantidad anterior.
+    """
+    tabla = Inventario.__table__
+    actual = db.session.execute(
+        select(tabla.c.id_producto, tabla.c.id_tienda, tabla.c.cantidad)
+        .where(tabla.c.id_inventario == id_inventario)
+        .with_for_update()
+    ).one()
+    db.session.execute(
+        update(tabla).where(tabla.c.id_inventario == id_inventario)
+        .values(id_producto=id_producto, id_tienda=id_tienda, cantidad=cantidad)
+    )
+    deltas = {(actual.id_producto, actual.id_tienda): -actual.cantidad}
+    deltas[id_producto, id_tienda] = deltas.get((id_producto, id_tienda), 0) + cantidad
+    movimientos.registrar("ajuste", deltas, nota=nota)
+    return actual.cantidad
+
+
+def retirar_inventario(id_producto, id_tienda, nota=None):
+    """Elimina la fila de inventario y registra su saldo como ajuste negativo. Retorna la cantidad retirada."""
+    tabla = Inventario.__table__
+    anterior = db.session.scalar(
+        select(tabla.c.cantidad)
+        .where(tabla.c.id_producto == id_producto, tabla.c.id_tienda == id_tienda)
+        .with_for_update()
+    )
+    if anterior is None:
+        return 0
+    db.session.execute(
+        tabla.delete().where(tabla.c.id_producto == id_producto, tabla.c.id_tienda == id_tienda)
+    )
+    movimientos.registrar("ajuste", {(id_producto, id_tienda): -anterior}, nota=nota)
+    return anterior
+
+
+def transferir_stock(id_producto, origen, destino, cantidad, nombres=None, nota=None):
+    """Mueve unidades entre tiendas: descuento condicional en origen + ingreso en destino, ambos registrados."""
+    if origen == destino:
+        raise ErrorVenta("⚠️ La tienda de origen y destino deben ser distintas.")
+    reservar_stock(origen, {id_producto: cantidad}, nombres=nombres, tipo="transferencia", nota=nota)
+    ingresar_stock(destino, {id_producto: cantidad}, tipo="transferencia", nota=nota)
@@ -0,0 +1,257 @@
+# utils/trabajos.py
+"""
+Ejecución de trabajos pesados fuera del request (reportes, recálculos).
+
+- Cada trabajo queda persistido en la tabla `trabajos` (estado, avance,
+  archivo resultante), así cualquier worker puede informar su estado.
+- Se ejecutan en un ThreadPoolExecutor local: no se necesita broker externo.
+- Las tareas se registran con @tarea("tipo") y reciben un ContextoTrabajo
+  para informar avance; ahí mismo se revisa la cancelación y el tiempo límite.
+
+Configuración (app.config):
+    TRABAJOS_MAX_WORKERS        hilos del pool (default 2)
+    TRABAJOS_MAX_POR_USUARIO    trabajos activos por usuario (default 3)
+    TRABAJOS_TIMEOUT            segundos antes de cancelar un trabajo (default 1800)
+    TRABAJOS_DIR                carpeta de resultados (default instance/trabajos)
+    TRABAJOS_RETENCION_HORAS    horas que se conservan los archivos (default 24)
+"""
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from models import db, Trabajo
+
+log = logging.getLogger(__name__)
+
+ESTADOS_ACTIVOS = ("pendiente", "ejecutando")
+INTERVALO_AVANCE = 1.0  # segundos mínimos entre escrituras de avance
+
+TAREAS = {}
+
+
+def tarea(tipo):
+    """Registra una función como tarea ejecutable en segundo plano."""
+    def registrar(funcion):
+        TAREAS[tipo] = funcion
+        return funcion
+    return registrar
+
+
+class TrabajoCancelado(Exception):
+    """Se pidió cancelar el trabajo o superó el tiempo límite."""
+
+
+class LimiteTrabajos(Exception):
+    """El usuario ya tiene el máximo de trabajos activos."""
+
+
+def _proceso_actual():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class ContextoTrabajo:
+    """Lo que recibe cada tarea: parámetros, ruta de salida y avance/cancelación."""
+
+    def __init__(self, app, trabajo):
+        self.app = app
+        self.id_trabajo = trabajo.id_trabajo
+        self.parametros = trabajo.parametros or {}
+        self.usuario_id = trabajo.usuario_id
+        self.limite = time.monotonic() + app.config["TRABAJOS_TIMEOUT"]
+        self._ultimo_avance = 0.0
+        # SQLite no deja confirmar escrituras mientras hay un cursor de lectura
+        # abierto (reportes en streaming): ahí el avance solo se guarda al final.
+        self._persistir_avance = db.engine.dialect.name != "sqlite"
+
+    def ruta_archivo(self, extension):
+        return os.path.join(self.app.config["TRABAJOS_DIR"], f"trabajo_{self.id_trabajo}.{extension}")
+
+    def avance(self, progreso, mensaje=None):
+        """
+        Informa avance (con una conexión aparte, para no interferir con la
+        transacción ni con un cursor abierto de la tarea; en SQLite solo se
+        lee la cancelación, con la conexión de la tarea) y lanza
+        TrabajoCancelado si se pidió cancelar o se agotó el tiempo.
+        """
+        if time.monotonic() > self.limite:
+            raise TrabajoCancelado("Se superó el tiempo límite del trabajo.")
+
+        ahora = time.monotonic()
+        if ahora - self._ultimo_avance < INTERVALO_AVANCE:
+            return
+        self._ultimo_avance = ahora
+
+        consulta = select(Trabajo.cancelar).where(Trabajo.id_trabajo == self.id_trabajo)
+        if self._persistir_avance:
+            with db.engine.begin() as conn:
+                valores = {"progreso": progreso}
+                if mensaje is not None:
+                    valores["mensaje"] = mensaje[:255]
+                conn.execute(update(Trabajo).where(Trabajo.id_trabajo == self.id_trabajo).values(**valores))
+                cancelar = conn.execute(consulta).scalar()
+        else:
+            # En SQLite, leer con la conexión de la tarea: otra conexión puede
+            # quedar esperando a un escritor que a su vez espera que termine
+            # el cursor de la tarea (bloqueo mutuo hasta el timeout).
+            cancelar = db.session.execute(consulta).scalar()
+        if cancelar:
+            raise TrabajoCancelado("Cancelado por el usuario.")
+
+    def con_avance(self, filas, cada=1000):
+        """Envuelve un iterador de filas informando avance cada `cada` filas."""
+        n = 0
+        for n, fila in enumerate(filas, start=1):
+            if n % cada == 0:
+                self.avance(n)
+            yield fila
+        self.procesadas = n
+
+
+class GestorTrabajos:
+    def __init__(self):
+        self._executor = None
+        self._lock = threading.Lock()
+        self._recuperado = False
+
+    def init_app(self, app):
+        app.config.setdefault("TRABAJOS_MAX_WORKERS", 2)
+        app.config.setdefault("TRABAJOS_MAX_POR_USUARIO", 3)
+        app.config.setdefault("TRABAJOS_TIMEOUT", 30 * 60)
+        app.config.setdefault("TRABAJOS_DIR", os.path.join(app.instance_path, "trabajos"))
+        app.config.setdefault("TRABAJOS_RETENCION_HORAS", 24)
+        app.extensions["trabajos"] = self
+
+    def _pool(self, app):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=app.config["TRABAJOS_MAX_WORKERS"], thread_name_prefix="trabajo"
+                )
+                atexit.register(self._executor.shutdown, wait=False, cancel_futures=True)
+            return self._executor
+
+    # -------------------------------
+    # Encolar / cancelar
+    # -------------------------------
+    def encolar(self, app, tipo, parametros=None, usuario_id=None):
+        """Crea el trabajo (commit incluido) y lo envía al pool. Retorna el Trabajo."""
+        if tipo not in TAREAS:
+            raise ValueError(f"Tipo de trabajo desconocido: {tipo}")
+
+        self._recuperar_huerfanos()
+        self.purgar_vencidos(app)
+
+        activos = Trabajo.query.filter(
+            Trabajo.usuario_id == usuario_id, Trabajo.estado.in_(ESTADOS_ACTIVOS)
+        ).count()
+        if activos >= app.config["TRABAJOS_MAX_POR_USUARIO"]:
+            raise LimiteTrabajos(
+                f"Ya tienes {activos} trabajos en curso; espera a que terminen o cancela alguno."
+            )
+
+        trabajo = Trabajo(tipo=tipo, parametros=parametros or {}, usuario_id=usuario_id,
+                          estado="pendiente", proceso=_proceso_actual())
+        db.session.add(trabajo)
+        db.session.commit()
+
+        self._pool(app).submit(self._ejecutar, app, trabajo.id_trabajo)
+        return trabajo
+
+    def cancelar(self, trabajo):
+        """Un trabajo pendiente se cancela de inmediato; uno en ejecución, en su próximo avance."""
+        if trabajo.estado == "pendiente":
+            trabajo.estado = "cancelado"
+            trabajo.terminado = datetime.now()
+        elif trabajo.estado == "ejecutando":
+            trabajo.cancelar = True
+        db.session.commit()
+
+    # -------------------------------
+    # Ejecución (hilo del pool)
+    # -------------------------------
+    def _ejecutar(self, app, id_trabajo):
+        with app.app_context():
+            trabajo = db.session.get(Trabajo, id_trabajo)
+            if trabajo is None or trabajo.estado != "pendiente":
+                return  # cancelado antes de comenzar
+
+            trabajo.estado = "ejecutando"
+            trabajo.iniciado = datetime.now()
+            trabajo.proceso = _proceso_actual()
+            db.session.commit()
+
+            os.makedirs(app.config["TRABAJOS_DIR"], exist_ok=True)
+            ctx = ContextoTrabajo(app, trabajo)
+            try:
+                resultado = TAREAS[trabajo.tipo](ctx) or {}
+                estado, mensaje = "completado", resultado.get("mensaje", "Completado.")
+            except TrabajoCancelado as e:
+                resultado, estado, mensaje = {}, "cancelado", str(e)
+            except Exception as e:
+                log.exception("Trabajo #%s (%s) falló", id_trabajo, trabajo.tipo)
+                resultado, estado, mensaje = {}, "error", str(e)
+
+            db.session.rollback()
+            trabajo = db.session.get(Trabajo, id_trabajo)
+            trabajo.estado = estado
+            trabajo.mensaje = mensaje[:255]
+            trabajo.terminado = datetime.now()
+            if "progreso" in resultado:
+                trabajo.progreso = resultado["progreso"]
+            if estado == "completado" and resultado.get("archivo"):
+                trabajo.archivo = resultado["archivo"]
+                trabajo.nombre_descarga = resultado.get("nombre_descarga")
+            elif resultado.get("archivo") and os.path.exists(resultado["archivo"]):
+                os.remove(resultado["archivo"])
+            db.session.commit()
+
+    # -------------------------------
+    # Mantención
+    # -------------------------------
+    def _recuperar_huerfanos(self):
+        """Marca como error los trabajos activos de procesos de este host que ya no existen."""
+        if self._recuperado:
+            return
+        self._recuperado = True
+        host = socket.gethostname()
+        for t in Trabajo.query.filter(Trabajo.estado.in_(ESTADOS_ACTIVOS)).all():
+            host_t, _, pid = (t.proceso or "").rpartition(":")
+            if host_t != host or not pid.isdigit() or _pid_vivo(int(pid)):
+                continue
+            t.estado = "error"
+            t.mensaje = "Interrumpido: el proceso que lo ejecutaba terminó."
+            t.terminado = datetime.now()
+        db.session.commit()
+
+    def purgar_vencidos(self, app):
+        """Borra los archivos de trabajos terminados hace más de TRABAJOS_RETENCION_HORAS."""
+        limite = datetime.now() - timedelta(hours=app.config["TRABAJOS_RETENCION_HORAS"])
+        vencidos = Trabajo.query.filter(
+            Trabajo.terminado < limite, Trabajo.archivo.isnot(None)
+        ).all()
+        for t in vencidos:
+            if os.path.exists(t.archivo):
+                os.remove(t.archivo)
+            t.archivo = None
+        if vencidos:
+            db.session.commit()
+
+
+def _pid_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+gestor_trabajos = GestorTrabajos()
@@ -0,0 +1,107 @@
+# utils/ventas.py
+"""
+Resolución en lote de las líneas de una venta.
+
+En vez de consultar Producto e Inventario por cada línea (2N viajes a la BD),
+se cargan todos los productos referenciados con una consulta IN, el stock se
+descuenta con un único UPDATE condicional (ver utils/stock.py) y los
+DetalleVenta se insertan en un solo INSERT.
+"""
+from decimal import Decimal
+
+from sqlalchemy import delete, func, insert, select
+
+from models import db, Producto, DetalleVenta, sumar_a_totales
+
+
+class ErrorVenta(Exception):
+    """Error de validación de una venta; el mensaje se muestra al usuario."""
+
+
+def parsear_lineas(detalles):
+    """Convierte los detalles del formulario en [(id_producto, cantidad)]."""
+    lineas = []
+    for det in detalles.values():
+        id_producto = int(det.get("id_producto", 0))
+        cantidad = int(det.get("cantidad", 0))
+        if cantidad <= 0:
+            raise ErrorVenta("⚠️ La cantidad debe ser > 0.")
+        lineas.append((id_producto, cantidad))
+    return lineas
+
+
+def cargar_productos(ids_producto):
+    """{id_producto: Producto} con una sola consulta."""
+    ids = set(ids_producto)
+    if not ids:
+        return {}
+    return {p.id_producto: p for p in Producto.query.filter(Producto.id_producto.in_(ids))}
+
+
+def resolver_lineas(lineas):
+    """
+    Valida las líneas contra los productos precargados y calcula subtotales.
+    Retorna [(producto, cantidad, subtotal)] sin modificar nada; el stock
+    se valida al reservarlo.
+    """
+    productos = cargar_productos(id_producto for id_producto, _ in lineas)
+
+    resueltas = []
+    for id_producto, cantidad in lineas:
+        producto = productos.get(id_producto)
+        if producto is None:
+            raise ErrorVenta(f"❌ El producto #{id_producto} no existe.")
+
+        # Precio SIEMPRE desde la base de datos
+        subtotal = cantidad * producto.precio
+        resueltas.append((producto, cantidad, subtotal))
+    return resueltas
+
+
+def pedido_por_producto(resueltas):
+    """{id_producto: unidades} acumulando varias líneas del mismo producto."""
+    pedido = {}
+    for producto, cantidad, _ in resueltas:
+        pedido[producto.id_producto] = pedido.get(producto.id_producto, 0) + cantidad
+    return pedido
+
+
+def nombres_productos(resueltas):
+    return {producto.id_producto: producto.nombre for producto, _, _ in resueltas}
+
+
+def insertar_filas_detalle(filas):
+    """
+    INSERT en bloque de DetalleVenta (executemany) y suma de los subtotales
+    al total de cada venta: un INSERT en bloque no dispara los eventos de
+    models.py que mantienen Venta.total.
+    """
+    if not filas:
+        return
+    db.session.execute(insert(DetalleVenta), filas)
+    deltas = {}
+    for fila in filas:
+        deltas[fila["id_venta"]] = deltas.get(fila["id_venta"], 0) + Decimal(str(fila["subtotal"]))
+    sumar_a_totales(deltas)
+
+
+def insertar_detalles(id_venta, resueltas):
+    """Inserta todos los DetalleVenta de la venta con un único INSERT (executemany)."""
+    insertar_filas_detalle([
+        {
+            "id_venta": id_venta,
+            "id_producto": producto.id_producto,
+            "cantidad": cantidad,
+            "subtotal": subtotal,
+        }
+        for producto, cantidad, subtotal in resueltas
+    ])
+
+
+def borrar_detalles(id_venta):
+    """Borra todos los detalles de la venta con un DELETE y descuenta su suma del total."""
+    suma = db.session.scalar(
+        select(func.coalesce(func.sum(DetalleVenta.subtotal), 0)).where(DetalleVenta.id_venta == id_venta)
+    )
+    db.session.execute(delete(DetalleVenta).where(DetalleVenta.id_venta == id_venta))
+    sumar_a_totales({id_venta: -suma})
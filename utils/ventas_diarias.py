@@ -0,0 +1,152 @@
+# utils/ventas_diarias.py
+"""
+Resumen diario de ventas (tabla ventas_diarias): unidades e ingresos por
+(fecha, tienda, producto).
+
+Las rutas que crean, editan o borran ventas o detalles llaman a
+sumar_ventas(ids, signo) dentro de su misma transacción, con el mismo patrón
+que los contadores del dashboard (utils/kpi.py): signo=-1 con la venta tal
+como estaba antes del cambio y signo=1 con la venta ya modificada. Cada
+ajuste es un upsert que suma la diferencia en la base, así dos cajeros
+vendiendo el mismo producto el mismo día no se pisan. Los ajustes se
+escriben al commit, después de los de resumen_kpi (utils/diferidos.py).
+
+Los reportes agregados (routes/reportes.py) leen solo esta tabla: un rango
+de un mes recorre a lo sumo días × tiendas × productos vendidos, sin tocar
+Venta ni DetalleVenta.
+
+`flask reconstruir-ventas-diarias` la recalcula desde cero por ventanas de
+fechas (necesario una vez en bases existentes y tras recalcular totales).
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from sqlalchemy import delete, func, insert, or_, select
+
+from models import db, DetalleVenta, Venta, VentaDiaria
+from utils import diferidos
+from utils.cache import invalidar
+
+DIAS_POR_LOTE = 31
+
+
+def _escribir(filas, conexion):
+    diferidos.upsert_sumando(VentaDiaria.__table__, ("fecha", "id_tienda", "id_producto"), [
+        {"fecha": f, "id_tienda": t, "id_producto": p, "unidades": u, "ingresos": i}
+        for (f, t, p), (u, i) in filas
+    ], conexion)
+
+
+diferidos.registrar_escritor("ventas_diarias", _escribir)
+
+
+# -------------------------------
+# AJUSTES INCREMENTALES
+# -------------------------------
+def sumar_lineas(lineas):
+    """
+    Suma [(fecha, id_tienda, id_producto, unidades, ingresos)] al resumen
+    al hacer commit (un upsert executemany por transacción).
+    """
+    for fecha, id_tienda, id_producto, unidades, ingresos in lineas:
+        diferidos.sumar("ventas_diarias", (fecha, id_tienda, id_producto), unidades, Decimal(str(ingresos)))
+
+
+def sumar_ventas(ids_venta, signo=1):
+    """
+    Suma (signo=1) o resta (signo=-1) las líneas actuales de las ventas
+    indicadas, leídas con una consulta agrupada por el índice de DetalleVenta.
+    """
+    ids = [i for i in set(ids_venta) if i is not None]
+    if not ids:
+        return
+    filas = db.session.execute(
+        select(Venta.fecha, Venta.id_tienda, DetalleVenta.id_producto,
+               func.sum(DetalleVenta.cantidad), func.sum(DetalleVenta.subtotal))
+        .join(Venta, Venta.id_venta == DetalleVenta.id_venta)
+        .where(DetalleVenta.id_venta.in_(ids))
+        .group_by(Venta.fecha, Venta.id_tienda, DetalleVenta.id_producto)
+    )
+    sumar_lineas(
+        (fecha, id_tienda, id_producto, signo * int(unidades), signo * Decimal(str(ingresos)))
+        for fecha, id_tienda, id_producto, unidades, ingresos in filas
+    )
+
+
+# -------------------------------
+# RECONSTRUCCIÓN Y VERIFICACIÓN
+# -------------------------------
+def _agregado(desde, hasta):
+    """SELECT agrupado de las ventas con fecha en [desde, hasta]."""
+    return (
+        select(Venta.fecha, Venta.id_tienda, DetalleVenta.id_producto,
+               func.sum(DetalleVenta.cantidad), func.sum(DetalleVenta.subtotal))
+        .join(Venta, Venta.id_venta == DetalleVenta.id_venta)
+        .where(Venta.fecha.between(desde, hasta))
+        .group_by(Venta.fecha, Venta.id_tienda, DetalleVenta.id_producto)
+    )
+
+
+def reconstruir(dias_por_lote=DIAS_POR_LOTE, progreso=None):
+    """
+    Recalcula el resumen desde Venta/DetalleVenta por ventanas de fechas:
+    DELETE + INSERT ... SELECT agrupado de cada ventana, con commit por
+    ventana. progreso(hasta, filas) se llama después de cada una. Al final
+    invalida los reportes de ventas cacheados.
+    Retorna la cantidad de filas escritas.
+    """
+    diferidos.descartar("ventas_diarias")  # lo pendiente ya está en Venta/DetalleVenta
+    minimo, maximo = db.session.execute(select(func.min(Venta.fecha), func.max(Venta.fecha))).one()
+    if minimo is None:
+        db.session.execute(delete(VentaDiaria))
+        invalidar("ventas")
+        db.session.commit()
+        return 0
+
+    # Filas fuera del rango actual de ventas (ventas borradas en los extremos)
+    db.session.execute(delete(VentaDiaria).where(or_(VentaDiaria.fecha < minimo, VentaDiaria.fecha > maximo)))
+    db.session.commit()
+
+    total = 0
+    desde = minimo
+    while desde <= maximo:
+        hasta = min(desde + timedelta(days=dias_por_lote - 1), maximo)
+        db.session.execute(delete(VentaDiaria).where(VentaDiaria.fecha.between(desde, hasta)))
+        resultado = db.session.execute(insert(VentaDiaria).from_select(
+            ["fecha", "id_tienda", "id_producto", "unidades", "ingresos"], _agregado(desde, hasta)
+        ))
+        db.session.commit()
+        total += max(resultado.rowcount, 0)
+        if progreso:
+            progreso(hasta, total)
+        desde = hasta + timedelta(days=1)
+
+    invalidar("ventas")  # los reportes agregados cacheados leían el resumen anterior
+    db.session.commit()
+    return total
+
+
+def diferencias(desde=None, hasta=None):
+    """
+    Claves (fecha, id_tienda, id_producto) cuyo resumen no coincide con las
+    ventas: [{clave, resumen: (unidades, ingresos), ventas: (unidades, ingresos)}].
+    No corrige nada.
+    """
+    minimo, maximo = db.session.execute(select(func.min(Venta.fecha), func.max(Venta.fecha))).one()
+    desde = desde or minimo
+    hasta = hasta or maximo
+    reales = {}
+    if desde is not None:
+        reales = {(f, t, p): (int(u), Decimal(str(i))) for f, t, p, u, i in db.session.execute(_agregado(desde, hasta))}
+
+    resumen = select(VentaDiaria.fecha, VentaDiaria.id_tienda, VentaDiaria.id_producto,
+                     VentaDiaria.unidades, VentaDiaria.ingresos)
+    if desde is not None:
+        resumen = resumen.where(VentaDiaria.fecha.between(desde, hasta))
+    guardados = {(f, t, p): (u, Decimal(str(i))) for f, t, p, u, i in db.session.execute(resumen) if u or i}
+
+    return [
+        {"clave": clave, "resumen": guardados.get(clave), "ventas": reales.get(clave)}
+        for clave in sorted(set(reales) | set(guardados))
+        if guardados.get(clave) != reales.get(clave)
+    ]